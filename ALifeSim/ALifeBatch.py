@@ -0,0 +1,342 @@
+"""Runs ALife simulations without the GUI, so that they can be run at full speed on machines with no display.
+Nothing in here imports tkinter. From the ALifeSim folder:
+
+    python ALifeBatch.py run --grid 200 --agents 2000 --steps 10000 --seed 7 --output results.json
+    python ALifeBatch.py run --grid 1000 --agents 20000 --steps 100000 --checkpoint run.ckpt --checkpoint-every 1000
+    python ALifeBatch.py resume --checkpoint run.ckpt --steps 100000
+    python ALifeBatch.py replicates --replicates 8 --workers 4 --grid 200 --agents 2000 --steps 1000 --seed 7
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+import ALifeSim
+from WorldTemplate import WorldTemplate
+from Checkpoint import saveCheckpoint, loadCheckpoint
+from TrajectoryRecorder import TrajectoryRecorder, DEFAULT_FIELDS
+from TiledPerception import TiledPerception
+from FitnessCache import FitnessCache
+from LocalSearchSolver import GeneticStringState, HillClimber, BeamSearcher, GASearcher, FitnessExecutor
+
+# The world templates SimEvaluators have built in this process, by their cacheKey(). SimEvaluators are sent to
+# worker processes afresh with every task, so a template kept on one would be built again for every rule string.
+_templates = {}
+
+
+def runSimulation(gridSize, numAgents, maxSteps, numStones=0, numForests=0, numRivers=0, numPonds=0,
+                  geneticStrings=None, seed=None, terrain=None, template=None, checkpoint=None, checkpointEvery=0,
+                  record=None, recordEvery=1, recordFields=DEFAULT_FIELDS, synchronous=False, batchPerception=False,
+                  tiles=0, workers=0):
+    """Builds a simulation and steps it until maxSteps steps have been run or every agent has died. Agents that
+    are not given a genetic string get a random one. The same seed always gives the same run. If a TerrainLayers
+    is given, the simulation is built on it and the stone, river and pond counts are not used; if a WorldTemplate
+    is given, the simulation is cloned from it and only the agent settings are used. If a checkpoint path is given,
+    the simulation is saved there every checkpointEvery steps (see Checkpoint), and once more at the end. Returns
+    the simulation and the number of seconds the steps took. If a record directory is given, the run is recorded
+    there by a TrajectoryRecorder, with the agents' recordFields every recordEvery steps, and dead agents are not
+    kept in the simulation. synchronous and batchPerception set the simulation's step modes of the same names. If
+    tiles is over 0, the start-of-step perception is split into that many tiles by a TiledPerception with the given
+    number of worker processes, and batch perception is turned on if the run is not synchronous."""
+    geneRng = random.Random(seed) if seed is not None else random
+    geneticStrings = list(geneticStrings or [])[:numAgents]
+    geneticStrings += [ALifeSim.randomGeneticString(geneRng) for i in range(numAgents - len(geneticStrings))]
+    if template is not None:
+        sim = template.clone(numAgents, geneticStrings, seed)
+    else:
+        sim = ALifeSim.ALifeSimTest(gridSize, numAgents, numStones, numForests, numRivers, numPonds, geneticStrings,
+                                    seed, terrain)
+    sim.synchronous = synchronous
+    sim.batchPerception = batchPerception or (tiles > 0 and not synchronous)
+    recorder = None
+    if record is not None:
+        sim.keepDeadAgents = False
+        recorder = TrajectoryRecorder(sim, record, recordEvery, recordFields)
+    if tiles > 0:
+        sim.tiles = TiledPerception(tiles, workers)
+    try:
+        return sim, _stepUntil(sim, maxSteps, checkpoint, checkpointEvery, recorder)
+    finally:
+        if sim.tiles is not None:
+            sim.tiles.close()
+            sim.tiles = None
+
+
+def resumeSimulation(checkpoint, maxSteps, checkpointEvery=0):
+    """Loads a simulation from a checkpoint file and steps it on, as runSimulation does, until maxSteps steps have
+    been run in all or every agent has died, saving it back to the same file every checkpointEvery steps and at
+    the end. Returns the simulation and the number of seconds the steps took."""
+    sim = loadCheckpoint(checkpoint)
+    return sim, _stepUntil(sim, maxSteps, checkpoint, checkpointEvery)
+
+
+def _stepUntil(sim, maxSteps, checkpoint=None, checkpointEvery=0, recorder=None):
+    """Steps a simulation until maxSteps steps have been run or every agent has died, saving checkpoints if a path
+    is given and recording each step if a TrajectoryRecorder is given, which is closed at the end. Returns the
+    number of seconds it took."""
+    startTime = time.perf_counter()
+    while sim.stepNum < maxSteps and len(sim.agentList) > 0:
+        sim.step()
+        if recorder is not None:
+            recorder.record()
+        if checkpoint is not None and checkpointEvery > 0 and sim.stepNum % checkpointEvery == 0:
+            saveCheckpoint(sim, checkpoint)
+    if recorder is not None:
+        recorder.close()
+    elapsed = time.perf_counter() - startTime
+    if checkpoint is not None:
+        saveCheckpoint(sim, checkpoint)
+    return elapsed
+
+
+def summarize(sim, elapsed):
+    """Returns a dictionary of statistics on how a simulation came out, ready to be written as JSON. The average
+    survival time counts living agents as having survived up to the current step. Dead agents are counted from the
+    simulation's running totals, so the figures are the same whether or not it keeps them in deadAgents."""
+    lifespans = [sim.stepNum - agent.stepSpawned for agent in sim.agentList]
+    numLifespans = len(lifespans) + sim.numDead
+    maxLifespan = max(lifespans + [sim.deadLifespanMax]) if numLifespans > 0 else 0
+    livingByColor = {}
+    for agent in sim.agentList:
+        color = agent.colorNumberToText(agent.getColor())
+        livingByColor[color] = livingByColor.get(color, 0) + 1
+    return {"gridSize": sim.gridSize,
+            "initialAgents": sim.numAgents,
+            "steps": sim.stepNum,
+            "living": len(sim.agentList),
+            "dead": sim.numDead,
+            "born": len(sim.agentList) + sim.numDead - sim.numAgents,
+            "livingByColor": livingByColor,
+            "avgSurvivalTime": (sum(lifespans) + sim.deadLifespanTotal) / numLifespans if numLifespans > 0 else 0.0,
+            "maxSurvivalTime": maxLifespan,
+            "foodLeft": len(sim.food),
+            "seconds": elapsed,
+            "stepsPerSecond": sim.stepNum / elapsed if elapsed > 0 else 0.0}
+
+
+def runReplicates(numReplicates, gridSize, numAgents, maxSteps, numStones=0, numForests=0, numRivers=0, numPonds=0,
+                  geneticStrings=None, seed=None, workers=0):
+    """Runs numReplicates simulations on the same terrain, each with its own seed drawn from the given one, and
+    returns a list of their summaries. The terrain is made once and put in shared memory, so worker processes (if
+    workers is over 0) all read the one copy instead of each building or being sent their own. Forests, food and
+    agents are still placed anew in each replicate."""
+    world = ALifeSim.ALifeSimTest(gridSize, 0, numStones, 0, numRivers, numPonds, [], seed)
+    terrain = world.terrain
+    shared = terrain.share()
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(numReplicates)]
+    jobs = [(gridSize, numAgents, maxSteps, numForests, geneticStrings, replicateSeed, terrain)
+            for replicateSeed in seeds]
+    try:
+        if workers > 0:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                summaries = list(pool.map(_runReplicate, jobs))
+        else:
+            summaries = [_runReplicate(job) for job in jobs]
+    finally:
+        del world, terrain
+        shared.unlink()
+    return summaries
+
+
+def _runReplicate(job):
+    """Runs one replicate for runReplicates and returns its summary. At the top level of the module so that worker
+    processes can find it."""
+    (gridSize, numAgents, maxSteps, numForests, geneticStrings, seed, terrain) = job
+    sim, elapsed = runSimulation(gridSize, numAgents, maxSteps, numForests=numForests, geneticStrings=geneticStrings,
+                                 seed=seed, terrain=terrain)
+    summary = summarize(sim, elapsed)
+    summary["seed"] = seed
+    return summary
+
+
+class SimEvaluator(object):
+    """An evaluation function for the local searchers in LocalSearchSolver that runs a headless simulation. A rule
+    string is scored by giving it to every agent as its genetic string, running the simulation and returning the
+    agents' average survival time. Unlike the GUI's evalRulestring, this can be pickled and sent to the worker
+    processes of a FitnessExecutor. If a seed is given, every rule string is tried in the same world with the same
+    random numbers, so differences in score come from the rule strings and not from luck, and the world is only
+    built once per process, as a WorldTemplate kept for every SimEvaluator with the same settings."""
+
+    def __init__(self, gridSize, numAgents, maxSteps, numStones=0, numForests=0, numRivers=0, numPonds=0, seed=None):
+        """Takes in the settings for the simulations to run."""
+        self.gridSize = gridSize
+        self.numAgents = numAgents
+        self.maxSteps = maxSteps
+        self.numStones = numStones
+        self.numForests = numForests
+        self.numRivers = numRivers
+        self.numPonds = numPonds
+        self.seed = seed
+
+    def cacheKey(self):
+        """Returns a string naming these settings, for telling apart values in a FitnessCache."""
+        return "SimEvaluator" + str((self.gridSize, self.numAgents, self.maxSteps, self.numStones, self.numForests,
+                                     self.numRivers, self.numPonds, self.seed))
+
+    def __call__(self, ruleString):
+        """Runs one simulation with the rule string and returns its score."""
+        template = None
+        if self.seed is not None:
+            key = self.cacheKey()
+            template = _templates.get(key)
+            if template is None:
+                template = _templates[key] = WorldTemplate(self.gridSize, self.numStones, self.numForests,
+                                                           self.numRivers, self.numPonds, self.seed)
+        sim, elapsed = runSimulation(self.gridSize, self.numAgents, self.maxSteps, self.numStones, self.numForests,
+                                     self.numRivers, self.numPonds, [ruleString] * self.numAgents,
+                                     None if template is not None else self.seed, template=template)
+        return summarize(sim, elapsed)["avgSurvivalTime"]
+
+
+def runSearch(searcher, evaluator, rounds, population=None, workers=0, seed=None, cache=None):
+    """Searches for the genetic string that scores best under a SimEvaluator, with the local searcher named by
+    searcher ("hill", "beam" or "ga") running for at most the given number of rounds. population is the beam width
+    or the GA's population size (by default, the searcher's own). If workers is over 0, each round's candidates are
+    scored at the same time by a FitnessExecutor with that many worker processes. The same seed always gives the
+    same search. If a FitnessCache is given, strings already scored there are not run again, and the cache's
+    statistics are added to the result; one kept in a file needs an evaluator with a seed, or a single random run
+    of a string would be saved as its score for good. Returns a dictionary describing the best string found, ready
+    to be written as JSON."""
+    if cache is not None and cache.db is not None and evaluator.seed is None:
+        raise ValueError("A FitnessCache kept in a file needs an evaluator with a seed")
+    startState = GeneticStringState(evaluator, evaluator.maxSteps, cache=cache, rng=random.Random(seed))
+    executor = FitnessExecutor(workers) if workers > 0 else None
+    startTime = time.perf_counter()
+    try:
+        if searcher == "hill":
+            search = HillClimber(startState, rounds, executor=executor)
+        elif searcher == "beam":
+            search = BeamSearcher(startState, population or 2, rounds, executor=executor)
+        elif searcher == "ga":
+            search = GASearcher(startState, population or 6, rounds, executor=executor)
+        else:
+            raise ValueError("Unknown searcher: " + str(searcher))
+        search.run()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    best = search.overallBest if searcher == "ga" else search.getCurrState()
+    result = {"searcher": searcher,
+              "rounds": search.getCount(),
+              "bestGeneticString": best.ruleString,
+              "bestValue": best.getValue(),
+              "seconds": time.perf_counter() - startTime}
+    if cache is not None:
+        result["cache"] = cache.getStats()
+    return result
+
+
+def main(argv=None):
+    """Reads the command line, runs the simulations and writes out the summary."""
+    parser = argparse.ArgumentParser(description="Run ALife simulations without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    runParser = commands.add_parser("run", help="run one simulation and write a summary of the result as JSON")
+    resumeParser = commands.add_parser("resume", help="carry on a simulation saved by run --checkpoint and write a "
+                                                      "summary of the result as JSON")
+    resumeParser.add_argument("--checkpoint", required=True, help="checkpoint file to carry on from, and save to")
+    resumeParser.add_argument("--steps", type=int, default=100, help="step to run up to")
+    resumeParser.add_argument("--checkpoint-every", type=int, default=0, dest="checkpointEvery",
+                              help="save the simulation every this many steps")
+    resumeParser.add_argument("--output", default=None, help="file to write the JSON summary to (default: stdout)")
+    replicatesParser = commands.add_parser("replicates", help="run several simulations on the same terrain and "
+                                                              "write a list of their summaries as JSON")
+    searchParser = commands.add_parser("search", help="search for the genetic string whose agents survive longest "
+                                                      "and write the best one found as JSON")
+    for commandParser in (runParser, replicatesParser, searchParser):
+        commandParser.add_argument("--grid", type=int, default=20, help="side length of the grid")
+        commandParser.add_argument("--agents", type=int, default=10, help="number of agents to start with")
+        commandParser.add_argument("--steps", type=int, default=100, help="maximum number of steps to run")
+        commandParser.add_argument("--seed", type=int, default=None, help="random seed, for repeatable runs")
+        commandParser.add_argument("--stones", type=int, default=0, help="number of stones")
+        commandParser.add_argument("--forests", type=int, default=0, help="number of forests")
+        commandParser.add_argument("--rivers", type=int, default=0, help="number of rivers")
+        commandParser.add_argument("--ponds", type=int, default=0, help="number of ponds")
+        commandParser.add_argument("--output", default=None,
+                                   help="file to write the JSON summary to (default: stdout)")
+    for commandParser in (runParser, replicatesParser):
+        commandParser.add_argument("--genetic-string", action="append", dest="geneticStrings", default=None,
+                                   help="genetic string for an agent; may be given more than once, and any agents "
+                                        "left over get random ones")
+    runParser.add_argument("--checkpoint", default=None,
+                           help="file to save the simulation to as it runs, for carrying it on with resume")
+    runParser.add_argument("--record", default=None,
+                           help="directory to record the agents and events of each step to, as .npz chunks")
+    runParser.add_argument("--record-every", type=int, default=1, dest="recordEvery",
+                           help="record the agents every this many steps")
+    runParser.add_argument("--record-fields", default=",".join(DEFAULT_FIELDS), dest="recordFields",
+                           help="comma-separated agent fields to record")
+    runParser.add_argument("--checkpoint-every", type=int, default=0, dest="checkpointEvery",
+                           help="save the simulation every this many steps, as well as at the end")
+    runParser.add_argument("--synchronous", action="store_true",
+                           help="have every agent decide from the same start-of-step world, then carry the "
+                                "decisions out together")
+    runParser.add_argument("--batch-perception", action="store_true", dest="batchPerception",
+                           help="have the agents look around all at once at the start of each step")
+    runParser.add_argument("--tiles", type=int, default=0,
+                           help="split the start-of-step perception into this many bands of rows (turns on "
+                                "--batch-perception unless --synchronous is given)")
+    runParser.add_argument("--workers", type=int, default=0,
+                           help="number of worker processes to perceive the tiles in (default: this process)")
+    replicatesParser.add_argument("--replicates", type=int, default=4, help="number of simulations to run")
+    replicatesParser.add_argument("--workers", type=int, default=0,
+                                  help="number of worker processes (default: run them all in this process)")
+    searchParser.add_argument("--searcher", choices=("hill", "beam", "ga"), default="hill",
+                              help="local search to use: hill climbing, beam search or a genetic algorithm")
+    searchParser.add_argument("--rounds", type=int, default=10, help="maximum number of rounds of the search")
+    searchParser.add_argument("--population", type=int, default=None,
+                              help="beam width or GA population size (default: the searcher's own)")
+    searchParser.add_argument("--workers", type=int, default=0,
+                              help="number of worker processes to score candidates in (default: this process)")
+    searchParser.add_argument("--cache", default=None,
+                              help="SQLite file to keep scores in, so later searches with the same settings reuse "
+                                   "them; needs --seed, since without one a score is a single random run")
+    args = parser.parse_args(argv)
+    if args.command == "search" and args.cache is not None and args.seed is None:
+        parser.error("--cache needs --seed: without one, a saved score would be one random run of the string")
+
+    if args.command == "replicates":
+        summary = runReplicates(args.replicates, args.grid, args.agents, args.steps, args.stones, args.forests,
+                                args.rivers, args.ponds, args.geneticStrings, args.seed, args.workers)
+    elif args.command == "search":
+        evaluator = SimEvaluator(args.grid, args.agents, args.steps, args.stones, args.forests, args.rivers,
+                                 args.ponds, args.seed)
+        cache = FitnessCache(path=args.cache)
+        try:
+            # the searchers print their progress, which would get mixed into the JSON
+            with contextlib.redirect_stdout(sys.stderr):
+                summary = runSearch(args.searcher, evaluator, args.rounds, args.population, args.workers, args.seed,
+                                    cache)
+        finally:
+            cache.close()
+        summary["seed"] = args.seed
+    elif args.command == "resume":
+        sim, elapsed = resumeSimulation(args.checkpoint, args.steps, args.checkpointEvery)
+        summary = summarize(sim, elapsed)
+        summary["seed"] = sim.rng.seed
+    else:
+        sim, elapsed = runSimulation(args.grid, args.agents, args.steps, args.stones, args.forests, args.rivers,
+                                     args.ponds, args.geneticStrings, args.seed, checkpoint=args.checkpoint,
+                                     checkpointEvery=args.checkpointEvery, record=args.record,
+                                     recordEvery=args.recordEvery, recordFields=args.recordFields.split(","),
+                                     synchronous=args.synchronous, batchPerception=args.batchPerception,
+                                     tiles=args.tiles, workers=args.workers)
+        summary = summarize(sim, elapsed)
+        summary["seed"] = args.seed
+
+    if args.output is None:
+        json.dump(summary, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as outFile:
+            json.dump(summary, outFile, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,10 +15,18 @@ import tkinter.filedialog as tkFileDialog
 from PIL import Image,ImageTk
 
 import ALifeSim
+from WorldTemplate import WorldTemplate
 from LocalSearchSolver import RulesetState, HillClimber, BeamSearcher, GASearcher
 
 class ALifeGUI:
     """Set up and manage all the variables for the GUI interface."""
+
+    # Patch color for each hour of the day, starting at midnight
+    TIME_COLORS = ["#686868", "#747474", "#808080", "#8c8c8c", "#999999", "#a5a5a5",
+                   "#b2b2b2", "#bfbfbf", "#cccccc", "#dadada", "#e7e7e7", "#f5f5f5",
+                   "#f5f5f5", "#e7e7e7", "#dadada", "#cccccc", "#bfbfbf", "#b2b2b2",
+                   "#a5a5a5", "#999999", "#8c8c8c", "#808080", "#747474", "#686868"]
+
     def __init__(self, gridDim, numAgents=10, maxSteps=100):
         """Given the dimension of the grid, and the number of agents set up a new Tk object of the right size"""
         self.root = Tk()
@@ -109,6 +117,8 @@ class ALifeGUI:
         print("The random genetic strings to be assigned to agents: " + str(randomGeneticStrings))
         print("--------------------------------------------------------------------------------------------")
         self.sim = ALifeSim.ALifeSimTest(self.gridDim, self.numberAgents, self.numberStones, self.numberForests, self.numberRivers, self.numberPonds, randomGeneticStrings)
+        # The world that rule strings are evaluated in, built by resetGridWorld
+        self.worldTemplate = None
 
         # Variables to hold the results of a simulation
         self.minTime = None
@@ -142,33 +152,7 @@ class ALifeGUI:
             print("Choosing randomly for genetic string #2")
 
         for n in range(self.numberAgents - len(randomGeneticStrings)):
-            randomVision = str(random.randint(1, 2))
-            randomSmell = str(random.randint(0, 2))
-            randomMovement = str(random.randint(1, 1))
-            randomAggression = str(random.randint(0, 1))
-            randomSleepType = str(random.randint(0, 1))
-            randomColor = str(random.randint(1, 9))
-            randomEnergy = str(random.randint(10, 60))
-            randomJump = str(random.choice([0, 0, 0, 1]))
-            randomSwim = str(random.choice([0, 0, 0, 1]))
-            randomFly = str(random.choice([0, 0, 0, 1]))
-            randomScavenge = str(random.choice([0, 0, 0, 1]))
-            randomSickness = str(random.choice([0, 0, 0, 0, 0, 1]))
-            randomResistance = str(random.randint(0, 9))
-
-            randomGeneticString = randomVision + \
-                                  randomSmell + \
-                                  randomMovement + \
-                                  randomAggression + \
-                                  randomSleepType + \
-                                  randomColor + \
-                                  randomEnergy + \
-                                  randomJump + \
-                                  randomSwim + \
-                                  randomFly + \
-                                  randomScavenge + \
-                                  randomSickness + \
-                                  randomResistance
+            randomGeneticString = ALifeSim.randomGeneticString()
             randomGeneticStrings.append(randomGeneticString)
             print("randomGeneticString: ", randomGeneticString)
         return randomGeneticStrings
@@ -406,14 +390,13 @@ class ALifeGUI:
         self.currentNode = None
 
     def _makeTimeBox(self):
-        """Sets up a box with an image to display the simulation's current time."""
+        """Sets up a box with an image to display the simulation's current time. The box is built once, and
+        _updateTimeBox changes its text and image when the time changes."""
         timeBoxFrame = Frame(self.root, bd=5, padx=10, pady=10, relief="groove", width=80, height=120)
         timeBoxFrame.grid(row=3, column=3, padx=5, pady=375, sticky=SE)
         timeBoxFrame.grid_propagate(0)
-        timeText = str(self.sim.time) + ":00"
-        timeBoxTitle = Label(timeBoxFrame, text=timeText, font="Arial 16 bold")
-        #TODO: replace "Time" with the current time as a number
-        timeBoxTitle.grid(row=0, column=1, columnspan=2, padx=5, pady=5)
+        self.timeBoxTitle = Label(timeBoxFrame, font="Arial 16 bold")
+        self.timeBoxTitle.grid(row=0, column=1, columnspan=2, padx=5, pady=5)
 
         #TODO: change where these images load - put them in the top w/ other images
         self.sunNoonImage=PhotoImage(file='images/time/sunNoon.png')
@@ -443,7 +426,7 @@ class ALifeGUI:
         self.sunTenImage = PhotoImage(file='images/time/sunTen.png')
         self.sunElevenImage = PhotoImage(file='images/time/sunEleven.png')
 
-        timeImages = [
+        self.timeImages = [
             self.moonMidnightImage,
             self.moonOneImage,
             self.moonTwoImage,
@@ -472,10 +455,19 @@ class ALifeGUI:
             self.moonElevenImage
         ]
 
-        stepsLabel = tkinter.Label(timeBoxFrame, image=timeImages[self.sim.time-1])
+        self.timeBoxImage = tkinter.Label(timeBoxFrame)
         # stepsLabel = tkinter.Canvas(timeBoxFrame)
         # stepsLabel.create_image(0,0,image=self.ghostImage, anchor="nw")
-        stepsLabel.grid(row=1, column=1)
+        self.timeBoxImage.grid(row=1, column=1)
+        self.shownTime = None
+        self._updateTimeBox()
+
+    def _updateTimeBox(self):
+        """Shows the simulation's current time in the time box, if it has changed since it was last shown."""
+        if self.sim.time != self.shownTime:
+            self.timeBoxTitle.config(text=str(self.sim.time) + ":00")
+            self.timeBoxImage.config(image=self.timeImages[self.sim.time-1])
+            self.shownTime = self.sim.time
 
     ### =================================================================
     ### The following are callbacks for buttons
@@ -487,7 +479,8 @@ class ALifeGUI:
     # Button callbacks for Edit buttons
     def resetGridWorld(self, ruleString=None):
         """This is both a callback for the New Grid button, but also called from other
-        places where the ruleString is set to a non-None value"""
+        places where the ruleString is set to a non-None value. The button builds a new world;
+        evaluating a rule string starts over in the world built last, if the settings still match it."""
         self._removeGridItems()
         self.canvas.delete('all')
 
@@ -512,8 +505,14 @@ class ALifeGUI:
             self._postMessage("Dimension must be positive integer.")
             return
 
-        self.sim = ALifeSim.ALifeSimTest(self.gridDim, self.numberAgents, self.numberStones, self.numberForests, self.numberRivers, self.numberPonds, self.generateRandomGeneticStrings())
+        template = self.worldTemplate
+        if ruleString is None or template is None or \
+                (template.gridSize, template.numStones, template.numForests, template.numRivers, template.numPonds) != \
+                (self.gridDim, self.numberStones, self.numberForests, self.numberRivers, self.numberPonds):
+            self.worldTemplate = WorldTemplate(self.gridDim, self.numberStones, self.numberForests, self.numberRivers, self.numberPonds)
+        self.sim = self.worldTemplate.clone(self.numberAgents, self.generateRandomGeneticStrings())
         self._buildTkinterGrid()
+        self._updateTimeBox()
         self.currSteps = 0
         self.currStepsText.set(self.currSteps)
         self.currentSearch = None
@@ -642,238 +641,144 @@ class ALifeGUI:
         """Runs one step of the simulation,
         then updates the GUI with new colors, object positions, and object states."""
         self.sim.step()
-        self._makeTimeBox()
-        for row in range(self.gridDim):
-            for col in range(self.gridDim):
-        #         food = self.sim.foodAt(row, col)
-        #
-        #         if food == 1:
-        #             (x1, y1, x2, y2) = self._posToCoords(row, col)
-        #             turnipImage = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.TurnipImage)
-        #             self.canvas.lift(turnipImage)
-                cellColor = self._determinePatchColor()
-                patchId = self.posToPatchId[row, col]
-                self.canvas.itemconfig(patchId, fill=cellColor, outline=cellColor)
-
-        # for object in self.sim.getObjects():
-        #     #TODO: Double-check this code to place objects in the GUI / is it necessary (since objects don't move)
-        #     obColor = object.colorNumberToText(object.getColor())
-        #     if object.getVisId() is None:
-        #         offsetCoords = self._determineObjectCoords(object)
-        #         coords = [(0 + x, 0 + y) for (x, y) in offsetCoords]
-        #         # print(coords)
-        #         # print(obColor)
-        #         obId = self.canvas.create_polygon(coords, fill=obColor, width=2)
-        #         self.agentIdToPose[obId] = object.getPose()
-        #         object.setVisId(obId)
-        #
-        #     id = object.getVisId()
-        #     self.canvas.itemconfig(id, fill=obColor)
-        #
-        #     (newRow, newCol) = object.getPose()
-        #     (x1, y1, x2, y2) = self._posToCoords(newRow, newCol)
-        #     offsetCoords = self._determineObjectCoords(object)
-        #     coords = [(x1 + x, y1 + y) for (x, y) in offsetCoords]
-        #     flatCoords = [n for subl in coords for n in subl]
-        #     self.canvas.coords(id, flatCoords)
-        #     self.canvas.lift(id)
-        #
-        #     self.agentIdToPose[id] = object.getPose()
-        # (x1, y1, x2, y2) = self._posToCoords(treeRow, treeCol)
-        for tr in self.sim.getTrees():
-            (newRow, newCol) = tr.getPose()
-            # print("New coords:",newRow,newCol)
-            (x1, y1, x2, y2) = self._posToCoords(newRow, newCol)
-
-            # print("TREE IN GUI")
-            if tr.getVisId() is None:
-                if tr.getHasFood() == "-1":
-                    # print("NO FOOD")
-                    trId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.seedsImage)
-                    self.agentIdToPose[trId] = tr.getPose()
-                    tr.setVisId(trId)
-                    self.canvas.lift(trId)
-                    tr.setJustChangedBloom(False)
-                elif tr.getHasFood() == "0":
-                    # print("NO FOOD")
-                    trId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.treeImage)
-                    self.agentIdToPose[trId] = tr.getPose()
-                    tr.setVisId(trId)
-                    self.canvas.lift(trId)
-                    tr.setJustChangedBloom(False)
-                elif tr.getHasFood() == "1":
-                    # print("FOOD")
-                    trId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.treeFruitImage)
-                    self.agentIdToPose[trId] = tr.getPose()
-                    tr.setVisId(trId)
-                    self.canvas.lift(trId)
-                    tr.setJustChangedBloom(False)
-
-            # finds tree tkinter object id
-            id = tr.getVisId()
-            # print(id)
-
-            # self.canvas.create_oval(x1, y1, x2, y2, outline="black", fill=agColor, width=2)
-            # self.canvas.create_image(x1, y1, image=self.ghostImage)
-            # ghostGuy = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.ghostImage)
-            # tr.setVisId(ghostGuy)
-            # self.canvas.lift(ghostGuy)
-            if tr.getHasFood() == '-1' and tr.justChanged == True:
-                # deletes the object
-                self.canvas.delete(id)
-                trId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.seedsImage)
-                self.agentIdToPose[trId] = tr.getPose()
-                tr.setVisId(trId)
-                self.canvas.lift(trId)
-                tr.setJustChangedBloom(False)
-            elif tr.getHasFood() == '0' and tr.justChanged == True:
-                # deletes the object
-                self.canvas.delete(id)
-                trId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.treeImage)
-                self.agentIdToPose[trId] = tr.getPose()
-                tr.setVisId(trId)
-                self.canvas.lift(trId)
-                tr.setJustChangedBloom(False)
-            elif tr.getHasFood() == '1' and tr.justChanged == True:
-                # deletes the object
-                self.canvas.delete(id)
-                trId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.treeFruitImage)
-                self.agentIdToPose[trId] = tr.getPose()
-                tr.setVisId(trId)
-                self.canvas.lift(trId)
-                tr.setJustChangedBloom(False)
-
-        for mu in self.sim.getMushrooms():
-            (newRow, newCol) = mu.getPose()
-            # print("New coords:",newRow,newCol)
-            (x1, y1, x2, y2) = self._posToCoords(newRow, newCol)
-
-            if mu.getVisId() is None:
-                if mu.getDroppingType() == 0:
-                    muId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.sporesImage)
-                    self.agentIdToPose[muId] = mu.getPose()
-                    mu.setVisId(muId)
-                    self.canvas.lift(muId)
-                    mu.setJustChanged(False)
-                elif mu.getDroppingType() == 1:
-                    muId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.mushroomImage)
-                    self.agentIdToPose[muId] = mu.getPose()
-                    mu.setVisId(muId)
-                    self.canvas.lift(muId)
-                    mu.setJustChanged(False)
-
-            # finds tree tkinter object id
-            id = mu.getVisId()
-            # print(id)
-
-            # self.canvas.create_oval(x1, y1, x2, y2, outline="black", fill=agColor, width=2)
-            # self.canvas.create_image(x1, y1, image=self.ghostImage)
-            # ghostGuy = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.ghostImage)
-            # tr.setVisId(ghostGuy)
-            # self.canvas.lift(ghostGuy)
-
-            if mu.getDroppingType() == 0 and mu.justChanged == True:
-                # deletes the object
-                self.canvas.delete(id)
-                muId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.sporesImage)
-                self.agentIdToPose[muId] = mu.getPose()
-                mu.setVisId(muId)
-                self.canvas.lift(muId)
-                mu.setJustChanged(False)
-            elif mu.getDroppingType() == 1 and mu.justChanged == True:
-                # deletes the object
-                self.canvas.delete(id)
-                muId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.mushroomImage)
-                self.agentIdToPose[muId] = mu.getPose()
-                mu.setVisId(muId)
-                self.canvas.lift(muId)
-                mu.setJustChanged(False)
-
-        for agent in self.sim.getAgents():
-            # agColor = self._determineAgentColor(agent.getEnergy())
-            agColor = self._UpdateAgentColor(agent.getColor(), agent.getEnergy())
-            newColor = self.tintColor(agent)
+        self._updateTimeBox()
+
+        # Every patch has the same color, so when the time of day changes they are all recolored in one call
+        cellColor = self._determinePatchColor()
+        if cellColor != self.patchColor:
+            self.canvas.itemconfig("patch", fill=cellColor, outline=cellColor)
+            self.patchColor = cellColor
+
+        # Only what happened in this step is redrawn
+        for event in self.events.drain():
+            ob = event.ob
+            if event.kind == "spawned" or event.kind == "moved":
+                if isinstance(ob, ALifeSim.Agent):
+                    self._drawAgent(ob)
+                elif isinstance(ob, ALifeSim.Tree):
+                    self._drawTree(ob)
+                elif isinstance(ob, ALifeSim.Mushroom):
+                    self._drawMushroom(ob)
+                elif isinstance(ob, ALifeSim.Food):
+                    self._drawFood(ob)
+            elif event.kind == "bloomed":
+                self._drawTree(ob)
+            elif event.kind == "sporulated":
+                self._drawMushroom(ob)
+            elif event.kind == "changed":
+                if ob.getVisId() is not None:
+                    self._drawAgentLook(ob)
+            elif event.kind == "ate" or event.kind == "died":
+                #TODO: make dead agents fade out over time
+                id = ob.getVisId()
+                if id is not None:
+                    self.canvas.delete(id)
+                    self.agentIdToPose.pop(id, None)
+                    self.agentIdToLook.pop(id, None)
+
+        # New trees, spores and food are drawn on top, so agents are raised back over them
+        self.canvas.tag_raise("agent")
+
+        if len(self.sim.getAgents()) == 0:
+            return False
+
+        self.currSteps += 1
+        self.currStepsText.set(self.currSteps)
+        return True
+
+    def _drawAgent(self, agent):
+        """Shows an agent at its current pose, creating its canvas item if it has none yet."""
+        pose = agent.getPose()
+        (newRow, newCol, newHead) = pose
+        (x1, y1, x2, y2) = self._posToCoords(newRow, newCol)
+        offsetCoords = self._determineAgentCoords(agent)
+        coords = [(x1 + x, y1 + y) for (x, y) in offsetCoords]
 
+        if agent.getVisId() is None:
+            newColor = self.tintColor(agent)
             if agent.isSick:
                 agOutlineType = (3, 5)
             else:
                 agOutlineType = (1, 1)
 
-            if agent.getVisId() is None:
-                offsetCoords = self._determineAgentCoords(agent)
-
-                if agent.getAggression() == 1:
-                    agentOutlineColor = "red"
-                else:
-                    agentOutlineColor = "blue"
-
-                coords = [(x1 + x, y1 + y) for (x, y) in offsetCoords]
-                if self.sim.gridSize >= 10:
-                    agId = self.canvas.create_polygon(coords, outline=agentOutlineColor, dash=agOutlineType, fill=newColor, width=(20/self.sim.gridSize))
-                else:
-                    agId = self.canvas.create_polygon(coords, outline=agentOutlineColor, dash=agOutlineType, fill=newColor,width=(2))
-                self.agentIdToPose[agId] = agent.getPose()
-                agent.setVisId(agId)
+            if agent.getAggression() == 1:
+                agentOutlineColor = "red"
+            else:
+                agentOutlineColor = "blue"
 
-                # print("BABY ID: " + str(agent.getVisId()))
+            if self.sim.gridSize >= 10:
+                agId = self.canvas.create_polygon(coords, outline=agentOutlineColor, dash=agOutlineType, fill=newColor, width=(20/self.sim.gridSize), tags="agent")
+            else:
+                agId = self.canvas.create_polygon(coords, outline=agentOutlineColor, dash=agOutlineType, fill=newColor,width=(2), tags="agent")
+            self.agentIdToPose[agId] = pose
+            self.agentIdToLook[agId] = (newColor, agOutlineType)
+            agent.setVisId(agId)
 
+        elif self.agentIdToPose.get(agent.getVisId()) != pose:
             id = agent.getVisId()
-            self.canvas.itemconfig(id, fill=newColor, dash=agOutlineType)
-
-            # (oldRow, oldCol, oldHead) = self.agentIdToPose[id]
-            (newRow, newCol, newHead) = agent.getPose()
-            (x1, y1, x2, y2) = self._posToCoords(newRow, newCol)
-            offsetCoords = self._determineAgentCoords(agent)
-            coords = [(x1 + x, y1 + y) for (x, y) in offsetCoords]
             flatCoords = [n for subl in coords for n in subl]
             self.canvas.coords(id, flatCoords)
             self.canvas.lift(id)
+            self.agentIdToPose[id] = pose
 
-            self.agentIdToPose[id] = agent.getPose()
-
-        for eatenFood in self.sim.getEatenFood():
-            # finds eaten food tkinter object id
-            id = eatenFood[0].getVisId()
-            self.canvas.delete(id)
-
-            # (newRow, newCol) = eatenFood[0].getPose()
-            # (x1, y1, x2, y2) = self._posToCoords(newRow, newCol)
-
-            # self.canvas.create_oval(x1, y1, x2, y2, outline="black", fill=agColor, width=2)
-            # self.canvas.create_image(x1, y1, image=self.ghostImage)
-            # ghostGuy = self.canvas.create_image((x1 + x2)/2, (y1 + y2) / 2, image=self.ghostImage)
-            # self.canvas.lift(ghostGuy)
-
-        for eatenMushrooms in self.sim.getEatenMushrooms():
-            # finds eaten mushroom tkinter object id
-            id = eatenMushrooms[0].getVisId()
-            self.canvas.delete(id)
-
-        for deadAgent in self.sim.getDeadAgents():
-            #TODO: make this fade out over time
-
-            # finds dead agent tkinter object id
-            id = deadAgent[0].getVisId()
-
-            # deletes the object
-            self.canvas.delete(id)
-
-            (newRow, newCol, newHead) = deadAgent[0].getPose()
-            (x1, y1, x2, y2) = self._posToCoords(newRow, newCol)
-
-            # self.canvas.create_oval(x1, y1, x2, y2, outline="black", fill=agColor, width=2)
-            # self.canvas.create_image(x1, y1, image=self.ghostImage)
-            # ghostGuy = self.canvas.create_image((x1 + x2)/2, (y1 + y2) / 2, image=self.ghostImage)
-            # deadAgent[0].setVisId(ghostGuy)
-            # self.canvas.lift(ghostGuy)
-
+    def _drawAgentLook(self, agent):
+        """Changes an agent's fill and outline if its color or sickness has changed since it was last drawn."""
+        newColor = self.tintColor(agent)
+        if agent.isSick:
+            agOutlineType = (3, 5)
+        else:
+            agOutlineType = (1, 1)
 
-        if len(self.sim.getAgents()) == 0:
-            return False
+        id = agent.getVisId()
+        if id is None:
+            self._drawAgent(agent)
+        elif self.agentIdToLook.get(id) != (newColor, agOutlineType):
+            self.canvas.itemconfig(id, fill=newColor, dash=agOutlineType)
+            self.agentIdToLook[id] = (newColor, agOutlineType)
+
+    def _drawFood(self, fd):
+        """Shows a new food object."""
+        if fd.getVisId() is None:
+            (x1, y1, x2, y2) = self._posToCoords(*fd.getPose())
+            fdId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=self.turnipImage)
+            self.agentIdToPose[fdId] = fd.getPose()
+            fd.setVisId(fdId)
+
+    def _drawTree(self, tr):
+        """Shows a tree with the image for its current food state, creating its canvas item if it has none yet."""
+        if tr.getHasFood() == "-1":
+            image = self.seedsImage
+        elif tr.getHasFood() == "0":
+            image = self.treeImage
+        else:
+            image = self.treeFruitImage
+
+        if tr.getVisId() is None:
+            (x1, y1, x2, y2) = self._posToCoords(*tr.getPose())
+            trId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=image)
+            self.agentIdToPose[trId] = tr.getPose()
+            tr.setVisId(trId)
+            self.canvas.lift(trId)
+        else:
+            self.canvas.itemconfig(tr.getVisId(), image=image)
+        tr.setJustChangedBloom(False)
 
-        self.currSteps += 1
-        self.currStepsText.set(self.currSteps)
-        return True
+    def _drawMushroom(self, mu):
+        """Shows a mushroom as spores or grown, creating its canvas item if it has none yet."""
+        if mu.getDroppingType() == 0:
+            image = self.sporesImage
+        else:
+            image = self.mushroomImage
+
+        if mu.getVisId() is None:
+            (x1, y1, x2, y2) = self._posToCoords(*mu.getPose())
+            muId = self.canvas.create_image((x1 + x2) / 2, (y1 + y2) / 2, image=image)
+            self.agentIdToPose[muId] = mu.getPose()
+            mu.setVisId(muId)
+            self.canvas.lift(muId)
+        else:
+            self.canvas.itemconfig(mu.getVisId(), image=image)
+        mu.setJustChanged(False)
 
     def reportSimResult(self):
         """Reports statistics on how the simulation came out."""
@@ -1035,6 +940,10 @@ class ALifeGUI:
         self.patchIdToPos = {}
         self.posToPatchId = {}
         self.agentIdToPose = {}
+        self.agentIdToLook = {}
+        self.patchColor = self._determinePatchColor()
+        # The grid is drawn from the simulation as it is now, and kept up to date from its events after that
+        self.events = self.sim.subscribe()
 
         self.resizeAllImages()
 
@@ -1047,7 +956,7 @@ class ALifeGUI:
             for col in range(self.gridDim):
                 (x1, y1, x2, y2) = self._posToCoords(row, col)
                 cellColor = self._determinePatchColor()
-                currId = self.canvas.create_rectangle(x1, y1, x2, y2, fill=cellColor, outline=cellColor)
+                currId = self.canvas.create_rectangle(x1, y1, x2, y2, fill=cellColor, outline=cellColor, tags="patch")
                 self.patchIdToPos[currId] = (row, col)
                 self.posToPatchId[row, col] = currId
                 agents = self.sim.agentsAt(row, col)
@@ -1253,58 +1162,7 @@ class ALifeGUI:
 
     def _determinePatchColor(self):
         """Determines the color of the grid based on the simulation's time attribute."""
-        oneAM = "#747474"
-        twoAM = "#808080"
-        threeAM = "#8c8c8c"
-        fourAM = "#999999"
-        fiveAM = "#a5a5a5"
-        sixAM = "#b2b2b2"
-        sevenAM = "#bfbfbf"
-        eightAM = "#cccccc"
-        nineAM = "#dadada"
-        tenAM = "#e7e7e7"
-        elevenAM = "#f5f5f5"
-        noon = "#f5f5f5"
-        onePM = "#e7e7e7"
-        twoPM = "#dadada"
-        threePM = "#cccccc"
-        fourPM = "#bfbfbf"
-        fivePM = "#b2b2b2"
-        sixPM = "#a5a5a5"
-        sevenPM = "#999999"
-        eightPM = "#8c8c8c"
-        ninePM = "#808080"
-        tenPM = "#747474"
-        elevenPM = "#686868"
-        midnight = "#686868"
-
-        timeColors = []
-        timeColors.append(midnight)
-        timeColors.append(oneAM)
-        timeColors.append(twoAM)
-        timeColors.append(threeAM)
-        timeColors.append(fourAM)
-        timeColors.append(fiveAM)
-        timeColors.append(sixAM)
-        timeColors.append(sevenAM)
-        timeColors.append(eightAM)
-        timeColors.append(nineAM)
-        timeColors.append(tenAM)
-        timeColors.append(elevenAM)
-        timeColors.append(noon)
-        timeColors.append(onePM)
-        timeColors.append(twoPM)
-        timeColors.append(threePM)
-        timeColors.append(fourPM)
-        timeColors.append(fivePM)
-        timeColors.append(sixPM)
-        timeColors.append(sevenPM)
-        timeColors.append(eightPM)
-        timeColors.append(ninePM)
-        timeColors.append(tenPM)
-        timeColors.append(elevenPM)
-
-        cellColor = timeColors[self.sim.time-1]
+        cellColor = self.TIME_COLORS[self.sim.time-1]
 
         return cellColor
 
@@ -1408,6 +1266,7 @@ class ALifeGUI:
         self.posToPatchId = {}
         self.patchIdToPos = {}
         self.agentIdToPose = {}
+        self.agentIdToLook = {}
 
 
     # -------------------------------------------------
@@ -1,7 +1,6 @@
 import random
-import tkinter
 import math
-from ALifeGUI import *
+import numpy as np
 
 # Import all objects used in the simulation.
 from Object import *
@@ -15,6 +14,34 @@ from Sand import *
 from Snow import *
 from Grass import *
 from Mushroom import *
+from SpatialIndex import SpatialIndex, NO_OBJECTS
+from TerrainLayers import TerrainLayers
+from WorldGen import WorldGen
+from FreeCells import FreeCells
+from AgentPopulation import AgentPopulation
+from EventLog import EventLog
+from SmellEngine import SmellEngine
+from Perception import perceive
+from RandomStreams import RandomStreams
+
+def randomGeneticString(rng=random):
+    """Returns a random 14-digit genetic string, drawing from the given random.Random-like generator."""
+    randomVision = str(rng.randint(1, 2))
+    randomSmell = str(rng.randint(0, 2))
+    randomMovement = str(rng.randint(1, 1))
+    randomAggression = str(rng.randint(0, 1))
+    randomSleepType = str(rng.randint(0, 1))
+    randomColor = str(rng.randint(1, 9))
+    randomEnergy = str(rng.randint(10, 60))
+    randomJump = str(rng.choice([0, 0, 0, 1]))
+    randomSwim = str(rng.choice([0, 0, 0, 1]))
+    randomFly = str(rng.choice([0, 0, 0, 1]))
+    randomScavenge = str(rng.choice([0, 0, 0, 1]))
+    randomSickness = str(rng.choice([0, 0, 0, 0, 0, 1]))
+    randomResistance = str(rng.randint(0, 9))
+    return randomVision + randomSmell + randomMovement + randomAggression + randomSleepType + randomColor + \
+           randomEnergy + randomJump + randomSwim + randomFly + randomScavenge + randomSickness + randomResistance
+
 
 class ALifeSimTest(object):
     """An artificial life predator/prey simulation, similar to NetLogo, with agents that each perform their own
@@ -25,6 +52,9 @@ class ALifeSimTest(object):
     NEW_FOOD_PERCENT = 0.005
     GROWTH_RATE = 0.005
     MAX_FOOD = 1
+    PAUSE_STEPS = 3
+    # The order in which synchronous steps carry out each kind of action (see _resolveIntents); the rest go in 1.
+    ACTION_PHASES = {'attack': 0, 'forward': 2}
     time = 12
     numStones = 15
     numForest = 0
@@ -38,9 +68,17 @@ class ALifeSimTest(object):
     numGrass = 0
     numMushrooms = 0
 
-    def __init__(self, gridSize, numAgents, numStones, numForests, numRivers, numPonds, geneticStrings):
+    def __init__(self, gridSize, numAgents, numStones, numForests, numRivers, numPonds, geneticStrings, seed=None,
+                 terrain=None, template=None):
         """Takes in the side length of the grid, as well as what objects to place in the simulation.
-        Creates the simulation and initializes variables based on the input."""
+        Creates the simulation and initializes variables based on the input. The same seed always gives the same
+        world and, with the same genetic strings, the same run. If a TerrainLayers is given, the simulation stands
+        on it instead of making water, stones, pits, grass, sand and snow of its own; the terrain is not copied,
+        so any number of simulations can share one, in other processes too if it has been shared (see
+        TerrainLayers.share). If a WorldTemplate is given, the simulation starts with copies of its trees,
+        mushrooms and food on its terrain, and only the agents are placed anew; with no seed, the random numbers
+        carry on from where the template's left off, so the run is the same as a new simulation with the
+        template's seed would give. Checkpoint.loadCheckpoint starts a simulation from a saved one the same way."""
         self.gridSize = gridSize
         self.numAgents = numAgents
         self.numStones = numStones
@@ -58,49 +96,90 @@ class ALifeSimTest(object):
 
         self.initialGeneticStrings = geneticStrings
         self.maxFood = 0
+        # Only holds the cells that have agents, food, mushrooms or trees in them; static terrain lives in
+        # self.terrain instead.
         self.globalMap = dict()
 
-        for row in range(gridSize):
-            for col in range(gridSize):
-                self.globalMap[row, col] = []
-
-        self.foodList = []
-        self.stoneList = []
-        self.pitList = []
-        self.grassDict = {}
-        self.sandDict = {}
-        self.snowDict = {}
-        self.mushroomList = []
-        self.waterList = []
+        # Food and mushrooms are kept in dicts used as insertion-ordered sets (every value is None), so that an
+        # eaten one can be taken out in constant time.
+        self.food = dict()
+        self.mushrooms = dict()
         self.treeList = []
         self.agentList = []
         self.deadAgents = []
-        self.eatenFood = []
-        self.eatenMushrooms = []
+        self.numDying = 0
+        # How many agents have died, the total of their lifespans and the longest, kept whether or not deadAgents is
+        self.numDead = 0
+        self.deadLifespanTotal = 0
+        self.deadLifespanMax = 0
+        # If False, agents that die are not kept in deadAgents, so a long run does not pile them up; a
+        # TrajectoryRecorder can keep track of them instead.
+        self.keepDeadAgents = True
         self.agentList = []
         self.stepNum = 0
         self.verbose = False
-
-        for row in range(self.gridSize):
-            for col in range(self.gridSize):
-                self.grassDict[row,col] = []
-                self.sandDict[row,col] = []
-                self.snowDict[row,col] = []
-
-        self._placeWaters()
-
-        # objects w/ no effect
-        self._placeGrass()
-        self._placeSand()
-        self._placeSnow()
-
-        # inanimate objects
-        # self._placeTreesOnHalf()
-        self._placePits()
-        self._placeMushrooms()
-        self._placeTrees(self.numForests, random.randint(3, 10))
-        self._placeStones()
-        self._placeFood()
+        # If True, every agent decides from what was where at the start of the step (see Perception), instead of
+        # from the world as the agents before it in agentList have left it.
+        self.batchPerception = False
+        # If True, every agent decides first, from the world as it was at the start of the step, and then all the
+        # actions are carried out (see _collectIntents and _resolveIntents), so the order of agentList does not
+        # matter.
+        self.synchronous = False
+        # A TiledPerception to split that start-of-step perception across tiles and worker processes, for big grids.
+        self.tiles = None
+
+        # Per-type occupancy of every cell, kept in step with the globalMap by addObject/removeObject/moveObject.
+        self.index = SpatialIndex()
+        # Water, stones, pits, grass, sand and snow, one boolean grid per kind.
+        if template is not None:
+            terrain = template.terrain
+        if terrain is None:
+            self.terrain = TerrainLayers(gridSize)
+        elif terrain.gridSize != gridSize:
+            raise ValueError("Terrain is for a grid of size " + str(terrain.gridSize) + ", not " + str(gridSize))
+        else:
+            self.terrain = terrain
+        # The cells that isEmpty would say are empty, for picking places to put new objects.
+        self.freeCells = FreeCells(gridSize)
+        self.freeCells.discardMask(self.terrain.solid)
+        # The order in which _assessObjectsHere decides which object in a cell matters most.
+        self.assessOrder = (self.treeAt, self.stonesAt, self.agentsAt, self.foodAt, self.waterAt, self.mushroomAt,
+                            self.pitAt)
+        # All randomness in the simulation comes from these streams.
+        if template is not None and seed is None:
+            self.rng = template.randomStreams()
+        else:
+            self.rng = RandomStreams(seed)
+        self.worldGen = WorldGen(gridSize, self.rng.worldArrays)
+        # The state of every living agent, kept in parallel arrays so per-step updates can be done all at once.
+        self.population = AgentPopulation(max(64, numAgents))
+        # Where dead agents' state is moved, so that their slots in self.population can be reused.
+        self.graveyard = AgentPopulation()
+        # What happens each step, for the GUI and anything else that wants to follow along.
+        self.events = EventLog()
+        # Counts of the things agents can smell in each cell, kept up to date by addObject and removeObject.
+        self.smell = SmellEngine(gridSize, self.terrain.solid)
+
+        if template is not None:
+            template.copyWorldInto(self)
+        else:
+            if terrain is None:
+                self._placeWaters()
+
+                # objects w/ no effect
+                self._placeGrass()
+                self._placeSand()
+                self._placeSnow()
+
+            # inanimate objects
+            # self._placeTreesOnHalf()
+            if terrain is None:
+                self._placePits()
+            self._placeMushrooms()
+            self._placeTrees(self.numForests, self.rng.world.randint(3, 10))
+            if terrain is None:
+                self._placeStones()
+            self._placeFood()
 
         # agent objects
         self._placeAgents()
@@ -116,8 +195,8 @@ class ALifeSimTest(object):
         return self.numAgents
 
     def getFood(self):
-        """Returns the list of food objects"""
-        return self.foodList[:]
+        """Returns a view of the food objects, which changes as food is eaten and added"""
+        return self.food.keys()
 
     def getAgents(self):
         """Returns the list of agent objects"""
@@ -125,31 +204,31 @@ class ALifeSimTest(object):
 
     def getStones(self):
         """Returns the list of stone objects"""
-        return self.stoneList[:]
+        return self.terrain.objects(Stone)
 
     def getPits(self):
         """Returns the list of pit objects"""
-        return self.pitList[:]
+        return self.terrain.objects(Pit)
 
     def getMushrooms(self):
-        """Returns the list of mushroom objects"""
-        return self.mushroomList[:]
+        """Returns a view of the mushroom objects, which changes as mushrooms are eaten and added"""
+        return self.mushrooms.keys()
 
     def getGrass(self):
-        """Returns the list of grass objects, with the keys being their row and col numbers"""
-        return self.grassDict[:]
+        """Returns the list of grass objects"""
+        return self.terrain.objects(Grass)
 
     def getSands(self):
-        """Returns the list of sand objects, with the keys being their row and col numbers"""
-        return self.sandDict[:]
+        """Returns the list of sand objects"""
+        return self.terrain.objects(Sand)
 
     def getSnows(self):
-        """Returns the list of snow objects, with the keys being their row and col numbers"""
-        return self.snowDict[:]
+        """Returns the list of snow objects"""
+        return self.terrain.objects(Snow)
 
     def getWaters(self):
         """Returns the list of water objects"""
-        return self.waterList[:]
+        return self.terrain.objects(Water)
 
     def getTrees(self):
         """Returns the list of tree objects"""
@@ -159,97 +238,68 @@ class ALifeSimTest(object):
         """Returns a list of the dead agents."""
         return self.deadAgents
 
-    def getEatenFood(self):
-        """Returns a list of the food eaten."""
-        return self.eatenFood[:]
+    def subscribe(self, kinds=None):
+        """Returns an EventQueue that collects what happens in the simulation from now on (see EventLog)."""
+        return self.events.subscribe(kinds)
 
-    def getEatenMushrooms(self):
-        """Returns a list of the mushrooms eaten."""
-        return self.eatenMushrooms[:]
+    def publish(self, kind, ob, agent=None):
+        """Records that something happened in the current step."""
+        self.events.publish(kind, ob, self.stepNum, agent)
 
     # =================================================================
     # Checking the grid functions
+    # The typed queries hand back the spatial index's and terrain layers' own lists, so callers must not modify
+    # what they return.
     def stonesAt(self, row, col):
         """Given a row and column, returns a list of the stones at that location."""
-        objectsHereList = self.globalMap[row, col].copy()
-        stonesAtList = objectsHereList.copy()
-        for ob in objectsHereList:
-            if type(ob) is not Stone:
-                stonesAtList.remove(ob)
-        return stonesAtList
+        return self.terrain.objectsAt(Stone, row, col)
 
     def pitAt(self, row, col):
         """Given a row and column, returns a list of the pits at that location."""
-        objectsHereList = self.globalMap[row, col].copy()
-        pitsAtList = objectsHereList.copy()
-        for ob in objectsHereList:
-            if type(ob) is not Pit:
-                pitsAtList.remove(ob)
-        return pitsAtList
+        return self.terrain.objectsAt(Pit, row, col)
 
     def mushroomAt(self, row, col):
         """Given a row and column, returns a list of the mushrooms at that location."""
-        objectsHereList = self.globalMap[row, col].copy()
-        mushroomsAtList = objectsHereList.copy()
-        for ob in objectsHereList:
-            if type(ob) is not Mushroom:
-                mushroomsAtList.remove(ob)
-        return mushroomsAtList
+        return self.index.objectsAt(Mushroom, row, col)
 
     def grassAt(self, row, col):
         """Given a row and column, returns a list of the grass objects at that location."""
-        return self.grassDict[row,col]
+        return self.terrain.objectsAt(Grass, row, col)
 
     def sandAt(self, row, col):
         """Given a row and column, returns a list of the sand objects at that location."""
-        return self.sandDict[row,col]
+        return self.terrain.objectsAt(Sand, row, col)
 
     def snowAt(self, row, col):
         """Given a row and column, returns a list of the snow objects at that location."""
-        return self.snowDict[row,col]
+        return self.terrain.objectsAt(Snow, row, col)
 
     def waterAt(self,row,col):
         """Given a row and column, returns a list of the water objects at that location."""
-        objectsHereList = self.globalMap[row, col].copy()
-        waterAtList = objectsHereList.copy()
-        for ob in objectsHereList:
-            if type(ob) is not Water:
-                waterAtList.remove(ob)
-        return waterAtList
+        return self.terrain.objectsAt(Water, row, col)
 
     def treeAt(self,row,col):
         """Given a row and column, returns a list of the tree objects at that location."""
-        objectsHereList = self.globalMap[row, col].copy()
-        treeAtList = objectsHereList.copy()
-        for ob in objectsHereList:
-            if type(ob) is not Tree:
-                treeAtList.remove(ob)
-        return treeAtList
+        return self.index.objectsAt(Tree, row, col)
 
     def foodAt(self, row, col):
         """Given a row and column, returns a list of the food objects at that location."""
-        objectsHereList = self.globalMap[row, col].copy()
-        foodAtList = objectsHereList.copy()
-        for ob in objectsHereList:
-            if type(ob) is Food:
-                return [ob]
-        return []
-        #TODO: There used to be a bug here where it would fail to remove some objects that were not food.
-        # This caused len(this list) to be > 1, which caused agents to choose 'eat' over and over.
-        # How to test if it's fixed?
+        return self.index.objectsAt(Food, row, col)
 
     def agentsAt(self, row, col):
         """Given a row and column, returns a list of the agents at that location."""
-        objectsHereList = self.globalMap[row, col].copy()
-        agentAtList = objectsHereList.copy()
-        for ob in objectsHereList:
-            if type(ob) is not Agent:
-                agentAtList.remove(ob)
-        return agentAtList
+        return self.index.objectsAt(Agent, row, col)
 
     def objectsAt(self, row, col):
-        """Given a row and column, returns a list of all objects at the location."""
-        return self.globalMap[row, col]
+        """Given a row and column, returns a list of all objects at the location, other than grass, sand and snow."""
+        objectsHere = self.globalMap.get((row, col), NO_OBJECTS)
+        if self.terrain.solid[row, col]:
+            return self.terrain.solidObjectsAt(row, col) + list(objectsHere)
+        return objectsHere
+
+    def isEmpty(self, row, col):
+        """Returns True if nothing but grass, sand or snow is at the location."""
+        return (row, col) not in self.globalMap and not self.terrain.solid[row, col]
 
     def _assessFood(self, row, col):
         """Given a row and column, examine the food there, and return 3 if food exists there."""
@@ -265,7 +315,7 @@ class ALifeSimTest(object):
         no creatures, friendly creatures, and enemy creatures, returning 0, 2, or 1 respectively."""
         creatureAmt = self.agentsAt(row,col)
 
-        if creatureAmt == []:
+        if len(creatureAmt) == 0:
             return 0
 
         elif len(creatureAmt) >= 1:
@@ -291,31 +341,17 @@ class ALifeSimTest(object):
             return 2
 
     def _assessObjectsHere(self, row, col, agent):
-        """Given a row and column, examine the objects there, return a number corresponding to the most
-        important object there."""
-        listOfObjects = self.globalMap[row, col]
-        # print("listOfObjects",listOfObjects)
-        if listOfObjects != []:
-            if len(agent.removeSelfFromList(self.treeAt(row, col))) > 0:
-                return agent.removeSelfFromList(self.treeAt(row, col))[0]
-            elif len(agent.removeSelfFromList(self.stonesAt(row, col))) > 0:
-                return agent.removeSelfFromList(self.stonesAt(row, col))[0]
-            elif len(agent.removeSelfFromList(self.agentsAt(row, col))) > 0:
-                return agent.removeSelfFromList(self.agentsAt(row, col))[0]
-            elif len(agent.removeSelfFromList(self.foodAt(row, col))) > 0:
-                return agent.removeSelfFromList(self.foodAt(row, col))[0]
-            elif len(agent.removeSelfFromList(self.waterAt(row, col))) > 0:
-                return agent.removeSelfFromList(self.waterAt(row, col))[0]
-            elif len(agent.removeSelfFromList(self.mushroomAt(row, col))) > 0:
-                return agent.removeSelfFromList(self.mushroomAt(row, col))[0]
-            elif len(agent.removeSelfFromList(self.pitAt(row, col))) > 0:
-                return agent.removeSelfFromList(self.pitAt(row, col))[0]
+        """Given a row and column, examine the objects there, return the most important object there
+        other than the agent itself, or None if there is nothing."""
+        for objectsOfTypeAt in self.assessOrder:
+            for ob in objectsOfTypeAt(row, col):
+                if ob is not agent:
+                    return ob
         return None
 
     def _listOfObjectsHere(self, row, col, agent):
-        """Looks at the global map, returns all objects at a location."""
-        listOfObjects = self.globalMap[row, col].copy()
-        return listOfObjects
+        """Looks at the global map, returns all objects at a location. The list must not be modified."""
+        return self.objectsAt(row, col)
 
     def _agentStringCodes(self, row, col):
         """Produces three strings for the first three agents (if that many) sitting in the given cell."""
@@ -323,7 +359,7 @@ class ALifeSimTest(object):
         agentStr = "{0:s}{1:<3d}|"
         emptyStr = "    |"
         strings = [emptyStr, emptyStr, emptyStr]
-        agentsHere = self.globalMap[row, col]
+        agentsHere = self.agentsAt(row, col)
         for i in range(3):
             if len(agentsHere) > i:
                 agent = agentsHere[i]
@@ -338,146 +374,56 @@ class ALifeSimTest(object):
         """Places food objects in random clumps so that roughly self.percentFood cells have food."""
         totalCells = self.gridSize ** 2
         foodClumps = int(self.FOOD_PERCENT * totalCells)
-        for i in range(foodClumps):
-            self._addFoodClump()
+        for (randRow, randCol) in self.freeCells.sampleMany(foodClumps, self.rng.world):
+            self._addFoodClump(randRow, randCol)
 
     def _placeAgents(self):
         """Places agent objects randomly, avoiding locations where the globalMap already contains something"""
-        for i in range(self.numAgents):
-            while True:
-                agentPose = self._genRandomPose()
-                (r, c, h) = agentPose
-                if len(self.globalMap[r, c]) == 0:
-                    break
+        for i, (r, c) in enumerate(self.freeCells.sampleMany(self.numAgents, self.rng.world)):
+            agentPose = (r, c, self.rng.world.choice(['n', 'e', 'w', 's']))
 
             if self.initialGeneticStrings is None or len(self.initialGeneticStrings) <= i:
-                nextAgent = Agent(initPose = agentPose,stepSpawned=self.stepNum)
+                nextAgent = Agent(initPose = agentPose,stepSpawned=self.stepNum, rng=self.rng.behavior,
+                                  population=self.population)
             else:
-                nextAgent = Agent(geneticString=self.initialGeneticStrings[i], initPose = agentPose,stepSpawned=self.stepNum)
+                nextAgent = Agent(geneticString=self.initialGeneticStrings[i], initPose = agentPose,stepSpawned=self.stepNum, rng=self.rng.behavior,
+                                  population=self.population)
 
             if self.initialGeneticStrings is None:
                 pass
 
             self.agentList.append(nextAgent)
-            self.globalMap[r, c].append(nextAgent)
+            self.addObject(nextAgent, r, c)
 
     def _placeStones(self):
         """Places stone objects randomly, avoiding locations where the globalMap already contains something"""
-        for i in range(self.numStones):
-            (randRow, randCol) = self._genRandomLoc()
-            while True:
-                if len(self.globalMap[randRow, randCol]) != 0:
-                    (randRow, randCol) = self._genRandomLoc()
-                else:
-                    break
-            nextStone = Stone(initPose=(randRow, randCol), geneticString="0", stepSpawned=self.stepNum)
-            self.stoneList.append(nextStone)
-            self.globalMap[randRow, randCol].append(nextStone)
+        for (randRow, randCol) in self.freeCells.sampleMany(self.numStones, self.rng.world):
+            self.placeTerrain(Stone, randRow, randCol)
 
     def _placePits(self):
         """Places pit objects randomly, avoiding locations where the globalMap already contains something"""
-        for i in range(self.numPits):
-            (randRow, randCol) = self._genRandomLoc()
-            while True:
-                if len(self.globalMap[randRow, randCol]) != 0:
-                    (randRow, randCol) = self._genRandomLoc()
-                else:
-                    break
-            nextPit = Pit(initPose=(randRow, randCol), geneticString="0", stepSpawned=self.stepNum)
-            self.pitList.append(nextPit)
-            self.globalMap[randRow, randCol].append(nextPit)
+        for (randRow, randCol) in self.freeCells.sampleMany(self.numPits, self.rng.world):
+            self.placeTerrain(Pit, randRow, randCol)
 
     def _placeMushrooms(self):
         """Places mushroom objects randomly, avoiding locations where the globalMap already contains something"""
-        for i in range(self.numMushrooms):
-            (randRow, randCol) = self._genRandomLoc()
-            while True:
-                if len(self.globalMap[randRow, randCol]) != 0:
-                    (randRow, randCol) = self._genRandomLoc()
-                else:
-                    break
-            nextMushroom = Mushroom(initPose=(randRow, randCol), geneticString=random.choice(["0","1","1","1","1","1","1","1","1","2","3","4"]), stepSpawned=self.stepNum)
-            self.mushroomList.append(nextMushroom)
-            self.globalMap[randRow, randCol].append(nextMushroom)
+        for (randRow, randCol) in self.freeCells.sampleMany(self.numMushrooms, self.rng.world):
+            nextMushroom = Mushroom(initPose=(randRow, randCol), geneticString=self.rng.world.choice(["0","1","1","1","1","1","1","1","1","2","3","4"]), stepSpawned=self.stepNum)
+            self.mushrooms[nextMushroom] = None
+            self.addObject(nextMushroom, randRow, randCol)
 
     def _placeGrass(self):
         """Places patches of grass objects randomly."""
-        for grassPatch in range(self.numGrass):
-            r = random.randint(1, self.gridSize // 5)
-            rowLoc = random.randint(-r + 1, self.gridSize - r + 1)
-            colLoc = random.randint(-r + 1, self.gridSize - r + 1)
-            width = r*2
-            height = r*2
-            cx = width // 2
-            cy = height // 2
-            tiles = [[0 for _ in range(height)] for _ in range(width)]
-
-            self.make_circle(tiles, cx, cy, r)
-
-            for i in range(len(tiles)):
-                for j in range(len(tiles)):
-                    isGrassHere = random.choice([0, 1, 1])
-                    if tiles[i][j] == 1:
-                        if isGrassHere == 1:
-                            if self.gridSize > rowLoc + i >= 0 and self.gridSize > colLoc + j >= 0:
-                                if len(self.objectsAt(rowLoc + i, colLoc + j)) == 0:
-                                    nextGrass = Grass(initPose=(rowLoc + i, colLoc + j),
-                                                    geneticString=random.choice(["0"]),
-                                                    stepSpawned=self.stepNum)
-                                    self.grassDict[rowLoc+i,colLoc+j].append(nextGrass)
+        self.placeTerrainMask(Grass, self.worldGen.patchMask(self.numGrass, self._occupiedMask()))
 
     def _placeSand(self):
         """Places patches of sand objects randomly."""
-        for sandPatch in range(self.numSands):
-            r = random.randint(1, self.gridSize // 5)
-            rowLoc = random.randint(-r + 1, self.gridSize - r + 1)
-            colLoc = random.randint(-r + 1, self.gridSize - r + 1)
-            width = r*2
-            height = r*2
-            cx = width // 2
-            cy = height // 2
-            tiles = [[0 for _ in range(height)] for _ in range(width)]
-
-            self.make_circle(tiles, cx, cy, r)
-
-            for i in range(len(tiles)):
-                for j in range(len(tiles)):
-                    isSandHere = random.choice([0, 1, 1])
-                    if tiles[i][j] == 1:
-                        if isSandHere == 1:
-                            if self.gridSize > rowLoc + i >= 0 and self.gridSize > colLoc + j >= 0:
-                                if len(self.objectsAt(rowLoc + i, colLoc + j)) == 0:
-                                    nextSand = Sand(initPose=(rowLoc + i, colLoc + j),
-                                                    geneticString=random.choice(["0"]),
-                                                    stepSpawned=self.stepNum)
-                                    self.sandDict[rowLoc+i,colLoc+j].append(nextSand)
+        self.placeTerrainMask(Sand, self.worldGen.patchMask(self.numSands, self._occupiedMask()))
 
     def _placeSnow(self):
         """Places patches of snow objects randomly."""
         #TODO: make this place snow objects in natural patterns -- high elevation has higher likelihood? Tree+snow?
-        for snowPatch in range(self.numSnows):
-            r = random.randint(1, self.gridSize // 5)
-            rowLoc = random.randint(-r + 1, self.gridSize - r + 1)
-            colLoc = random.randint(-r + 1, self.gridSize - r + 1)
-            width = r*2
-            height = r*2
-            cx = width // 2
-            cy = height // 2
-            tiles = [[0 for _ in range(height)] for _ in range(width)]
-
-            self.make_circle(tiles, cx, cy, r)
-
-            for i in range(len(tiles)):
-                for j in range(len(tiles)):
-                    isSnowHere = random.choice([0, 1, 1])
-                    if tiles[i][j] == 1:
-                        if isSnowHere == 1:
-                            if self.gridSize > rowLoc + i >= 0 and self.gridSize > colLoc + j >= 0:
-                                if len(self.objectsAt(rowLoc + i, colLoc + j)) == 0:
-                                    nextSnow = Snow(initPose=(rowLoc + i, colLoc + j),
-                                                    geneticString=random.choice(["0"]),
-                                                    stepSpawned=self.stepNum)
-                                    self.snowDict[rowLoc+i,colLoc+j].append(nextSnow)
+        self.placeTerrainMask(Snow, self.worldGen.patchMask(self.numSnows, self._occupiedMask()))
 
     def _placeWaters(self):
         """Places water objects in the form of rivers and ponds,
@@ -485,87 +431,64 @@ class ALifeSimTest(object):
         self._placePonds(self.numPonds)
         self._placeRivers()
 
-    def _placePonds(self, numPonds, pondSize=random.choice([3,3])):
+    def _placePonds(self, numPonds, pondSize=3):
         """Places water objects in the form of square clusters,
         avoiding locations where the globalMap already contains something"""
         for i in range(numPonds):
-            thisPondSize = random.randint(1,pondSize)
-            rowLoc = random.randint(0, self.gridSize - thisPondSize)
-            colLoc = random.randint(0, self.gridSize - thisPondSize)
+            thisPondSize = self.rng.world.randint(1,pondSize)
+            rowLoc = self.rng.world.randint(0, self.gridSize - thisPondSize)
+            colLoc = self.rng.world.randint(0, self.gridSize - thisPondSize)
             # print("row, col: ", rowLoc, colLoc)
             for row in range(thisPondSize):
                 for col in range(thisPondSize):
-                    isWaterHere = random.choice([1, 1])
+                    isWaterHere = self.rng.world.choice([1, 1])
                     if isWaterHere == 1:
-                        if len(self.objectsAt(rowLoc + row, colLoc + col)) == 0:
-                            nextWater = Water(initPose=(rowLoc + row, colLoc + col), geneticString="0", stepSpawned=self.stepNum)
-                            self.waterList.append(nextWater)
-                            self.globalMap[rowLoc + row, colLoc + col].append(nextWater)
+                        if self.isEmpty(rowLoc + row, colLoc + col):
+                            self.placeTerrain(Water, rowLoc + row, colLoc + col)
 
     def _placeRivers(self):
         """Places water objects in the form of vertical or horizontal rivers,
         avoiding locations where the globalMap already contains something"""
         for numberOfRivers in range(self.numRivers):
-            randomOrientation = random.randint(0, 1)
+            randomOrientation = self.rng.world.randint(0, 1)
 
-            place = random.randint(0, self.gridSize-1)
+            place = self.rng.world.randint(0, self.gridSize-1)
             for i in range(self.gridSize):
                 while True:
-                    place = random.choice([place-1, place, place+1])
+                    place = self.rng.world.choice([place-1, place, place+1])
                     if place < 0 or place > self.gridSize-1:
-                        place = random.choice([place - 1, place, place + 1])
+                        place = self.rng.world.choice([place - 1, place, place + 1])
                     else:
                         break
 
                 if randomOrientation == 0:
-                    if len(self.objectsAt(i, place)) == 0:
-                        nextWater = Water(initPose=(i, place), geneticString="0", stepSpawned=self.stepNum)
-                        self.waterList.append(nextWater)
-                        self.globalMap[i, place].append(nextWater)
+                    if self.isEmpty(i, place):
+                        self.placeTerrain(Water, i, place)
 
                 elif randomOrientation == 1:
-                    if len(self.objectsAt(place, i)) == 0:
-                        nextWater = Water(initPose=(place, i), geneticString="0", stepSpawned=self.stepNum)
-                        self.waterList.append(nextWater)
-                        self.globalMap[place, i].append(nextWater)
+                    if self.isEmpty(place, i):
+                        self.placeTerrain(Water, place, i)
 
     def _placeTreesOnHalf(self):
         """Places berry trees on the left half of the simulation, avoiding objects that were placed first."""
         for row in range(self.gridSize):
             for col in range(self.gridSize//2):
-                if len(self.objectsAt(row,col)) == 0:
-                    nextTree = Tree(initPose=(row,col),geneticString=random.choice(["1"]),stepSpawned=self.stepNum)
+                if self.isEmpty(row, col):
+                    nextTree = Tree(initPose=(row,col),geneticString="1",stepSpawned=self.stepNum,rng=self.rng.world)
                     self.treeList.append(nextTree)
-                    self.globalMap[row,col].append(nextTree)
+                    self.addObject(nextTree, row, col)
 
     def _placeTrees(self, numForests, forestSize):
         """Randomly places trees in forest (circular) patterns, with diameters of forestSize."""
-        r = forestSize // 2
-
-        for forest in range(numForests):
-            rowLoc = random.randint(-r + 1, self.gridSize - r + 1)
-            colLoc = random.randint(-r + 1, self.gridSize - r + 1)
-
-            width = forestSize
-            height = forestSize
-
-            cx = width // 2
-            cy = height // 2
-
-            tiles = [[0 for _ in range(height)] for _ in range(width)]
-
-            self.make_circle(tiles, cx, cy, r)
-
-            for i in range(len(tiles)):
-                for j in range(len(tiles)):
-                    isTreeHere = random.choice([0, 1, 1])
-                    if tiles[i][j] == 1:
-                        if isTreeHere == 1:
-                            if self.gridSize > rowLoc + i >= 0 and self.gridSize > colLoc + j >= 0:
-                                if len(self.objectsAt(rowLoc + i, colLoc + j)) == 0:
-                                    nextTree = Tree(initPose=(rowLoc + i, colLoc + j), geneticString=random.choice(["0","0","0","0","1"]),stepSpawned=self.stepNum)
-                                    self.treeList.append(nextTree)
-                                    self.globalMap[rowLoc + i, colLoc + j].append(nextTree)
+        treeMask = self.worldGen.forestMask(numForests, forestSize, self._occupiedMask())
+        treeRows, treeCols = np.nonzero(treeMask)
+        # One tree in five starts out with berries.
+        hasBerries = self.worldGen.rng.random(len(treeRows)) < 0.2
+        for row, col, berries in zip(treeRows.tolist(), treeCols.tolist(), hasBerries.tolist()):
+            nextTree = Tree(initPose=(row, col), geneticString="1" if berries else "0", stepSpawned=self.stepNum,
+                            rng=self.rng.world)
+            self.treeList.append(nextTree)
+            self.addObject(nextTree, row, col)
 
         # for i in range(numForrests):
         #     rowLoc = random.randint(0, self.gridSize - forrestSize)
@@ -593,17 +516,88 @@ class ALifeSimTest(object):
         #     self.treeList.append(nextTree)
         #     self.globalMap[randRow, randCol].append(nextTree)
 
-    def _addFoodClump(self):
-        """Adds a clump of food at a random location, avoiding preexisting objects."""
-        (randRow, randCol) = self._genRandomLoc()
-        while True:
-            if len(self.globalMap[randRow, randCol]) != 0:
-                (randRow, randCol) = self._genRandomLoc()
-            else:
-                break
+    def _occupiedMask(self):
+        """Returns a boolean grid that is True wherever isEmpty would say False."""
+        occupied = self.terrain.solid.copy()
+        if len(self.globalMap) > 0:
+            rows, cols = zip(*self.globalMap)
+            occupied[rows, cols] = True
+        return occupied
+
+    def _addFoodClump(self, randRow=None, randCol=None):
+        """Adds a clump of food at the given location, or at a random free location if none is given."""
+        if randRow is None:
+            (randRow, randCol) = self.freeCells.sample(self.rng.behavior)
         nextFood = Food(initPose=(randRow, randCol),geneticString="0",stepSpawned=self.stepNum)
-        self.foodList.append(nextFood)
-        self.globalMap[randRow, randCol].append(nextFood)
+        self.food[nextFood] = None
+        self.addObject(nextFood, randRow, randCol)
+        self.publish("spawned", nextFood)
+
+    # =================================================================
+    # Functions that change what is on the grid -- these keep the globalMap, the spatial index, the terrain layers
+    # and the free cells in step, so all placing, moving, eating and removing of objects must go through them.
+    def placeTerrain(self, kind, row, col):
+        """Puts terrain of the given kind into the given cell."""
+        self._ownTerrain()
+        self.terrain.place(kind, row, col)
+        if kind in TerrainLayers.SOLID_KINDS:
+            self.freeCells.discard(row, col)
+
+    def placeTerrainMask(self, kind, mask):
+        """Puts terrain of the given kind into every cell where the boolean mask is True."""
+        self._ownTerrain()
+        self.terrain.placeMask(kind, mask)
+        if kind in TerrainLayers.SOLID_KINDS:
+            self.freeCells.discardMask(mask)
+
+    def _ownTerrain(self):
+        """If the terrain is frozen, because other simulations stand on it too, switches to a copy of it that
+        this simulation can change."""
+        if self.terrain.isFrozen():
+            self.terrain = self.terrain.copy()
+            self.smell.solid = self.terrain.solid
+
+    def addObject(self, ob, row, col):
+        """Puts an object into the given cell."""
+        objectsHere = self.globalMap.get((row, col))
+        if objectsHere is None:
+            self.globalMap[row, col] = [ob]
+            self.freeCells.discard(row, col)
+        else:
+            objectsHere.append(ob)
+        self.index.add(ob, row, col)
+        self._updateSmell(ob, row, col, 1)
+
+    def removeObject(self, ob, row, col):
+        """Takes an object out of the given cell, if it is there."""
+        if self.index.remove(ob, row, col):
+            objectsHere = self.globalMap[row, col]
+            objectsHere.remove(ob)
+            if len(objectsHere) == 0:
+                del self.globalMap[row, col]
+                if not self.terrain.solid[row, col]:
+                    self.freeCells.add(row, col)
+            self._updateSmell(ob, row, col, -1)
+
+    def moveObject(self, ob, oldRow, oldCol, newRow, newCol):
+        """Moves an object from one cell to another."""
+        self.removeObject(ob, oldRow, oldCol)
+        self.addObject(ob, newRow, newCol)
+
+    def _updateSmell(self, ob, row, col, change):
+        """Adds an object coming into a cell (change 1) or leaving it (change -1) to the smell counts, if it is
+        something agents can smell."""
+        obType = type(ob)
+        if obType is Agent:
+            self.smell.addAgent(ob.color, row, col, change)
+        elif obType is Food or obType is Mushroom:
+            self.smell.addFood(row, col, change)
+
+    def addMushroom(self, mushroom, row, col):
+        """Puts a new mushroom into the given cell."""
+        self.mushrooms[mushroom] = None
+        self.addObject(mushroom, row, col)
+        self.publish("spawned", mushroom)
 
     # =================================================================
     # Math helper functions
@@ -611,26 +605,6 @@ class ALifeSimTest(object):
         """Takes in two points (x1,y1) and (x2,y2) and returns the distance between them"""
         return math.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
 
-    def make_circle(self, tiles, cx, cy, r):
-        """Generates a circular shape composed of square tiles"""
-        for x in range(cx - r, cx + r):
-            for y in range(cy - r, cy + r):
-                if self.dist(cx, cy, x, y) <= r:
-                    tiles[x][y] = 1
-
-    def _genRandomPose(self):
-        """Generates a random location and direction on the grid with equal probability."""
-        row = random.randrange(self.gridSize)
-        col = random.randrange(self.gridSize)
-        heading = random.choice(['n', 'e', 'w', 's'])
-        return (row, col, heading)
-
-    def _genRandomLoc(self):
-        """Generates a random location on the grid with equal probability."""
-        row = random.randrange(self.gridSize)
-        col = random.randrange(self.gridSize)
-        return (row, col)
-
     # =================================================================
     # Updating the sim functions.
     def step(self):
@@ -659,11 +633,12 @@ class ALifeSimTest(object):
         while i < len(self.treeList):
             tree = self.treeList[i]
             treeR, treeC = tree.getPose()
+            hadFood = tree.getHasFood()
             if (tree.getStepsUntilBloom() >= 50):
                 tree.setHasFood("-1")
                 tree.setStepsUntilBloom(tree.getStepsUntilBloom() - 1)
                 if tree.getStepsUntilBloom() < 50:
-                    self.globalMap[treeR, treeC].append(tree)
+                    self.addObject(tree, treeR, treeC)
                     tree.setHasFood("0")
             if (tree.getStepsUntilBloom() > 0) and (tree.getStepsUntilBloom() < 50):
                 tree.setHasFood("0")
@@ -672,20 +647,18 @@ class ALifeSimTest(object):
                 tree.setHasFood("1")
                 # TODO: WHy can't we call this from the tree V ???
                 # tree.setStepsUntilBloom(random.randint(10,40))
+            if tree.getHasFood() != hadFood:
+                self.publish("bloomed", tree)
             i = i + 1
 
     def _updateMushrooms(self):
         """Keeps track of when a tree should bloom, and makes them bloom when needed."""
-        i = 0
-        while i < len(self.mushroomList):
-            currentMushroom = self.mushroomList[i]
-            r, c = currentMushroom.getPose()
+        for currentMushroom in self.mushrooms:
             if currentMushroom.getStepsUntilGrowth() > 0:
                 currentMushroom.setStepsUntilGrowth(currentMushroom.getStepsUntilGrowth() - 1)
-            if currentMushroom.getStepsUntilGrowth() == 0:
+            if currentMushroom.getStepsUntilGrowth() == 0 and currentMushroom.getDroppingType() != 1:
                 currentMushroom.setDroppingType(1)
-
-            i = i + 1
+                self.publish("sporulated", currentMushroom)
 
 
     def _updateAgents(self):
@@ -695,186 +668,249 @@ class ALifeSimTest(object):
             print("aLifeSim object is using _updateAgents() for step " + str(self.stepNum))
             print("--------------------------------------------------------------------------------------------")
 
-        while i < len(self.agentList):
-            if self.verbose:
-                print("*************** AGENT COLOR: " + str(self.agentList[i].colorNumberToText(self.agentList[i].getColor())) + " ***************")
+        # Sickness and mushroom timers count down for every agent at once, before any agent acts
+        changed = self.population.tickTimers()
+        if len(changed) > 0 and self.events.wants("changed"):
+            agentInSlot = dict((agent.slot, agent) for agent in self.agentList)
+            for slot in changed.tolist():
+                if slot in agentInSlot:
+                    self.publish("changed", agentInSlot[slot])
+        self.smell.newStep(self.population, self.batchPerception or self.synchronous)
+
+        features = None
+        if self.tiles is not None and (self.batchPerception or self.synchronous):
+            features = self.tiles.perceive(self, self.agentList).tolist()
+        elif self.batchPerception or self.synchronous:
+            features = perceive(self, self.agentList).tolist()
+
+        if self.synchronous:
+            intents = self._collectIntents(self.agentList, features)
+            for (agent, action) in self._resolveIntents(intents):
+                # an agent killed by an attack earlier in the step does not get to act
+                if not agent.isDead:
+                    self._carryOut(agent, action)
+        else:
+            while i < len(self.agentList):
+                if self.verbose:
+                    print("*************** AGENT COLOR: " + str(self.agentList[i].colorNumberToText(self.agentList[i].getColor())) + " ***************")
 
-            agent = self.agentList[i]
-            agentR, agentC, agentH = agent.getPose()
-            rAhead, cAhead = agent._computeAhead(self.gridSize)
+                agent = self.agentList[i]
+                if agent.isDead:
+                    # killed earlier in this step; it is dropped from agentList at the end of the step
+                    i = i + 1
+                    continue
 
-            if self.verbose:
-                print("==== AGENT COLOR: " + str(self.agentList[i].colorNumberToText(self.agentList[i].getColor())) + " ====")
-                print("Steps until healthy: ", agent.getStepsUntilHealthy())
+                if self.verbose:
+                    print("==== AGENT COLOR: " + str(self.agentList[i].colorNumberToText(self.agentList[i].getColor())) + " ====")
+                    print("Steps until healthy: ", agent.getStepsUntilHealthy())
 
-            if agent.getStepsUntilHealthy() > 0:
-                agent.isSick = True
-                agent.setStepsUntilHealthy(agent.getStepsUntilHealthy() - agent.resistanceVal)
-            if agent.getStepsUntilHealthy() <= 0:
-                agent.isSick = False
-                agent.setStepsUntilHealthy(0)
-
-            # print("Steps until no mushroom influence: ", agent.getStepsUntilNoMushroomInfluence())
-            if agent.getStepsUntilNoMushroomInfluence() > 0:
-                agent.setStepsUntilNoMushroomInfluence(agent.getStepsUntilNoMushroomInfluence() - 1)
-            if agent.getStepsUntilNoMushroomInfluence() <= 0:
-                agent.mushroomInfluence = 0
-                agent.setStepsUntilNoMushroomInfluence(0)
-            isOkay = True
-
-            if not agent.isDead:
-                action = agent.determineAction(self, self.time)
-                if action == 'breed':
-                    twoAgents = []
-                    agentsHere = self.agentsAt(agentR,agentC)
-                    for i in range(2):
-                        # print(type(ob))
-                        # if ob is Agent:
-                        twoAgents.append(agentsHere[i])
-                    self.makeABaby(twoAgents[0], twoAgents[1])
-                    for ag in agentsHere:
-                        ag.setReadyToBreed(24)
-                    isOkay = agent.changeEnergy(-1)
-
-                elif action == 'eat':
-                    self.eatItem(agent, agentR, agentC)
-                    isOkay = agent.changeEnergy(0)
-
-                elif action == 'eatBerries':
-                    agent.setObjectConsumed(2)
-                    isOkay = agent.changeEnergy(2)
-
-                elif action == 'pause':
-                    agent.updatePose(agentR, agentC, agent._leftTurn())
-                    time.sleep(0.1)
-                    agent.updatePose(agentR, agentC, agent._rightTurn())
-                    time.sleep(0.1)
-                    agent.updatePose(agentR, agentC, agent._turnAround())
-                    isOkay = agent.changeEnergy(-5)
-
-                elif action == 'roost':
-                    isOkay = agent.changeEnergy(10)
-
-                elif action == 'rest':
-                    isOkay = agent.changeEnergy(2)
-
-                elif action == 'attack':
-                    self.agentList[i].attackCreature(self, agentR, agentC)
-                    isOkay = agent.changeEnergy(50)
-
-                elif action == 'forward':
-                    agent.updatePose(rAhead, cAhead, agentH)
-                    # TODO: this if shouldn't be here, and it should remove the agent every time it moves
-                    if agent in (self.globalMap[agentR, agentC]):
-                        # print("REMOVING",agent,"from globalMap")
-                        self.globalMap[agentR, agentC].remove(agent)
-                        # print("globalMap after removing before adding:")
-                        # self.printGrid()
+                if agent.isPausing():
+                    action = 'pause'
+                else:
+                    if features is not None and i < len(features):
+                        action = agent.determineAction(self, self.time, features[i])
                     else:
-                        pass
-                        # print("Agent not where expected:", agent, agentR, agentC)
-                        # self.printGrid()
-                        # print("globalMap after removing before adding:",self.globalMap)
-
-                    self.globalMap[rAhead, cAhead].append(agent)
-                    # print("globalMap after removing AND adding:")
-                    # self.printGrid()
-                    # print("globalMap after removing AND adding:",self.globalMap)
-                    agentR, agentC = rAhead, cAhead
-                    isOkay = agent.changeEnergy(-1)
-
-                elif action == 'left':
-                    agent.updatePose(agentR, agentC, agent._leftTurn())
-                    isOkay = agent.changeEnergy(-1)
-
-                elif action == 'right':
-                    agent.updatePose(agentR, agentC, agent._rightTurn())
-                    isOkay = agent.changeEnergy(-1)
-
-                elif action == 'turnAround':
-                    agent.updatePose(agentR, agentC, agent._turnAround())
-                    isOkay = agent.changeEnergy(-1)
-
-                elif action == 'die':
-                    agent.updatePose(agentR, agentC, agent._turnAround())
-                    isOkay = agent.changeEnergy(-1000)
+                        # babies born this step were not there to perceive
+                        action = agent.determineAction(self, self.time)
+                self._carryOut(agent, action)
 
-                else:
-                    # print("Unknown action:", action)
-                    isOkay = agent.changeEnergy(0)
+                i = i + 1
 
-                if self.verbose:
-                    print("--------------------------------------------------------------------------------------------")
+        # Agents that died stay in agentList, marked dead, until now, so that any number of deaths costs one pass
+        if self.numDying > 0:
+            self.agentList = [agent for agent in self.agentList if not agent.isDead]
+            self.numDying = 0
+
+        self.population.tickBreeding()
+
+    def _collectIntents(self, agents, features):
+        """Returns an (agent, action) pair for each of the given agents, with each agent deciding from its feature
+        row and nothing carried out yet. Agents decide in agentId order, since deciding can still change the agent's
+        own cell (taking a tree's berries, catching a sickness), so the intents do not depend on where agents are in
+        agentList. Only the cells around each agent are looked at, so agents in different parts of the grid could
+        decide at the same time."""
+        order = sorted(range(len(agents)), key=lambda j: agents[j].agentId)
+        intents = []
+        for j in order:
+            agent = agents[j]
+            if agent.isPausing():
+                action = 'pause'
+            else:
+                action = agent.determineAction(self, self.time, features[j])
+            intents.append((agent, action))
+        return intents
+
+    def _resolveIntents(self, intents):
+        """Returns the intents in the order they are to be carried out: attacks, then everything agents do where
+        they stand, then moves, each in agentId order. Attacks go first so that an agent killed where it stands
+        does nothing else; eating and breeding go before moves so that they happen among the agents that were in
+        the cell when they decided; and when more agents than one eat in a cell, or breed there, the one with the
+        lowest agentId gets the food, or the baby. What an agent does only changes its own cell, or for a move the
+        cell ahead, so cells far enough apart could be resolved at the same time."""
+        return sorted(intents, key=lambda intent: (self.ACTION_PHASES.get(intent[1], 1), intent[0].agentId))
+
+    def _carryOut(self, agent, action):
+        """Carries out an agent's chosen action, and kills the agent if it has run out of energy."""
+        startPose = agent.getPose()
+        agentR, agentC, agentH = startPose
+        rAhead, cAhead = agent._computeAhead(self.gridSize)
+        isOkay = True
+
+        if action == 'breed':
+            twoAgents = []
+            # copied, because the baby joins this cell's list in the index
+            agentsHere = self.agentsAt(agentR,agentC)[:]
+            # in a synchronous step the other agent may have died since deciding
+            if len(agentsHere) > 1:
+                for j in range(2):
+                    # print(type(ob))
+                    # if ob is Agent:
+                    twoAgents.append(agentsHere[j])
+                self.makeABaby(twoAgents[0], twoAgents[1])
+            for ag in agentsHere:
+                ag.setReadyToBreed(24)
+            isOkay = agent.changeEnergy(-1)
+
+        elif action == 'eat':
+            self.eatItem(agent, agentR, agentC)
+            isOkay = agent.changeEnergy(0)
+
+        elif action == 'eatBerries':
+            agent.setObjectConsumed(2)
+            isOkay = agent.changeEnergy(2)
+
+        elif action == 'pause':
+            # A pause looks left, then right, then turns around, one turn per step; the agent does
+            # nothing else until it is done. Costs its energy on the first step.
+            pauseStep = agent.getPauseStep()
+            if pauseStep == 0:
+                agent.updatePose(agentR, agentC, agent._leftTurn())
+            elif pauseStep == 1:
+                agent.updatePose(agentR, agentC, agent._rightTurn())
+            else:
+                agent.updatePose(agentR, agentC, agent._turnAround())
+            agent.setPauseStep((pauseStep + 1) % self.PAUSE_STEPS)
+            isOkay = agent.changeEnergy(-5 if pauseStep == 0 else 0)
 
-                if agent.getReadyToBreed() != 0:
-                    agent.changeReadyToBreed(1)
-                if self.verbose:
-                    print("~~~~~~~~~ Energy After Step ~~~~~~~~~")
-                    print("OBJECT CONSUMED:",agent.getObjectConsumed())
-                    print("GlobalMap:",self.globalMap)
-                    print("   ", self.agentList[i].getEnergy())
-                    print("----------------------------------------------------------------------------")
-
-            # for j in range(len(self.agentList)-1):
-            #     print("AGENT 1 ID: ", self.agentList[j].getVisId)
-            #     print("AGENT 2 ID: ", self.agentList[j+1].getVisId)
-            #     if self.agentList[j].getVisId == self.agentList[j+1].getVisId:
-            #         print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~DUPLICATE~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
-
-            # if len(self.agentList) != len(set(self.agentList)):
-            #     print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~DUPLICATES~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
-
-            # numAgentsInGlobalMap = 0
-            # for r, c in self.globalMap:
-            #     for n in self.globalMap[r, c]:
-            #         if type(n) is Agent:
-            #             numAgentsInGlobalMap += 1
-
-            # if len(self.agentList) < numAgentsInGlobalMap:
-            #     print("!!!!!!!!!! GHOST AGENT CREATED")
-            #     print("agentList", self.agentList)
-            #     for j in self.agentList:
-            #         print(j)
-            #     print("globalMap", self.globalMap)
-            #
-            # print('printGrid:',self.printGrid())
-
-            if agent.energy <= 0:
-                isOkay = False
-
-            if not isOkay:
-                self.deadAgents.append((agent, self.stepNum-agent.stepSpawned))
-                agent.dropObject(self)
-                self.agentList.pop(i)
-                if agent in self.globalMap[agentR,agentC]:
-                    self.globalMap[agentR, agentC].remove(agent)
-
-            if isOkay:
-                i = i + 1
+        elif action == 'roost':
+            isOkay = agent.changeEnergy(10)
+
+        elif action == 'rest':
+            isOkay = agent.changeEnergy(2)
+
+        elif action == 'attack':
+            agent.attackCreature(self, agentR, agentC)
+            isOkay = agent.changeEnergy(50)
+
+        elif action == 'forward':
+            agent.updatePose(rAhead, cAhead, agentH)
+            self.moveObject(agent, agentR, agentC, rAhead, cAhead)
+            agentR, agentC = rAhead, cAhead
+            isOkay = agent.changeEnergy(-1)
+
+        elif action == 'left':
+            agent.updatePose(agentR, agentC, agent._leftTurn())
+            isOkay = agent.changeEnergy(-1)
+
+        elif action == 'right':
+            agent.updatePose(agentR, agentC, agent._rightTurn())
+            isOkay = agent.changeEnergy(-1)
+
+        elif action == 'turnAround':
+            agent.updatePose(agentR, agentC, agent._turnAround())
+            isOkay = agent.changeEnergy(-1)
+
+        elif action == 'die':
+            agent.updatePose(agentR, agentC, agent._turnAround())
+            isOkay = agent.changeEnergy(-1000)
+
+        else:
+            # print("Unknown action:", action)
+            isOkay = agent.changeEnergy(0)
+
+        if agent.getPose() != startPose:
+            self.publish("moved", agent)
+
+        if self.verbose:
+            print("--------------------------------------------------------------------------------------------")
+
+        if self.verbose:
+            print("~~~~~~~~~ Energy After Step ~~~~~~~~~")
+            print("OBJECT CONSUMED:",agent.getObjectConsumed())
+            print("GlobalMap:",self.globalMap)
+            print("   ", agent.getEnergy())
+            print("----------------------------------------------------------------------------")
+
+        # for j in range(len(self.agentList)-1):
+        #     print("AGENT 1 ID: ", self.agentList[j].getVisId)
+        #     print("AGENT 2 ID: ", self.agentList[j+1].getVisId)
+        #     if self.agentList[j].getVisId == self.agentList[j+1].getVisId:
+        #         print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~DUPLICATE~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
+
+        # if len(self.agentList) != len(set(self.agentList)):
+        #     print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~DUPLICATES~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
+
+        # numAgentsInGlobalMap = 0
+        # for r, c in self.globalMap:
+        #     for n in self.globalMap[r, c]:
+        #         if type(n) is Agent:
+        #             numAgentsInGlobalMap += 1
+
+        # if len(self.agentList) < numAgentsInGlobalMap:
+        #     print("!!!!!!!!!! GHOST AGENT CREATED")
+        #     print("agentList", self.agentList)
+        #     for j in self.agentList:
+        #         print(j)
+        #     print("globalMap", self.globalMap)
+        #
+        # print('printGrid:',self.printGrid())
+
+        if agent.energy <= 0:
+            isOkay = False
+
+        if not isOkay:
+            self.killAgent(agent)
+
+    def killAgent(self, agent):
+        """Records an agent's death, drops whatever it leaves behind, and takes it off the grid. The agent is
+        marked dead and left in agentList until the end of the step, when _updateAgents takes out all the agents
+        that died at once."""
+        if agent.isDead:
+            return
+        agent.isDead = True
+        timeLived = self.stepNum - agent.stepSpawned
+        if self.keepDeadAgents:
+            self.deadAgents.append((agent, timeLived))
+        agent.dropObject(self)
+        agentR, agentC, agentH = agent.getPose()
+        self.removeObject(agent, agentR, agentC)
+        agent.detach(self.graveyard if self.keepDeadAgents else None)
+        self.numDying += 1
+        self.numDead += 1
+        self.deadLifespanTotal += timeLived
+        self.deadLifespanMax = max(self.deadLifespanMax, timeLived)
+        self.publish("died", agent)
 
     # =================================================================
     # Agent action functions
     def eatItem(self, agent, row, col):
         """Removes a food object from a location on the global map."""
-        foodAtCell = self.foodAt(row, col)
+        foodAtCell = list(self.foodAt(row, col))
         if len(foodAtCell) > 0:
             agent.changeEnergy(50)
             agent.setObjectConsumed(1)
-            self.eatenFood.append(foodAtCell)
-            for ob in self.globalMap[row, col]:
-                if type(ob) is Food:
-                    self.globalMap[row, col].remove(ob) #TODO: what if there is something else on that square other than food?
-            for i in range(len(self.foodList)):
-                if foodAtCell == self.foodList[i]:
-                    self.foodList.pop(i)
-
-        mushroomsAtCell = self.mushroomAt(row, col)
+            for ob in foodAtCell:
+                self.removeObject(ob, row, col)
+                self.food.pop(ob, None)
+                self.publish("ate", ob, agent)
+
+        mushroomsAtCell = list(self.mushroomAt(row, col))
         if len(mushroomsAtCell) > 0:
             agent.setObjectConsumed(3)
             mushroomTypeEaten = mushroomsAtCell[0].getTypeOfMushroom()
-            self.eatenMushrooms.append(mushroomsAtCell)
             agent.setMushroomInfluence(mushroomTypeEaten)
             agent.setStepsUntilNoMushroomInfluence(10)
+            self.publish("changed", agent)
             # print("MUSHROOM TYPE EATEN:", mushroomTypeEaten)
             if (mushroomTypeEaten == 4):
                 agent.changeEnergy(-10)
@@ -883,13 +919,11 @@ class ALifeSimTest(object):
             if (mushroomTypeEaten == 1):
                 # print("SICK")
                 agent.isSick = True
-                agent.setStepsUntilHealthy(random.randint(10, 50))
-            for ob in self.globalMap[row, col]:
-                if type(ob) is Mushroom:
-                    self.globalMap[row, col].remove(ob)
-            for i in range(len(self.mushroomList)):
-                if mushroomsAtCell == self.mushroomList[i]:
-                    self.mushroomList.pop(i)
+                agent.setStepsUntilHealthy(self.rng.behavior.randint(10, 50))
+            for ob in mushroomsAtCell:
+                self.removeObject(ob, row, col)
+                self.mushrooms.pop(ob, None)
+                self.publish("ate", ob, agent)
 
     def makeABaby(self, agent1, agent2):
         """Takes in two agents and produces a baby agent with a combination of their genetic strings
@@ -912,10 +946,12 @@ class ALifeSimTest(object):
             # print("babyGeneticString before mutating", babyGeneticString)
             newBabyGeneticString = self.mutate(babyGeneticString)
 
-            babyAgent = Agent(geneticString=newBabyGeneticString, initPose=agentPose, stepSpawned=self.stepNum)
+            babyAgent = Agent(geneticString=newBabyGeneticString, initPose=agentPose, stepSpawned=self.stepNum,
+                              rng=self.rng.behavior, population=self.population)
 
             self.agentList.append(babyAgent)
-            self.globalMap[r,c].append(babyAgent)
+            self.addObject(babyAgent, r, c)
+            self.publish("spawned", babyAgent)
 
             agent1.setReadyToBreed(24)
             agent2.setReadyToBreed(24)
@@ -923,32 +959,32 @@ class ALifeSimTest(object):
     def mutate(self, babyGeneticString):
         """Makes a random change to a genetic string."""
         newBabyGeneticString = babyGeneticString
-        randElem = random.randrange(len(babyGeneticString))
+        randElem = self.rng.behavior.randrange(len(babyGeneticString))
         newVal = 0
         if randElem == 0:
-            newVal =  random.choice([0, 1, 2, 3])
+            newVal =  self.rng.behavior.choice([0, 1, 2, 3])
         elif randElem == 1:
-            newVal =  random.choice([0, 1, 2])
+            newVal =  self.rng.behavior.choice([0, 1, 2])
         elif randElem == 2:
-            newVal =  random.choice([0, 1])
+            newVal =  self.rng.behavior.choice([0, 1])
         elif randElem == 3:
-            newVal =  random.choice([0, 1])
+            newVal =  self.rng.behavior.choice([0, 1])
         elif randElem == 4:
-            newVal = random.choice([0, 1])
+            newVal = self.rng.behavior.choice([0, 1])
         elif randElem == 5:
-            newVal = random.choice([0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
+            newVal = self.rng.behavior.choice([0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
         elif randElem == 6:
-            newVal = random.choice([0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
+            newVal = self.rng.behavior.choice([0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
         elif randElem == 7:
-            newVal = random.choice([0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
+            newVal = self.rng.behavior.choice([0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
         elif randElem == 8:
-            newVal = random.choice([0, 0, 1])
+            newVal = self.rng.behavior.choice([0, 0, 1])
         elif randElem == 9:
-            newVal = random.choice([0, 0, 1])
+            newVal = self.rng.behavior.choice([0, 0, 1])
         elif randElem == 10:
-            newVal = random.choice([0, 0, 1])
+            newVal = self.rng.behavior.choice([0, 0, 1])
         elif randElem == 11:
-            newVal = random.choice([0, 0, 1])
+            newVal = self.rng.behavior.choice([0, 0, 1])
 
         babyGeneticStringAsList = list(newBabyGeneticString)
         # print(babyGeneticStringAsList)
@@ -965,11 +1001,12 @@ class ALifeSimTest(object):
         """Prints the globalMap."""
         for row in range(self.gridSize):
             for col in range(self.gridSize):
-                if len(self.globalMap[row, col]) == 0:
+                objectsHere = self.objectsAt(row, col)
+                if len(objectsHere) == 0:
                     print("|       |", end="")
                 else:
-                    for i in range(len(self.globalMap[row, col])):
-                        print("|   " + str(self.globalMap[row, col][i].getTypeAbbreviation()) + "   |", end="")
+                    for i in range(len(objectsHere)):
+                        print("|   " + str(objectsHere[i].getTypeAbbreviation()) + "   |", end="")
 
             print("\n")
 
@@ -9,22 +9,76 @@ from Water import Water
 from Food import Food
 from Pit import Pit
 from Mushroom import Mushroom
+from AgentPopulation import AgentPopulation, populationField, headingField, colorField
+from Vision import lookAlongRay
+from SensorMap import headingPermutation, sensorOffsets, relativeDirections
+from SpatialIndex import NO_OBJECTS
+from DecisionTable import (DecisionTable, stateKey, cellKey, CHOICES, SMELL_MOVES, LEFT, RIGHT, TURN_AROUND, FORWARD,
+                           ALL_MOVES, DECIDED, STONE, WATER, FRIEND, ENEMY, FOOD, AVOID, APPROACH)
+from Perception import HERE, SIGHT, TREE_AHEAD, SMELL, NUM_SMELL_CELLS, FRUIT_TREE
 
 class Agent(Object):
     """An agent object in the ALife simulation. An agent has a geneticString that governs its attributes and behavior,
-    and it has a location on the globalMap (given when created and then updated)."""
-
-    def __init__(self, initPose = (0, 0, 'n'), initEnergy = 40, geneticString = "0000000000", stepSpawned=0):
+    and it has a location on the globalMap (given when created and then updated). The agent's changing state and
+    traits are kept in one slot of an AgentPopulation, and the attributes below read and write that slot."""
+
+    colorNames = ['none', 'black', 'red', 'orange', 'yellow', 'blue', 'green', 'purple', 'brown', 'pink', 'gray']
+    colorAbbrevs = ['non', 'blk', 'red', 'org', 'yel', 'blu', 'grn', 'pur', 'brn', 'pnk', 'gry']
+
+    # Parsed traits and decision tables of every genetic string seen so far, since many agents share the same string.
+    traitCache = {}
+    decisionTables = {}
+
+    # The kinds of thing other than agents that an agent reacts to.
+    thingKinds = {Stone: STONE, Water: WATER, Food: FOOD, Mushroom: FOOD}
+
+    agentId = populationField("agentId")
+    row = populationField("row")
+    col = populationField("col")
+    heading = headingField()
+    energy = populationField("energy")
+    stepSpawned = populationField("stepSpawned")
+    readyToBreed = populationField("readyToBreed")
+    isSick = populationField("isSick")
+    stepsUntilHealthy = populationField("stepsUntilHealthy")
+    mushroomInfluence = populationField("mushroomInfluence")
+    stepsUntilNoMushroomInfluence = populationField("stepsUntilNoMushroomInfluence")
+    objectConsumed = populationField("objectConsumed")
+    isDead = populationField("isDead")
+    pauseStep = populationField("pauseStep")
+    visionRange = populationField("visionRange")
+    smellRadius = populationField("smellRadius")
+    Aggression = populationField("Aggression")
+    sleepValue = populationField("sleepValue")
+    color = colorField()
+    jumpVal = populationField("jumpVal")
+    swimVal = populationField("swimVal")
+    flyVal = populationField("flyVal")
+    scavengeVal = populationField("scavengeVal")
+    sickVal = populationField("sickVal")
+    resistanceVal = populationField("resistanceVal")
+    canJump = populationField("canJump")
+    canSwim = populationField("canSwim")
+    canFly = populationField("canFly")
+    canScavenge = populationField("canScavenge")
+
+    def __init__(self, initPose = (0, 0, 'n'), initEnergy = 40, geneticString = "0000000000", stepSpawned=0, rng=random,
+                 population=None):
         """
         Sets up an agent with a location, energy, geneticString, and step created
         :param initPose:   tuple giving agent's initial location and heading
         :param initEnergy: integer initial energy
         :param geneticString: string to determine agent's attributes and behavior
         :param stepSpawned: integer giving the simulation step the agent was created in
+        :param rng: random.Random-like generator the agent draws all its random choices from
+        :param population: AgentPopulation to keep the agent's state in; the agent gets one of its own if none is given
         """
+        if population is None:
+            population = AgentPopulation(1)
+        self.population = population
+        self.slot = population.allocate()
         super().__init__()
-        self.colorNames = ['none', 'black', 'red', 'orange', 'yellow', 'blue', 'green', 'purple', 'brown', 'pink', 'gray']
-        self.colorAbbrevs = ['non', 'blk', 'red', 'org', 'yel', 'blu', 'grn', 'pur', 'brn', 'pnk', 'gry']
+        self.rng = rng
         self.row, self.col, self.heading = initPose
         self.geneticString = geneticString
         # self.visObjectId = None
@@ -49,26 +103,24 @@ class Agent(Object):
         """
 
         # Initiating agent's attributes based on its genetic string
-        self.visionRange = int(self.geneticString[0])
-        self.smellRadius = int(self.geneticString[1])
+        traits = self.traitCache.get(geneticString)
+        if traits is None:
+            traits = self.traitCache[geneticString] = self._parseGeneticString(geneticString)
+        (self.visionRange, self.smellRadius, self.Aggression, self.sleepValue, self.color, self.energy, self.jumpVal,
+         self.swimVal, self.flyVal, self.scavengeVal, self.sickVal, self.resistanceVal) = traits
         # self.moveSpeed = int(self.geneticString[2])
         self.moveSpeed = 1 #TODO: implement different move speeds
-        self.Aggression = int(self.geneticString[3])
-        self.sleepValue = int(self.geneticString[4])
-        self.color = int(self.geneticString[5])
-        self.energy = int(self.geneticString[6:8])
-        self.jumpVal = int(self.geneticString[8])
-        self.swimVal = int(self.geneticString[9])
-        self.flyVal = int(self.geneticString[10])
-        self.scavengeVal = int(self.geneticString[11])
-        self.sickVal = int(self.geneticString[12])
-        self.resistanceVal = int(self.geneticString[13])
 
         # Setting default values
-        self.canSwim = False
-        self.canJump = False
-        self.canFly = False
-        self.canScavenge = False
+        self.canSwim = self.swimVal == 1
+        self.canJump = self.jumpVal == 1
+        self.canFly = self.flyVal == 1
+        self.canScavenge = self.scavengeVal == 1
+
+        self.decisions = self.decisionTables.get(geneticString)
+        if self.decisions is None:
+            self.decisions = self.decisionTables[geneticString] = DecisionTable(self.canJump, self.canSwim,
+                                                                                self.canFly, self.Aggression)
 
         self.isSick = False
         self.stepsUntilHealthy = 0
@@ -85,25 +137,58 @@ class Agent(Object):
         4 - Agent
         """
 
-        if self.swimVal == 1:
-            self.canSwim = True
-        if self.jumpVal == 1:
-            self.canJump = True
-        if self.flyVal == 1:
-            self.canFly = True
-        if self.scavengeVal == 1:
-            self.canScavenge = True
         if self.sickVal == 1:
             self.isSick = True
             # TODO: make this scale by gridsize
-            sicknessLength = random.randint(10, 50)
+            sicknessLength = self.rng.randint(10, 50)
             self.setStepsUntilHealthy(sicknessLength)
             # print("Sickness length: ", sicknessLength)
 
         # self.score = 0 #TODO: use this variable?
 
+    @staticmethod
+    def _parseGeneticString(geneticString):
+        """Returns a tuple of the traits a genetic string gives: vision range, smell radius, aggression, sleep type,
+        color, energy, jump, swim, fly, scavenge, sickness and disease resistance."""
+        return (int(geneticString[0]), int(geneticString[1]), int(geneticString[3]), int(geneticString[4]),
+                int(geneticString[5]), int(geneticString[6:8]), int(geneticString[8]), int(geneticString[9]),
+                int(geneticString[10]), int(geneticString[11]), int(geneticString[12]), int(geneticString[13]))
+
+    @classmethod
+    def fromSlot(cls, population, slot, geneticString, rng=random):
+        """Returns an agent for a slot of a population that already holds an agent's state, as when a saved
+        simulation is loaded, without setting any of that state or drawing any random numbers."""
+        agent = cls.__new__(cls)
+        agent.population = population
+        agent.slot = slot
+        agent.geneticString = geneticString
+        agent.visObjectId = None
+        agent.rng = rng
+        agent.moveSpeed = 1
+        agent.decisions = cls.decisionTables.get(geneticString)
+        if agent.decisions is None:
+            agent.decisions = cls.decisionTables[geneticString] = DecisionTable(agent.canJump, agent.canSwim,
+                                                                                agent.canFly, agent.Aggression)
+        return agent
+
+    def detach(self, ownPopulation=None):
+        """Moves the agent's state out of its population into another one (a population of its own if none is
+        given), giving its slot back. This is done when the agent dies, so the slot can go to a new agent while the
+        dead one can still be looked at."""
+        if ownPopulation is None:
+            ownPopulation = AgentPopulation(1)
+        ownSlot = ownPopulation.allocate()
+        ownPopulation.copySlot(self.population, self.slot, ownSlot)
+        self.population.release(self.slot)
+        self.population = ownPopulation
+        self.slot = ownSlot
+
     # =================================================================
     # Getter functions
+    def getAgentId(self):
+        """Returns the agent's id, which no other agent in its simulation has."""
+        return self.agentId
+
     def getEnergy(self):
         """Returns the current energy value."""
         return self.energy
@@ -152,6 +237,15 @@ class Agent(Object):
         """Returns the number of steps until the agent's mushroomInfluence wears off."""
         return self.stepsUntilNoMushroomInfluence
 
+    def getPauseStep(self):
+        """Returns how far the agent is through a pause: 0 if it is not pausing, otherwise the number of turns of
+        the pause it has made so far."""
+        return self.pauseStep
+
+    def isPausing(self):
+        """Returns True if the agent is partway through a pause."""
+        return self.pauseStep > 0
+
     def isAwake(self, sleepValue, time):
         """Returns a string that tells whether the agent is awake or asleep
         based on its sleep pattern and the time of day."""
@@ -174,7 +268,7 @@ class Agent(Object):
         """Changes the energy value by adding changeVal to it, reports back if the value goes to zero
         or below: the agent "dies" in that case."""
         if self.isSick:
-            randomInt = random.randint(0, 100)
+            randomInt = self.rng.randint(0, 100)
             chanceOfSurviving = .5-(self.resistanceVal*.05)
 
             if randomInt < chanceOfSurviving * 100:
@@ -204,6 +298,10 @@ class Agent(Object):
         """Reduces an agents steps until ready to breed by an input value."""
         self.readyToBreed = self.readyToBreed - breedVal
 
+    def setPauseStep(self, pauseStep):
+        """Sets how far the agent is through a pause."""
+        self.pauseStep = pauseStep
+
     def setReadyToBreed(self, breedVal):
         """Sets agents steps until ready to breed."""
         self.readyToBreed = breedVal
@@ -284,12 +382,12 @@ class Agent(Object):
 
     def attackCreature(self, sim, row, col):
         """Kills an agent at a given location if it is an enemy."""
-        for j in range(len(sim.agentsAt(row, col))):
-            if int(sim.agentsAt(row, col)[j].getColor()) != self.getColor():
-                deadCreature = sim.agentsAt(row, col)[j]
+        # copied, because killing an agent takes it out of the cell's list
+        for deadCreature in list(sim.agentsAt(row, col)):
+            if int(deadCreature.getColor()) != self.getColor():
                 self.setObjectConsumed(deadCreature.getObjectConsumed())
                 deadCreature.changeEnergy(-100)
-                deadCreature.isDead = True
+                sim.killAgent(deadCreature)
 
     # =================================================================
     # Detection helper functions
@@ -475,175 +573,30 @@ class Agent(Object):
 
     def detectSmellRadius(self, sim):
         """Returns the direction and object of one object in the agent's smell radius."""
-        ownY, ownX, heading = self.getPose()
-        smellRadius = self.geneticString[1]
-
-        # actions for if the agent has a smell radius of 1
-        if int(smellRadius) == 1:
-
-            creaturesSmelled = self.smellRadiusGlobal1(sim)
-            foodSmelled = self.smellRadiusGlobal1(sim)
-
-            cellsSmelled = self.combineStrings(creaturesSmelled, foodSmelled, self)
-
-            if cellsSmelled[0] > 0 and heading == "n":
-                return "above", cellsSmelled[0]
-            elif cellsSmelled[1] > 0 and heading == "n":
-                return "below", cellsSmelled[1]
-            elif cellsSmelled[2] > 0 and heading == "n":
-                return "right", cellsSmelled[2]
-            elif cellsSmelled[3] > 0 and heading == "n":
-                return "left", cellsSmelled[3]
-
-            elif cellsSmelled[0] > 0 and heading == "s":
-                return "below", cellsSmelled[0]
-            elif cellsSmelled[1] > 0 and heading == "s":
-                return "above", cellsSmelled[1]
-            elif cellsSmelled[2] > 0 and heading == "s":
-                return "left", cellsSmelled[2]
-            elif cellsSmelled[3] > 0 and heading == "s":
-                return "right", cellsSmelled[3]
-
-            elif cellsSmelled[0] > 0 and heading == "e":
-                return "left", cellsSmelled[0]
-            elif cellsSmelled[1] > 0 and heading == "e":
-                return "right", cellsSmelled[1]
-            elif cellsSmelled[2] > 0 and heading == "e":
-                return "above", cellsSmelled[2]
-            elif cellsSmelled[3] > 0 and heading == "e":
-                return "below", cellsSmelled[3]
-
-            elif cellsSmelled[0] > 0 and heading == "w":
-                return "right", cellsSmelled[0]
-            elif cellsSmelled[1] > 0 and heading == "w":
-                return "left", cellsSmelled[1]
-            elif cellsSmelled[2] > 0 and heading == "w":
-                return "below", cellsSmelled[2]
-            elif cellsSmelled[3] > 0 and heading == "w":
-                return "above", cellsSmelled[3]
-            else:
-                return "none"
+        heading = self.heading
+        smellRadius = int(self.geneticString[1])
 
-        elif int(smellRadius) == 2:
+        if smellRadius == 1:
+            cellsSmelled = self.smellRadiusGlobal1(sim)
+        elif smellRadius == 2:
             cellsSmelled = self.smellRadiusGlobal2(sim)
-            if cellsSmelled[0] > 0 and heading == "n":
-                return "above", cellsSmelled[0]
-            elif cellsSmelled[1] > 0 and heading == "n":
-                return "below", cellsSmelled[1]
-            elif cellsSmelled[2] > 0 and heading == "n":
-                return "right", cellsSmelled[2]
-            elif cellsSmelled[3] > 0 and heading == "n":
-                return "left", cellsSmelled[3]
-
-            elif cellsSmelled[0] > 0 and heading == "s":
-                return "below", cellsSmelled[0]
-            elif cellsSmelled[1] > 0 and heading == "s":
-                return "above", cellsSmelled[1]
-            elif cellsSmelled[2] > 0 and heading == "s":
-                return "left", cellsSmelled[2]
-            elif cellsSmelled[3] > 0 and heading == "s":
-                return "right", cellsSmelled[3]
-
-            elif cellsSmelled[0] > 0 and heading == "e":
-                return "left", cellsSmelled[0]
-            elif cellsSmelled[1] > 0 and heading == "e":
-                return "right", cellsSmelled[1]
-            elif cellsSmelled[2] > 0 and heading == "e":
-                return "above", cellsSmelled[2]
-            elif cellsSmelled[3] > 0 and heading == "e":
-                return "below", cellsSmelled[3]
-
-            elif cellsSmelled[0] > 0 and heading == "w":
-                return "right", cellsSmelled[0]
-            elif cellsSmelled[1] > 0 and heading == "w":
-                return "left", cellsSmelled[1]
-            elif cellsSmelled[2] > 0 and heading == "w":
-                return "below", cellsSmelled[2]
-            elif cellsSmelled[3] > 0 and heading == "w":
-                return "above", cellsSmelled[3]
-
-            elif (cellsSmelled[4] > 0) and heading == "n":
-                return "above", cellsSmelled[4]
-            elif (cellsSmelled[5] > 0) and heading == "n":
-                return "below", cellsSmelled[5]
-            elif (cellsSmelled[6] > 0) and heading == "n":
-                return "right", cellsSmelled[6]
-            elif (cellsSmelled[7] > 0) and heading == "n":
-                return "left", cellsSmelled[7]
-
-            elif (cellsSmelled[4] > 0) and heading == "s":
-                return "below", cellsSmelled[4]
-            elif (cellsSmelled[5] > 0) and heading == "s":
-                return "above", cellsSmelled[5]
-            elif (cellsSmelled[6] > 0) and heading == "s":
-                return "left", cellsSmelled[6]
-            elif (cellsSmelled[7] > 0) and heading == "s":
-                return "right", cellsSmelled[7]
-
-            elif (cellsSmelled[4] > 0) and heading == "e":
-                return "left", cellsSmelled[4]
-            elif (cellsSmelled[5] > 0) and heading == "e":
-                return "right", cellsSmelled[5]
-            elif (cellsSmelled[6] > 0) and heading == "e":
-                return "above", cellsSmelled[6]
-            elif (cellsSmelled[7] > 0) and heading == "e":
-                return "below", cellsSmelled[7]
-
-            elif (cellsSmelled[4] > 0) and heading == "w":
-                return "right", cellsSmelled[4]
-            elif (cellsSmelled[5] > 0) and heading == "w":
-                return "left", cellsSmelled[5]
-            elif (cellsSmelled[6] > 0) and heading == "w":
-                return "below", cellsSmelled[6]
-            elif (cellsSmelled[7] > 0) and heading == "w":
-                return "above", cellsSmelled[7]
-
-            elif cellsSmelled[8] > 0 and heading == "n":
-                return random.choice(["above", "left"]), cellsSmelled[8]
-            elif cellsSmelled[9] > 0 and heading == "n":
-                return random.choice(["above", "right"]), cellsSmelled[9]
-            elif cellsSmelled[10] > 0 and heading == "n":
-                return random.choice(["below", "left"]), cellsSmelled[10]
-            elif cellsSmelled[11] > 0 and heading == "n":
-                return random.choice(["below", "right"]), cellsSmelled[11]
-
-            elif cellsSmelled[8] > 0 and heading == "s":
-                return random.choice(["below", "right"]), cellsSmelled[8]
-            elif cellsSmelled[9] > 0 and heading == "s":
-                return random.choice(["below", "left"]), cellsSmelled[9]
-            elif cellsSmelled[10] > 0 and heading == "s":
-                return random.choice(["above", "right"]), cellsSmelled[10]
-            elif cellsSmelled[11] > 0 and heading == "s":
-                return random.choice(["above", "left"]), cellsSmelled[11]
-
-            elif cellsSmelled[8] > 0 and heading == "e":
-                return random.choice(["below", "left"]), cellsSmelled[8]
-            elif cellsSmelled[9] > 0 and heading == "e":
-                return random.choice(["above", "left"]), cellsSmelled[9]
-            elif cellsSmelled[10] > 0 and heading == "e":
-                return random.choice(["below", "right"]), cellsSmelled[10]
-            elif cellsSmelled[11] > 0 and heading == "e":
-                return random.choice(["above", "right"]), cellsSmelled[11]
-
-            elif cellsSmelled[8] > 0 and heading == "w":
-                return random.choice(["above", "right"]), cellsSmelled[8]
-            elif cellsSmelled[9] > 0 and heading == "w":
-                return random.choice(["below", "right"]), cellsSmelled[9]
-            elif cellsSmelled[10] > 0 and heading == "w":
-                return random.choice(["above", "left"]), cellsSmelled[10]
-            elif cellsSmelled[11] > 0 and heading == "w":
-                return random.choice(["below", "left"]), cellsSmelled[11]
-
-            else:
-                return "none"
-
         else:
             return "none"
 
+        # the first cell with something in it, as a direction relative to the agent's heading
+        directions = relativeDirections(heading, smellRadius)
+        for i in range(len(cellsSmelled)):
+            if cellsSmelled[i] is not None:
+                if len(directions[i]) == 1:
+                    return directions[i][0], cellsSmelled[i]
+                return self.rng.choice(directions[i]), cellsSmelled[i]
+        return "none"
+
     # =================================================================
     # Detection main functions - for determining actions
-    def checkHere(self, sim, listOfPossibleActions):
-        """Returns a list of possible actions after checking what objects are on the same square as the agent."""
+    def checkHere(self, sim):
+        """Returns the action the agent has to take because of what is on the same square as it, or None if nothing
+        there decides it."""
         ownX, ownY, ownH = self.getPose()
 
         # Might not need this -------- VVV
@@ -660,7 +613,7 @@ class Agent(Object):
                 if self.canFly:
                     self.changeEnergy(-5)
                 else:
-                    return ['die']
+                    return 'die'
 
         if not self.canJump:
             # if standing on rocks, die
@@ -669,19 +622,20 @@ class Agent(Object):
                 if self.canFly:
                     self.changeEnergy(-5)
                 else:
-                    return ['die']
+                    return 'die'
 
         # if standing on agent
         if len(self.removeSelfFromList(sim.agentsAt(ownX, ownY))) > 0:
             if self.removeSelfFromList(sim.agentsAt(ownX, ownY))[0].getIsSick() is True:
                 self.isSick = True
-                self.setStepsUntilHealthy(random.randint(5, 30))
+                self.setStepsUntilHealthy(self.rng.randint(5, 30))
+                sim.publish("changed", self)
             # the agent is a friend
             if self.getColor() == self.removeSelfFromList(sim.agentsAt(ownX, ownY))[0].getColor():
                 # print("Time to breed")
                 # if both agents are ready to breed
                 if self.getReadyToBreed() == 0 and self.removeSelfFromList(sim.agentsAt(ownX, ownY))[0].getReadyToBreed() == 0:
-                    return ['breed']
+                    return 'breed'
 
 
             # the agent is not a friend
@@ -689,17 +643,17 @@ class Agent(Object):
                 # if we aren't aggressive
                 if self.getAggression() == 0:
                     # TODO: change to random movement
-                    return ['forward']
+                    return 'forward'
                 # if we are aggressive
                 else:
-                    return ['attack']
+                    return 'attack'
 
         # if standing on food, eat
         elif len(self.removeSelfFromList(sim.foodAt(ownX, ownY))) > 0 or len(self.removeSelfFromList(sim.mushroomAt(ownX, ownY))) > 0:
             # print("There is food here")
             # if we can eat
             if self.getAggression() == 0:
-                return ['eat']
+                return 'eat'
 
         # if standing on tree
         elif len(self.removeSelfFromList(sim.treeAt(ownX, ownY))) > 0:
@@ -707,636 +661,200 @@ class Agent(Object):
             if self.removeSelfFromList(sim.treeAt(ownX, ownY))[0].getHasFood() == "1" and self.canScavenge and self.getEnergy() < 50:
                 self.removeSelfFromList(sim.treeAt(ownX, ownY))[0].setHasFood("0")
                 # print(self.removeSelfFromList(sim.treeAt(ownX, ownY))[0])
-                self.removeSelfFromList(sim.treeAt(ownX, ownY))[0].setStepsUntilBloom(random.randint(10,40))
-                return ['eatBerries']
-        return listOfPossibleActions
-
-    def checkVision(self, sim, listOfPossibleActions):
-        """Returns a list of possible actions after checking what objects the agent can see."""
+                self.removeSelfFromList(sim.treeAt(ownX, ownY))[0].setStepsUntilBloom(self.rng.randint(10,40))
+                sim.publish("bloomed", self.removeSelfFromList(sim.treeAt(ownX, ownY))[0])
+                return 'eatBerries'
+        return None
+
+    def checkVision(self, sim, allowed, key):
+        """Returns the mask of moves the agent may still make after checking what it can see, or the move it has
+        decided on. key is the agent's stateKey."""
         ownY, ownX, heading = self.getPose()
-        visionList = []
-        visionRange = self.visionRange
-
-        # if the heading is north
-        if heading == "n":
-            # loop through vision length
-            for i in range(int(visionRange)):
-
-                currentAboveCell = (ownY - i - 1) % sim.gridSize
-
-                # if it sees a tree, return the vision list
-                if len(self.removeSelfFromList(sim.treeAt(currentAboveCell, ownX))) > 0:
-                    if self.removeSelfFromList(sim.treeAt(currentAboveCell, ownX))[0].getHasFood() == "1" and self.canScavenge and self.getEnergy() < 50:
-                        visionList.append(self.removeSelfFromList(sim.treeAt(currentAboveCell, ownX))[0])
-                        return ['forward']
-                    else:
-                        break
-
-                # if it doesn't see a tree, add whatever it sees
-                else:
-                    visionList.append(sim._assessObjectsHere(currentAboveCell, ownX, self))
-
-
-        # if the heading is south
-        elif heading == "s":
-            # loop through vision length
-            for i in range(int(visionRange)):
-
-                currentAboveCell = (ownY + i + 1) % sim.gridSize
-
-                # if it sees a tree, return the vision list
-                if len(self.removeSelfFromList(sim.treeAt(currentAboveCell, ownX))) > 0:
-                    if self.removeSelfFromList(sim.treeAt(currentAboveCell, ownX))[0].getHasFood() == "1" and self.canScavenge and self.getEnergy() < 100:
-                        visionList.append(self.removeSelfFromList(sim.treeAt(currentAboveCell, ownX))[0])
-                        return ['forward']
-                    else:
-                        break
-
-                # if it doesn't see a tree, add whatever it sees
-                else:
-                    visionList.append(sim._assessObjectsHere(currentAboveCell, ownX, self))
-
-        # if the heading is east
-        elif heading == "e":
-            # loop through vision length
-            for i in range(int(visionRange)):
-
-                currentAboveCell = (ownX + i + 1) % sim.gridSize
-
-                # if it sees a tree, return the vision list
-                if len(self.removeSelfFromList(sim.treeAt(ownY, currentAboveCell))) > 0:
-                    if self.removeSelfFromList(sim.treeAt(ownY, currentAboveCell))[0].getHasFood() == "1" and self.canScavenge and self.getEnergy() < 100:
-                        visionList.append(self.removeSelfFromList(sim.treeAt(ownY, currentAboveCell)))
-                        return ['forward']
-                    else:
-                        break
-
-                # if it doesn't see a tree, add whatever it sees
-                else:
-                    visionList.append(sim._assessObjectsHere(ownY, currentAboveCell, self))
-
-        # if the heading is west
-        elif heading == "w":
-            # loop through vision length
-            for i in range(int(visionRange)):
+        firstThingInVision, tree = lookAlongRay(sim, ownY, ownX, heading, self.visionRange, self)
 
-                currentAboveCell = (ownX - i - 1) % sim.gridSize
-
-                # if it sees a tree, return the vision list
-                if len(self.removeSelfFromList(sim.treeAt(ownY, currentAboveCell))) > 0:
-                    if self.removeSelfFromList(sim.treeAt(ownY, currentAboveCell))[0].getHasFood() == "1" and self.canScavenge and self.getEnergy() < 100:
-                        visionList.append(self.removeSelfFromList(sim.treeAt(ownY, currentAboveCell)))
-                        return ['forward']
-                    else:
-                        break
-
-                # if it doesn't see a tree, add whatever it sees
-                else:
-                    visionList.append(sim._assessObjectsHere(ownY, currentAboveCell, self))
-
-        # print("Vision List: ", visionList)
-
-        try:
-            while True:
-                visionList.remove(None)
-        except ValueError:
-            pass
-
-        # print("Vision List after removing none: ", visionList)
+        # if it sees a tree with berries and wants them, go for it; any tree blocks what is behind it
+        if tree is not None:
+            if heading == "n":
+                hungerLimit = 50
+            else:
+                hungerLimit = 100
+            if tree.getHasFood() == "1" and self.canScavenge and self.getEnergy() < hungerLimit:
+                return DECIDED | FORWARD
 
         # if it can't see anything, return nothing
-        if visionList == []:
-            return listOfPossibleActions
-
-        # if the vision is not blocked by a tree
-        # firstThingInVision = None
-        # for i in visionList:
-        #     if i is not None:
-        #         firstThingInVision = i
-        #         break
-        firstThingInVision = visionList[0]
-        # print("First thing in vision:",firstThingInVision)
-        # print(type(firstThingInVision))
-
-        # if the thing it can see is none, return nothing
         if firstThingInVision is None:
-            # print("SITUATION 0")
-            return listOfPossibleActions
-
-        # if there is a stone directly in front and we can't jump, then take 'forward' out of the options
-        if type(firstThingInVision) is Stone and visionList[0] == firstThingInVision:
-            # print("SITUATION 1")
-            if self.canJump:
-                return listOfPossibleActions
-            else:
-                try:
-                    while True:
-                        listOfPossibleActions.remove('forward')
-                except ValueError:
-                    pass
-                return listOfPossibleActions
-
-        # if there is a water directly in front and we can't swim, then take 'forward' out of the options
-        if type(firstThingInVision) is Water and visionList[0] == firstThingInVision:
-            # print("SITUATION 2")
-            if self.canSwim:
-                return listOfPossibleActions
-            else:
-                try:
-                    while True:
-                        listOfPossibleActions.remove('forward')
-                except ValueError:
-                    pass
-                return listOfPossibleActions
-
-        # if the first thing it sees is food
-        if ((type(firstThingInVision) is Food ) or type(firstThingInVision) is Mushroom ) and (self.getAggression()==0):
-            # print("FIRST THING IN VISION IS FOOD")
-            # if we are hungry, eat
-            if self.getEnergy() < 50:
-                return ['forward']
-            # if we aren't, random
+            return allowed
+
+        # stay away from stones it can't jump, water it can't swim and enemies if it isn't aggressive; go for
+        # friends, enemies if it is aggressive, and food if it is hungry
+        kind = self._kindOf(firstThingInVision)
+        if kind is not None:
+            reaction = self.decisions.sight[key + kind]
+            if reaction == AVOID:
+                return allowed & ~FORWARD
+            elif reaction == APPROACH:
+                return DECIDED | FORWARD
+        return allowed
+
+    def checkSmell(self, sim, allowed, key):
+        """Returns the mask of moves the agent may still make after checking what objects it can smell, or the move it
+        has decided on. key is the agent's stateKey. Cells are checked nearest first, ahead, behind, right and left;
+        in the four cells next to the agent it also stays clear of stones and water it can't cross."""
+        radius = self.getSmellRadius()
+        if radius > 2:
+            return self.checkScent(sim, allowed)
+        if radius < 1:
+            return allowed
+
+        ownY, ownX, heading = self.getPose()
+        offsets = sensorOffsets(heading, radius)
+        for i in range(len(offsets)):
+            dRow, dCol = offsets[i]
+            moves = SMELL_MOVES[i]
+            reactions = self.decisions.near if i < 4 else self.decisions.far
+            for ob in self._smellCell(sim, (ownY + dRow) % sim.gridSize, (ownX + dCol) % sim.gridSize):
+                kind = self._kindOf(ob)
+                if kind is None:
+                    continue
+                reaction = reactions[key + kind]
+                if reaction == AVOID:
+                    for move in moves:
+                        allowed &= ~move
+                elif reaction == APPROACH:
+                    # next to the agent it always goes; further away only if it still may
+                    if i < 4:
+                        return DECIDED | moves[0]
+                    for move in moves:
+                        if allowed & move:
+                            return DECIDED | move
+        return allowed
+
+    def checkVisionFeatures(self, features, allowed, key):
+        """Does what checkVision does, from the feature row perceive made for the agent."""
+        if features[TREE_AHEAD] == FRUIT_TREE:
+            if self.heading == "n":
+                hungerLimit = 50
             else:
-                return listOfPossibleActions
-
-        # if the first thing we see is an agent
-        if type(firstThingInVision) is Agent:
-            # print("SITUATION 3")
-            # if we are friends
-            if self.getColor() == firstThingInVision.getColor():
-                if self.getReadyToBreed() == 0:
-                    return ['forward']
-                else:
-                    return ['forward']
-            # if we aren't friends
+                hungerLimit = 100
+            if self.canScavenge and self.getEnergy() < hungerLimit:
+                return DECIDED | FORWARD
+
+        kind = features[SIGHT]
+        if kind >= 0:
+            reaction = self.decisions.sight[key + kind]
+            if reaction == AVOID:
+                return allowed & ~FORWARD
+            elif reaction == APPROACH:
+                return DECIDED | FORWARD
+        return allowed
+
+    def checkSmellFeatures(self, sim, features, allowed, key):
+        """Does what checkSmell does, from the feature row perceive made for the agent. Only the kinds of thing in
+        each cell are known, not their order, so a cell further away with something that draws the agent and
+        something that warns it off draws it."""
+        if self.getSmellRadius() > 2:
+            return self.checkScent(sim, allowed)
+
+        cells = cellKey(key)
+        for i in range(NUM_SMELL_CELLS):
+            bits = features[SMELL + i]
+            if bits == 0:
+                continue
+            moves = SMELL_MOVES[i]
+            if i < 4:
+                reaction = self.decisions.nearCells[cells + bits]
             else:
-                # if I'm not aggressive, run
-                if self.getAggression() == 0:
-                    try:
-                        while True:
-                            listOfPossibleActions.remove('forward')
-                    except ValueError:
-                        pass
-                # if I am, try to attack
-                else:
-                    return ['forward']
-
-        # print("SITUATION 5")
-        # print("possible actions: ", listOfPossibleActions)
-        return listOfPossibleActions
-
-    def checkSmell(self,sim, listOfPossibleActions):
-        """Returns a list of possible actions after checking what objects the agent can smell."""
+                reaction = self.decisions.farCells[cells + bits]
+            if reaction == AVOID:
+                for move in moves:
+                    allowed &= ~move
+            elif reaction == APPROACH:
+                if i < 4:
+                    return DECIDED | moves[0]
+                for move in moves:
+                    if allowed & move:
+                        return DECIDED | move
+        return allowed
+
+    def checkScent(self, sim, allowed):
+        """Returns the mask of moves the agent may still make after checking which way things are, or the move it has
+        decided on, for an agent that smells further than two cells, by comparing the scents (see SmellEngine) in the
+        four cells around it."""
         ownY, ownX, heading = self.getPose()
-        cellsSmelled = []
-
-        if self.getSmellRadius() == 1 or self.getSmellRadius() == 2:
-            cellAbove = sim._listOfObjectsHere((ownY - 1) % sim.gridSize, ownX, self)
-            cellBelow = sim._listOfObjectsHere((ownY + 1) % sim.gridSize, ownX, self)
-            cellRight = sim._listOfObjectsHere(ownY, (ownX + 1) % sim.gridSize, self)
-            cellLeft = sim._listOfObjectsHere(ownY, (ownX - 1) % sim.gridSize, self)
-
-            cellsSmelled.append(cellAbove)
-            cellsSmelled.append(cellBelow)
-            cellsSmelled.append(cellRight)
-            cellsSmelled.append(cellLeft)
-
-            cellsSmelled = self.reorderListBasedOnHeading(cellsSmelled)
-
-            #Looking at the cell in front
-            for object in cellsSmelled[0]:
-                if (type(object) is Stone and not self.canJump) or (type(object) is Water and not self.canSwim) and not self.canFly:
-                    try:
-                        while True:
-                            listOfPossibleActions.remove('forward')
-                    except ValueError:
-                        pass
-
-                if (type(object) is Agent):
-                    #if it is a friend
-                    if (object.getColor() == self.getColor()) :
-                        #if ready to breeed
-                        if self.getReadyToBreed() == 0:
-                            return ['forward']
-                    #enemy is in front
-                    elif (object.getColor() != self.getColor()):
-                        if self.getAggression() == 0:
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('forward')
-                            except ValueError:
-                                pass
-                        else:
-                            return ['forward']
-
-                if ( ((type(object) is (Food)) or (type(object) is Mushroom) ) and (self.getAggression()==0) and (self.getEnergy()<50)):
-                    return ['forward']
-
-            # Looking at the cell behind
-            for object in cellsSmelled[1]:
-                if (type(object) is Stone and not self.canJump) or (type(object) is Water and not self.canSwim) and not self.canFly:
-                    try:
-                        while True:
-                            listOfPossibleActions.remove('turnAround')
-                    except ValueError:
-                        pass
-
-                if (type(object) is Agent):
-                    #if it is a friend
-                    if (object.getColor() == self.getColor()) :
-                        #if ready to breeed
-                        if self.getReadyToBreed() == 0:
-                            return ['turnAround']
-                    #enemy is behind
-                    elif (object.getColor() != self.getColor()):
-                        if self.getAggression() == 0:
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('turnAround')
-                            except ValueError:
-                                pass
-                        else:
-                            return ['turnAround']
-
-                if ( ((type(object) is (Food)) or (type(object) is Mushroom) ) and (self.getAggression()==0) and (self.getEnergy()<50)):
-                    return ['turnAround']
-
-            # Looking at the cell to the right
-            for object in cellsSmelled[2]:
-                if (type(object) is Stone and not self.canJump) or (type(object) is Water and not self.canSwim) and not self.canFly:
-                    try:
-                        while True:
-                            listOfPossibleActions.remove('right')
-                    except ValueError:
-                        pass
-
-                if (type(object) is Agent):
-                    #if it is a friend
-                    if (object.getColor() == self.getColor()) :
-                        #if ready to breeed
-                        if self.getReadyToBreed() == 0:
-                            return ['right']
-                    #enemy is to the right
-                    elif (object.getColor() != self.getColor()):
-                        if self.getAggression() == 0:
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('right')
-                            except ValueError:
-                                pass
-                        else:
-                            return ['right']
-
-                if ( ((type(object) is (Food)) or (type(object) is Mushroom) ) and (self.getAggression()==0) and (self.getEnergy()<50)):
-                    return ['right']
-
-            # Looking at the cell to the left
-            for object in cellsSmelled[3]:
-                if (type(object) is Stone and not self.canJump) or (type(object) is Water and not self.canSwim) and not self.canFly:
-                    try:
-                        while True:
-                            listOfPossibleActions.remove('left')
-                    except ValueError:
-                        pass
-
-                if (type(object) is Agent):
-                    #if it is a friend
-                    if (object.getColor() == self.getColor()) :
-                        #if ready to breeed
-                        if self.getReadyToBreed() == 0:
-                            return ['left']
-                    #enemy is to the left
-                    elif (object.getColor() != self.getColor()):
-                        if self.getAggression() == 0:
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('left')
-                            except ValueError:
-                                pass
-                        else:
-                            return ['left']
-
-                if ( ((type(object) is (Food)) or (type(object) is Mushroom) ) and (self.getAggression()==0) and (self.getEnergy()<50)):
-                    return ['left']
-
-        if self.getSmellRadius() == 2:
-            radius2cellssmelled = []
-            cellTwoAbove = sim._listOfObjectsHere((ownY - 2) % sim.gridSize, ownX, self)
-            cellTwoBelow = sim._listOfObjectsHere((ownY + 2) % sim.gridSize, ownX, self)
-            cellTwoRight = sim._listOfObjectsHere(ownY, (ownX + 2) % sim.gridSize, self)
-            cellTwoLeft = sim._listOfObjectsHere(ownY, (ownX - 2) % sim.gridSize, self)
-
-            cellAboveLeft = sim._listOfObjectsHere((ownY - 1) % sim.gridSize, (ownX - 1) % sim.gridSize, self)
-            cellAboveRight = sim._listOfObjectsHere((ownY - 1) % sim.gridSize, (ownX + 1) % sim.gridSize, self)
-            cellBelowRight = sim._listOfObjectsHere((ownY + 1) % sim.gridSize, (ownX + 1) % sim.gridSize, self)
-            cellBelowLeft = sim._listOfObjectsHere((ownY + 1) % sim.gridSize, (ownX - 1) % sim.gridSize, self)
-
-            radius2cellssmelled.append(cellTwoAbove)
-            radius2cellssmelled.append(cellTwoBelow)
-            radius2cellssmelled.append(cellTwoRight)
-            radius2cellssmelled.append(cellTwoLeft)
-            radius2cellssmelled.append(cellAboveLeft)
-            radius2cellssmelled.append(cellAboveRight)
-            radius2cellssmelled.append(cellBelowLeft)
-            radius2cellssmelled.append(cellBelowRight)
-
-            radius2cellssmelled = self.reorderListBasedOnHeadingLength8(radius2cellssmelled)
-            # print("R2CellsSmelled:",radius2cellssmelled)
-
-            # Looking at the cell in 2 squares front
-            for object in radius2cellssmelled[0]:
-                if (type(object) is Agent):
-                    # if it is a friend
-                    if (object.getColor() == self.getColor()):
-                        # if ready to breeed
-                        if self.getReadyToBreed() == 0 and 'forward' in listOfPossibleActions:
-                                return ['forward']
-                    # enemy is in front
-                    elif (object.getColor() != self.getColor()):
-                        if self.getAggression() == 0:
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('forward')
-                            except ValueError:
-                                pass
-                        else:
-                            if 'forward' in listOfPossibleActions:
-                                return ['forward']
-
-                if ( ((type(object) is (Food)) or (type(object) is Mushroom) ) and (self.getAggression()==0) and (self.getEnergy()<50)):
-                    if 'forward' in listOfPossibleActions:
-                        return ['forward']
-
-            # Looking at the cell 2 squares behind
-            for object in radius2cellssmelled[1]:
-                if (type(object) is Agent):
-                    # if it is a friend
-                    if (object.getColor() == self.getColor()):
-                        # if ready to breed
-                        if self.getReadyToBreed() == 0 and 'turnAround' in listOfPossibleActions:
-                            return ['turnAround']
-                    # enemy is behind
-                    elif (object.getColor() != self.getColor()):
-                        if self.getAggression() == 0:
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('turnAround')
-                            except ValueError:
-                                pass
-                        else:
-                            if 'turnAround' in listOfPossibleActions:
-                                return ['turnAround']
-
-                if ( ((type(object) is (Food)) or (type(object) is Mushroom) ) and (self.getAggression()==0) and (self.getEnergy()<50)):
-                    if 'turnAround' in listOfPossibleActions:
-                        return ['turnAround']
-
-            # Looking at the cell 2 squares to the right
-            for object in radius2cellssmelled[2]:
-                if (type(object) is Agent):
-                    # if it is a friend
-                    if (object.getColor() == self.getColor()):
-                        # if ready to breeed
-                        if self.getReadyToBreed() == 0 and 'right' in listOfPossibleActions:
-                            return ['right']
-                    # enemy is to the right
-                    elif (object.getColor() != self.getColor()):
-                        if self.getAggression() == 0:
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('right')
-                            except ValueError:
-                                pass
-                        else:
-                            if 'right' in listOfPossibleActions:
-                                return ['right']
-
-                if ( ((type(object) is (Food)) or (type(object) is Mushroom) ) and (self.getAggression()==0) and (self.getEnergy()<50)):
-                    if 'right' in listOfPossibleActions:
-                        return ['right']
-
-            # Looking at the cell 2 squares to the left
-            for object in radius2cellssmelled[3]:
-                if (type(object) is Agent):
-                    # if it is a friend
-                    if (object.getColor() == self.getColor()):
-                        # if ready to breeed
-                        if self.getReadyToBreed() == 0 and 'left' in listOfPossibleActions:
-                            return ['left']
-                    # enemy is to the right
-                    elif (object.getColor() != self.getColor()):
-                        if self.getAggression() == 0:
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('left')
-                            except ValueError:
-                                pass
-                        else:
-                            if 'left' in listOfPossibleActions:
-                                return ['left']
-
-                if ( ((type(object) is (Food)) or (type(object) is Mushroom) ) and (self.getAggression()==0) and (self.getEnergy()<50)):
-                    if 'left' in listOfPossibleActions:
-                        return ['left']
-
-            # Looking at the cell above and left
-            for object in radius2cellssmelled[4]:
-                if (type(object) is Agent):
-                    # if it is a friend
-                    if (object.getColor() == self.getColor()):
-                        # if ready to breed
-                        if self.getReadyToBreed() == 0:
-                            if 'forward' in listOfPossibleActions:
-                                return ['forward']
-                            elif 'left' in listOfPossibleActions:
-                                return ['left']
-                    # enemy is to the above + left
-                    elif (object.getColor() != self.getColor()):
-                        if self.getAggression() == 0:
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('left')
-                            except ValueError:
-                                pass
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('forward')
-                            except ValueError:
-                                pass
-                        #If we're aggressive
-                        else:
-                            if 'forward' in listOfPossibleActions:
-                                return ['forward']
-                            elif 'left' in listOfPossibleActions:
-                                return ['left']
-
-                if ( ((type(object) is (Food)) or (type(object) is Mushroom) ) and (self.getAggression()==0) and (self.getEnergy()<50)):
-                    if 'forward' in listOfPossibleActions:
-                        return ['forward']
-                    elif 'left' in listOfPossibleActions:
-                        return ['left']
-
-            # Looking at the cell above and right
-            for object in radius2cellssmelled[5]:
-                if (type(object) is Agent):
-                    # if it is a friend
-                    if (object.getColor() == self.getColor()):
-                        # if ready to breed
-                        if self.getReadyToBreed() == 0:
-                            if 'forward' in listOfPossibleActions:
-                                return ['forward']
-                            elif 'right' in listOfPossibleActions:
-                                return ['right']
-                    # enemy is to the above + right
-                    elif (object.getColor() != self.getColor()):
-                        if self.getAggression() == 0:
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('right')
-                            except ValueError:
-                                pass
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('forward')
-                            except ValueError:
-                                pass
-                        # If we're aggressive
-                        else:
-                            if 'forward' in listOfPossibleActions:
-                                return ['forward']
-                            elif 'right' in listOfPossibleActions:
-                                return ['right']
-
-                if ( ((type(object) is (Food)) or (type(object) is Mushroom) ) and (self.getAggression()==0) and (self.getEnergy()<50)):
-                    if 'forward' in listOfPossibleActions:
-                        return ['forward']
-                    elif 'right' in listOfPossibleActions:
-                        return ['right']
-
-            # Looking at the cell below and left
-            for object in radius2cellssmelled[6]:
-                if (type(object) is Agent):
-                    # if it is a friend
-                    if (object.getColor() == self.getColor()):
-                        # if ready to breed
-                        if self.getReadyToBreed() == 0:
-                            if 'turnAround' in listOfPossibleActions:
-                                return ['turnAround']
-                            elif 'left' in listOfPossibleActions:
-                                return ['left']
-                    # enemy is to the below + left
-                    elif (object.getColor() != self.getColor()):
-                        if self.getAggression() == 0:
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('left')
-                            except ValueError:
-                                pass
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('turnAround')
-                            except ValueError:
-                                pass
-                        # If we're aggressive
-                        else:
-                            if 'turnAround' in listOfPossibleActions:
-                                return ['turnAround']
-                            elif 'left' in listOfPossibleActions:
-                                return ['left']
-
-                if ( ((type(object) is (Food)) or (type(object) is Mushroom) ) and (self.getAggression()==0) and (self.getEnergy()<50)):
-                    if 'turnAround' in listOfPossibleActions:
-                        return ['turnAround']
-                    elif 'left' in listOfPossibleActions:
-                        return ['left']
-
-            # Looking at the cell below and right
-            for object in radius2cellssmelled[7]:
-                if (type(object) is Agent):
-                    # if it is a friend
-                    if (object.getColor() == self.getColor()):
-                        # if ready to breed
-                        if self.getReadyToBreed() == 0:
-                            if 'turnAround' in listOfPossibleActions:
-                                return ['turnAround']
-                            elif 'right' in listOfPossibleActions:
-                                return ['right']
-                    # enemy is to the below + right
-                    elif (object.getColor() != self.getColor()):
-                        if self.getAggression() == 0:
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('right')
-                            except ValueError:
-                                pass
-                            try:
-                                while True:
-                                    listOfPossibleActions.remove('turnAround')
-                            except ValueError:
-                                pass
-                        # If we're aggressive
-                        else:
-                            if 'turnAround' in listOfPossibleActions:
-                                return ['turnAround']
-                            elif 'right' in listOfPossibleActions:
-                                return ['right']
-
-                if ( ((type(object) is (Food)) or (type(object) is Mushroom) ) and (self.getAggression()==0) and (self.getEnergy()<50)):
-                    if 'turnAround' in listOfPossibleActions:
-                        return ['turnAround']
-                    elif 'right' in listOfPossibleActions:
-                        return ['right']
-        else:
-            pass
-            # print("CANT SMELL")
-
-        # print("Actions after smell: " + str(listOfPossibleActions))
-        return listOfPossibleActions
-
-
-    def determineAction(self, sim, time):
-        """Starts with an initial list of actions, decides which ones are still viable options after checking here,
-        checking vision, and checking smell, and chooses a random action from the remaining viable choices."""
-        listOfPossibleActions = ['left', 'right', 'turnAround', 'forward', 'forward', 'forward']
-        # print("isSick: ", self.isSick)
-        # print("Mushroom influence: ", self.mushroomInfluence)
-
+        radius = self.getSmellRadius()
+        moves = [FORWARD, TURN_AROUND, RIGHT, LEFT]
+        cells = [((ownY + r) % sim.gridSize, (ownX + c) % sim.gridSize) for (r, c) in sensorOffsets(heading, 1)]
+
+        smell = sim.smell
+        color = self.getColor()
+        friendScent = [smell.scent(color, radius, r, c) for (r, c) in cells]
+        enemyScent = [smell.scent("agents", radius, r, c) - friends for ((r, c), friends) in zip(cells, friendScent)]
+
+        # if ready to breed, head for friends
+        if self.getReadyToBreed() == 0:
+            move = self._strongestScent(moves, friendScent)
+            if move is not None and allowed & move:
+                return DECIDED | move
+
+        # head for enemies if aggressive, stay away if not
+        move = self._strongestScent(moves, enemyScent)
+        if move is not None:
+            if self.getAggression() == 0:
+                allowed &= ~move
+            elif allowed & move:
+                return DECIDED | move
+
+        # if hungry, head for food
+        if self.getAggression() == 0 and self.getEnergy() < 50:
+            move = self._strongestScent(moves, [smell.scent("food", radius, r, c) for (r, c) in cells])
+            if move is not None and allowed & move:
+                return DECIDED | move
+
+        return allowed
+
+    def determineAction(self, sim, time, features=None):
+        """Starts with every move allowed, decides which ones are still viable options after checking here,
+        checking vision, and checking smell, and chooses a random action from the remaining viable choices.
+        If a feature row from perceive is given, vision and smell come from it instead of the simulation, and
+        the agent's own cell is only looked at if the row says something else is there."""
         if self.mushroomInfluence == 2:
             return 'pause'
         elif self.mushroomInfluence == 3:
             #random movement
-            return listOfPossibleActions
-        # elif self.mushroomInfluence == 4:
-        #     self.changeEnergy(-5)
+            return CHOICES[ALL_MOVES]
 
-        if self.isAwake(self.sleepValue, time) == "awake":
+        awake = self.isAwake(self.sleepValue, time)
+        if awake == "awake":
 
             # ---------- Check where we are ---------- #
             # sets the action based on what we are standing on
-            listOfPossibleActions = self.checkHere(sim, listOfPossibleActions)
-            # print("Actions after here: ", listOfPossibleActions)
-            if len(listOfPossibleActions) == 1:
-                return listOfPossibleActions[0]
+            if features is None or features[HERE] != 0:
+                action = self.checkHere(sim)
+                if action is not None:
+                    return action
 
             # ---------- Check what we see ---------- #
             # if it isn't standing on anything, keep going
-            # sets the action based on what we see
-            listOfPossibleActions = self.checkVision(sim, listOfPossibleActions)
-            # print("Actions after vision: ", listOfPossibleActions)
-            if len(listOfPossibleActions) == 1:
-                return listOfPossibleActions[0]
+            key = stateKey(self.getReadyToBreed(), self.getEnergy())
+            if features is None:
+                allowed = self.checkVision(sim, ALL_MOVES, key)
+            else:
+                allowed = self.checkVisionFeatures(features, ALL_MOVES, key)
+            if len(CHOICES[allowed]) == 1:
+                return CHOICES[allowed][0]
 
             # ---------- Check what we smell ---------- #
-            # sets the action based on what we can smell
-            listOfPossibleActions = self.checkSmell(sim, listOfPossibleActions)
-            # print("Actions after smell: ", listOfPossibleActions)
-            if len(listOfPossibleActions) == 1:
-                return listOfPossibleActions[0]
+            if features is None:
+                allowed = self.checkSmell(sim, allowed, key)
+            else:
+                allowed = self.checkSmellFeatures(sim, features, allowed, key)
+            if len(CHOICES[allowed]) == 1:
+                return CHOICES[allowed][0]
 
-            if listOfPossibleActions == []:
-                return random.choice(['left', 'right', 'turnAround'])
+            if allowed == 0:
+                return self.rng.choice(CHOICES[LEFT | RIGHT | TURN_AROUND])
 
-            if listOfPossibleActions == ['left', 'right', 'turnAround', 'forward', 'forward', 'forward']:
+            if allowed == ALL_MOVES:
                 if self.getEnergy() < 25:
                     if self.canFly and len(self.removeSelfFromList(sim.treeAt(self.getPose()[0], self.getPose()[1]))) > 0:
                         # print("I AM ROOSTING")
@@ -1344,18 +862,10 @@ class Agent(Object):
                     else:
                         return 'rest'
 
-            action = random.choice(listOfPossibleActions)
-            # print("Action: ", action)
-            return action
+            return self.rng.choice(CHOICES[allowed])
 
-        elif self.isAwake(self.sleepValue, time) == "sleeping":
+        elif awake == "sleeping":
             return 'rest'
-            action = random.choice(listOfPossibleActions)
-            # print("Action: ", action)
-            return action
-        else:
-            pass
-            # print("ERROR WITH SLEEP VALUE")
 
     # =================================================================
     # Print functions
@@ -1490,10 +1000,11 @@ class Agent(Object):
             objectHere = self.removeSelfFromList(objectHere)
             if (len(objectHere) == 0):
                 # print("DROPPING OBJECT TREE SEEDS")
-                nextTree = Tree(initPose=(r, c), geneticString="0", stepSpawned=sim.stepNum)
+                nextTree = Tree(initPose=(r, c), geneticString="0", stepSpawned=sim.stepNum, rng=self.rng)
                 nextTree.setHasFood("-1")
                 nextTree.setStepsUntilBloom(51)
                 sim.treeList.append(nextTree)
+                sim.publish("spawned", nextTree)
             # sim.globalMap[r, c].append(nextTree)
 
         elif self.objectConsumed == 3:
@@ -1503,58 +1014,53 @@ class Agent(Object):
             if (len(objectHere) == 0):
                 nextMushroom = Mushroom(initPose=(r, c), geneticString="0", stepSpawned=sim.stepNum)
                 nextMushroom.setDroppingType(0)
-                sim.mushroomList.append(nextMushroom)
-                sim.globalMap[r, c].append(nextMushroom)
+                sim.addMushroom(nextMushroom, r, c)
                 # print("DROPPING OBJECT MUSHROOM SPORES")
 
         # elif self.objectConsumed == 4:
         #     print("DROPPING OBJECT FROM EATEN AGENT")
         #     pass
 
+    def _smellCell(self, sim, row, col):
+        """Returns the objects in a cell, or an empty tuple without looking at the cell if the smell counts show
+        nothing there to react to."""
+        if sim.smell.hasScent(row, col):
+            return sim._listOfObjectsHere(row, col, self)
+        return NO_OBJECTS
+
+    def _strongestScent(self, moves, scents):
+        """Returns the move leading to the strongest scent, or None if the scent is the same all around."""
+        best = max(range(len(scents)), key=lambda i: scents[i])
+        if scents[best] > min(scents):
+            return moves[best]
+        return None
+
+    def _kindOf(self, ob):
+        """Returns the kind of thing (as DecisionTable numbers them) an object is to this agent, or None if it is
+        nothing the agent reacts to."""
+        obType = type(ob)
+        if obType is Agent:
+            return FRIEND if ob.getColor() == self.getColor() else ENEMY
+        return self.thingKinds.get(obType)
+
     def removeSelfFromList(self, list):
-        """Takes in a list and removes this agent from the list."""
-        newList = list.copy()
-        if self in newList:
-            newList.remove(self)
-        return newList
+        """Takes in a list and returns its contents without this agent. The list passed in is never changed,
+        and it is handed back as it is when the agent is not in it."""
+        if self not in list:
+            return list
+        return [ob for ob in list if ob is not self]
 
     def reorderListBasedOnHeading(self, list):
         """Takes in a list (length 4) and reorders it to [above,below,right,left] based on the agent's current heading."""
-        heading = self.heading
-        if heading == 'n':
-            return list
-        elif heading == 's':
-            order = [1,0,3,2]
-        elif heading == 'e':
-            order = [2,3,1,0]
-        elif heading == 'w':
-            order = [3,2,0,1]
-        else:
-            print("heading invalid in reorder list function, returning north")
-            return list
-
-        list = [list[i] for i in order]
-        return list
+        return [list[i] for i in headingPermutation(self.heading, 1)]
 
     def reorderListBasedOnHeadingLength8(self, list):
         """Takes in a list (length 8) and reorders it to
             [2above,2below,2right,2left,aboveLeft,aboveRight,belowLeft,belowRight]
         based on the agent's current heading."""
-        heading = self.heading
-        if heading == 'n':
-            return list
-        elif heading == 's':
-            order = [1,0,3,2,7,6,5,4]
-        elif heading == 'e':
-            order = [2,3,1,0,5,7,4,6]
-        elif heading == 'w':
-            order = [3,2,0,1,6,4,7,5]
-        else:
-            print("heading invalid in reorder list function, returning north")
-            return list
-
-        list = [list[i] for i in order]
-        return list
+        # turning never moves the four nearest cells into the outer eight, so the last eight entries of the
+        # radius 2 order only point at the last eight cells
+        return [list[i - 4] for i in headingPermutation(self.heading, 2)[4:]]
 
     def getTypeAbbreviation(self):
         """Returns the abbreviation for an agent object, "a"."""
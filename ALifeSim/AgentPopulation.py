@@ -0,0 +1,177 @@
+import numpy as np
+
+from SharedArrays import SharedArrays
+
+# Headings are stored as small integers, in clockwise order.
+HEADINGS = ('n', 'e', 's', 'w')
+HEADING_CODES = {'n': 0, 'e': 1, 's': 2, 'w': 3}
+
+
+class AgentPopulation(object):
+    """Holds the state of a group of agents as parallel NumPy arrays, one entry per agent, so that things that
+    happen to every agent each step (sickness and mushroom timers counting down, breeding cooldowns) can be done
+    with a few array operations instead of a method call per agent. Each Agent owns one slot, and its attributes
+    read and write that slot's entries. Slots of agents that have died are reused for new agents.
+
+    A shared population keeps its arrays in a block of shared memory (see SharedArrays), so that pickling it sends
+    only the block's name and another process can read and write the same arrays. Growing moves the arrays to a new,
+    bigger block, so another process has to be sent the population again after that."""
+
+    FIELDS = (("agentId", np.int64), ("row", np.int32), ("col", np.int32), ("heading", np.int8),
+              ("energy", np.int64), ("stepSpawned", np.int64), ("readyToBreed", np.int32),
+              ("isSick", np.bool_), ("stepsUntilHealthy", np.int32),
+              ("mushroomInfluence", np.int8), ("stepsUntilNoMushroomInfluence", np.int32),
+              ("objectConsumed", np.int8), ("isDead", np.bool_), ("pauseStep", np.int8),
+              ("visionRange", np.int8), ("smellRadius", np.int8), ("Aggression", np.int8), ("sleepValue", np.int8),
+              ("color", np.int8), ("jumpVal", np.int8), ("swimVal", np.int8), ("flyVal", np.int8),
+              ("scavengeVal", np.int8), ("sickVal", np.int8), ("resistanceVal", np.int8),
+              ("canJump", np.bool_), ("canSwim", np.bool_), ("canFly", np.bool_), ("canScavenge", np.bool_))
+
+    def __init__(self, capacity=64, shared=False):
+        """Sets up room for capacity agents; the arrays grow when more are added. If shared is True, the arrays
+        are kept in shared memory, which unlink frees."""
+        self.capacity = max(1, capacity)
+        self.isShared = shared
+        self.shared = None
+        arrays = {}
+        for name, dtype in self.FIELDS:
+            arrays[name] = np.zeros(self.capacity, dtype=dtype)
+        arrays["inUse"] = np.zeros(self.capacity, dtype=np.bool_)
+        self._setArrays(arrays)
+        self.freeSlots = list(range(self.capacity - 1, -1, -1))
+        self.nextId = 0
+
+    def _setArrays(self, arrays):
+        """Makes the arrays in the dict the population's, first moving them into a new shared block (and freeing
+        the old one) if the population is shared."""
+        oldShared = self.shared
+        if self.isShared:
+            self.shared = SharedArrays(arrays)
+            arrays = self.shared.arrays
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        if oldShared is not None and oldShared.isOwner:
+            oldShared.unlink()
+
+    def __getstate__(self):
+        """Leaves the arrays out of the pickle if they are shared, since unpickling attaches to them."""
+        state = self.__dict__.copy()
+        if self.shared is not None:
+            for name, dtype in self.FIELDS:
+                del state[name]
+            del state["inUse"]
+        return state
+
+    def __setstate__(self, state):
+        """Rebuilds the population from a pickle, attaching to the shared arrays if it has any."""
+        self.__dict__.update(state)
+        if self.shared is not None:
+            for name, array in self.shared.arrays.items():
+                setattr(self, name, array)
+
+    def unlink(self):
+        """Frees the shared memory of a shared population made in this process."""
+        if self.shared is not None and self.shared.isOwner:
+            self.shared.unlink()
+
+    def __len__(self):
+        """Returns the number of slots in use."""
+        return self.capacity - len(self.freeSlots)
+
+    def allocate(self):
+        """Returns a free slot, with every entry set to zero apart from a new agentId, and marks it as in use.
+        Agent ids are never reused, so they stay the same however slots are handed out."""
+        if len(self.freeSlots) == 0:
+            self._grow()
+        slot = self.freeSlots.pop()
+        for name, dtype in self.FIELDS:
+            getattr(self, name)[slot] = 0
+        self.agentId[slot] = self.nextId
+        self.nextId += 1
+        self.inUse[slot] = True
+        return slot
+
+    def release(self, slot):
+        """Gives a slot back so that it can be reused."""
+        self.inUse[slot] = False
+        self.freeSlots.append(slot)
+
+    def _grow(self):
+        """Doubles the length of every array."""
+        oldCapacity = self.capacity
+        self.capacity *= 2
+        arrays = {}
+        for name, dtype in self.FIELDS:
+            arrays[name] = np.zeros(self.capacity, dtype=dtype)
+            arrays[name][:oldCapacity] = getattr(self, name)
+        arrays["inUse"] = np.zeros(self.capacity, dtype=np.bool_)
+        arrays["inUse"][:oldCapacity] = self.inUse
+        self._setArrays(arrays)
+        self.freeSlots.extend(range(self.capacity - 1, oldCapacity - 1, -1))
+
+    def copySlot(self, other, otherSlot, slot):
+        """Copies every entry of a slot in another population into a slot of this one."""
+        for name, dtype in self.FIELDS:
+            getattr(self, name)[slot] = getattr(other, name)[otherSlot]
+
+    def tickTimers(self):
+        """Counts down the sickness and mushroom timers of every agent. A sick agent gets better by its disease
+        resistance each step, and is well again once the count reaches zero; mushroom influence wears off after
+        its count of steps. Returns an array of the slots whose sickness or mushroom influence changed."""
+        wasSick = self.isSick.copy()
+        wasInfluenced = self.mushroomInfluence.copy()
+        healthy = self.stepsUntilHealthy
+        counting = self.inUse & (healthy > 0)
+        self.isSick[counting] = True
+        healthy[counting] -= self.resistanceVal[counting]
+        done = self.inUse & (healthy <= 0)
+        self.isSick[done] = False
+        healthy[done] = 0
+
+        influence = self.stepsUntilNoMushroomInfluence
+        counting = self.inUse & (influence > 0)
+        influence[counting] -= 1
+        done = self.inUse & (influence <= 0)
+        self.mushroomInfluence[done] = 0
+        influence[done] = 0
+        return np.flatnonzero(self.inUse & ((self.isSick != wasSick) | (self.mushroomInfluence != wasInfluenced)))
+
+    def tickBreeding(self):
+        """Counts down the breeding cooldown of every agent that is still alive."""
+        cooling = self.inUse & ~self.isDead & (self.readyToBreed != 0)
+        self.readyToBreed[cooling] -= 1
+
+
+def populationField(name):
+    """Makes a property for the Agent class that reads and writes the agent's entry in one of its population's
+    arrays, giving back plain Python values."""
+    def getField(agent):
+        return getattr(agent.population, name).item(agent.slot)
+
+    def setField(agent, value):
+        getattr(agent.population, name)[agent.slot] = value
+
+    return property(getField, setField)
+
+
+def headingField():
+    """Makes the property for an agent's heading, which is stored as a number but read and written as a letter."""
+    def getHeading(agent):
+        return HEADINGS[agent.population.heading.item(agent.slot)]
+
+    def setHeading(agent, value):
+        agent.population.heading[agent.slot] = HEADING_CODES[value]
+
+    return property(getHeading, setHeading)
+
+
+def colorField():
+    """Makes the property for an agent's color. Object.__init__ starts every object's color out as an empty
+    string, which is stored as 0, the 'none' color."""
+    def getColor(agent):
+        return agent.population.color.item(agent.slot)
+
+    def setColor(agent, value):
+        agent.population.color[agent.slot] = value if value != "" else 0
+
+    return property(getColor, setColor)
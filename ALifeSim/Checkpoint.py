@@ -0,0 +1,258 @@
+import json
+import mmap
+import os
+import random
+import struct
+
+import numpy as np
+
+import ALifeSim
+from Agent import Agent
+from AgentPopulation import AgentPopulation
+from FreeCells import FreeCells
+from Food import Food
+from Mushroom import Mushroom
+from Object import Object
+from RandomStreams import RandomStreams
+from TerrainLayers import TerrainLayers
+from Tree import Tree
+
+# A checkpoint file is MAGIC, then the format version and the length of the header as little-endian 32-bit numbers,
+# then the header, as JSON, then the arrays the header lists, each starting on a multiple of ALIGNMENT bytes after
+# the end of the header. Files written by a newer version of the format than FORMAT_VERSION are refused.
+MAGIC = b"ALIFECKP"
+FORMAT_VERSION = 1
+ALIGNMENT = 16
+_PREFIX = struct.Struct("<8sII")
+
+# The numbers and flags of a simulation that are saved as they are.
+SIM_FIELDS = ("gridSize", "numAgents", "numStones", "numWaters", "numTrees", "numRivers", "numPonds", "numForests",
+              "numPits", "numMushrooms", "numSands", "numSnows", "numGrass", "maxFood", "stepNum", "time", "numDead",
+              "deadLifespanTotal", "deadLifespanMax", "keepDeadAgents", "verbose", "batchPerception", "synchronous")
+
+# The attributes saved for trees, mushrooms and food, with the type of array each is kept in. Strings are kept as
+# bytes.
+OBJECT_FIELDS = {Tree: (("row", np.int32), ("col", np.int32), ("geneticString", np.bytes_),
+                        ("stepSpawned", np.int64), ("hasFood", np.bytes_), ("justChanged", np.bool_),
+                        ("stepsUntilBloom", np.int32)),
+                 Mushroom: (("row", np.int32), ("col", np.int32), ("geneticString", np.bytes_),
+                            ("stepSpawned", np.int64), ("typeOfMushroom", np.int8), ("droppingType", np.int8),
+                            ("justChanged", np.bool_), ("stepsUntilGrowth", np.int32)),
+                 Food: (("row", np.int32), ("col", np.int32), ("geneticString", np.bytes_),
+                        ("stepSpawned", np.int64))}
+
+# How the objects in each cell are told apart: what kind of thing each is, and where it is in the list for its kind.
+AGENT, TREE, MUSHROOM, FOOD = range(4)
+_KIND_NAMES = ("agent", "tree", "mushroom", "food")
+_KINDS = {Agent: AGENT, Tree: TREE, Mushroom: MUSHROOM, Food: FOOD}
+
+
+def saveCheckpoint(sim, path):
+    """Writes everything needed to carry on a simulation to a checkpoint file: the terrain, trees, mushrooms, food,
+    living and dead agents, what is in each cell and in what order, the free cells, the random number streams, and
+    the step and time of day. It must be called between steps. The arrays are written one at a time, straight from
+    the simulation where they can be, and the file is only put in place once it is complete, so a crash while
+    saving leaves any earlier checkpoint at the path as it was. The GUI's canvas ids, event subscribers and any
+    TiledPerception are not saved."""
+    if sim.numDying > 0:
+        raise ValueError("A simulation can only be saved between steps")
+    header = {"sim": dict((name, getattr(sim, name)) for name in SIM_FIELDS), "seed": sim.rng.seed}
+    arrays = {}
+
+    for kind in TerrainLayers.KINDS:
+        arrays["terrain/" + kind.__name__] = np.packbits(sim.terrain.layers[kind])
+
+    objects = {TREE: sim.treeList, MUSHROOM: list(sim.mushrooms), FOOD: list(sim.food)}
+    for code, obs in objects.items():
+        for name, dtype in OBJECT_FIELDS[_kindClass(code)]:
+            arrays[_KIND_NAMES[code] + "/" + name] = np.array([getattr(ob, name) for ob in obs], dtype=dtype)
+
+    header["population"] = _savePopulation(sim.population, "population/", arrays)
+    header["graveyard"] = _savePopulation(sim.graveyard, "graveyard/", arrays)
+    objects[AGENT] = sim.agentList
+    arrays["agent/slot"] = np.array([agent.slot for agent in sim.agentList], dtype=np.int32)
+    arrays["agent/geneticString"] = np.array([agent.geneticString for agent in sim.agentList], dtype=np.bytes_)
+    arrays["dead/slot"] = np.array([agent.slot for (agent, timeLived) in sim.deadAgents], dtype=np.int32)
+    arrays["dead/geneticString"] = np.array([agent.geneticString for (agent, timeLived) in sim.deadAgents],
+                                            dtype=np.bytes_)
+    arrays["dead/timeLived"] = np.array([timeLived for (agent, timeLived) in sim.deadAgents], dtype=np.int64)
+    header["initialGeneticStrings"] = sim.initialGeneticStrings is not None
+    arrays["initialGeneticStrings"] = np.array(sim.initialGeneticStrings or [], dtype=np.bytes_)
+
+    # the contents of every cell, in the order the globalMap holds them
+    where = dict((code, dict((ob, i) for (i, ob) in enumerate(obs))) for (code, obs) in objects.items())
+    cells = []
+    for (row, col), objectsHere in sim.globalMap.items():
+        for ob in objectsHere:
+            code = _KINDS[type(ob)]
+            cells.append((row, col, code, where[code][ob]))
+    arrays["cells"] = np.array(cells, dtype=np.int32).reshape(len(cells), 4)
+    header["freeCells"] = sim.freeCells.size
+    arrays["freeCells"] = sim.freeCells.cells.astype(np.int32)
+
+    header["rng"] = {}
+    for name in ("world", "behavior", "search"):
+        version, internalState, gaussNext = getattr(sim.rng, name).getstate()
+        header["rng"][name] = {"version": version, "gaussNext": gaussNext}
+        arrays["rng/" + name] = np.array(internalState, dtype=np.uint32)
+    header["rng"]["worldArrays"] = sim.rng.worldArrays.bit_generator.state
+
+    layout = []
+    offset = 0
+    for name, array in arrays.items():
+        layout.append((name, array.dtype.str, array.shape, offset))
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header["arrays"] = layout
+    headerBytes = json.dumps(header).encode("utf-8")
+    headerBytes += b" " * (-(_PREFIX.size + len(headerBytes)) % ALIGNMENT)
+
+    tempPath = path + ".tmp"
+    with open(tempPath, "wb") as outFile:
+        outFile.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(headerBytes)))
+        outFile.write(headerBytes)
+        for name, array in arrays.items():
+            outFile.write(np.ascontiguousarray(array).data)
+            outFile.write(b"\0" * (-array.nbytes % ALIGNMENT))
+    os.replace(tempPath, path)
+
+
+def loadCheckpoint(path):
+    """Returns the simulation saved in a checkpoint file, which carries on exactly as the saved one would have.
+    The file is mapped into memory rather than read, and only what the simulation keeps is copied out of it."""
+    with open(path, "rb") as inFile:
+        mapped = mmap.mmap(inFile.fileno(), 0, access=mmap.ACCESS_READ)
+    saved = None
+    try:
+        saved = SavedWorld(mapped)
+        sim = ALifeSim.ALifeSimTest(saved.header["sim"]["gridSize"], 0, 0, 0, 0, 0, [], template=saved)
+        for name, value in saved.header["sim"].items():
+            setattr(sim, name, value)
+        sim.initialGeneticStrings = saved.initialGeneticStrings
+    finally:
+        saved = None
+        try:
+            mapped.close()
+        except BufferError:
+            pass
+    return sim
+
+
+class SavedWorld(object):
+    """A simulation read from a checkpoint, ready to be given to ALifeSimTest as the world to start from (see
+    WorldTemplate, which does the same for a world that has just been built)."""
+
+    def __init__(self, buffer):
+        """Reads the header and the terrain from a buffer holding a whole checkpoint file."""
+        magic, version, headerLength = _PREFIX.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not an ALife checkpoint")
+        if version > FORMAT_VERSION:
+            raise ValueError("Checkpoint format version " + str(version) + " is newer than this code can read")
+        self.header = json.loads(bytes(buffer[_PREFIX.size:_PREFIX.size + headerLength]).decode("utf-8"))
+        dataStart = _PREFIX.size + headerLength
+        self.arrays = {}
+        for (name, dtype, shape, offset) in self.header["arrays"]:
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape, dtype=np.int64))
+            self.arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                              offset=dataStart + offset).reshape(shape)
+
+        gridSize = self.header["sim"]["gridSize"]
+        self.terrain = TerrainLayers(gridSize)
+        for kind in TerrainLayers.KINDS:
+            bits = np.unpackbits(self.arrays["terrain/" + kind.__name__], count=gridSize * gridSize)
+            self.terrain.placeMask(kind, bits.reshape(gridSize, gridSize).astype(bool))
+
+        if self.header["initialGeneticStrings"]:
+            self.initialGeneticStrings = _strings(self.arrays["initialGeneticStrings"])
+        else:
+            self.initialGeneticStrings = None
+
+    def randomStreams(self):
+        """Returns the random number streams as they were when the checkpoint was saved."""
+        streams = RandomStreams.__new__(RandomStreams)
+        streams.seed = self.header["seed"]
+        for name in ("world", "behavior", "search"):
+            state = self.header["rng"][name]
+            stream = random.Random()
+            stream.setstate((state["version"], tuple(self.arrays["rng/" + name].tolist()), state["gaussNext"]))
+            setattr(streams, name, stream)
+        streams.worldArrays = np.random.default_rng()
+        streams.worldArrays.bit_generator.state = self.header["rng"]["worldArrays"]
+        return streams
+
+    def copyWorldInto(self, sim):
+        """Gives a new simulation standing on the saved terrain the saved trees, mushrooms, food and agents, puts
+        them in their cells in the order they were in, and gives it the saved free cells."""
+        sim.population = self._population("population/", self.header["population"])
+        sim.graveyard = self._population("graveyard/", self.header["graveyard"])
+        rng = sim.rng.behavior
+        sim.agentList = [Agent.fromSlot(sim.population, slot, geneticString, rng) for (slot, geneticString) in
+                         zip(self.arrays["agent/slot"].tolist(), _strings(self.arrays["agent/geneticString"]))]
+        sim.deadAgents = [(Agent.fromSlot(sim.graveyard, slot, geneticString, rng), timeLived)
+                          for (slot, geneticString, timeLived) in
+                          zip(self.arrays["dead/slot"].tolist(), _strings(self.arrays["dead/geneticString"]),
+                              self.arrays["dead/timeLived"].tolist())]
+        sim.treeList = self._objects(TREE)
+        sim.mushrooms = dict((mushroom, None) for mushroom in self._objects(MUSHROOM))
+        sim.food = dict((food, None) for food in self._objects(FOOD))
+
+        objects = {AGENT: sim.agentList, TREE: sim.treeList, MUSHROOM: list(sim.mushrooms), FOOD: list(sim.food)}
+        for (row, col, code, i) in self.arrays["cells"].tolist():
+            sim.addObject(objects[code][i], row, col)
+
+        freeCells = FreeCells.__new__(FreeCells)
+        freeCells.gridSize = sim.gridSize
+        freeCells.cells = self.arrays["freeCells"].astype(np.int64)
+        freeCells.where = np.empty_like(freeCells.cells)
+        freeCells.where[freeCells.cells] = np.arange(len(freeCells.cells))
+        freeCells.size = self.header["freeCells"]
+        sim.freeCells = freeCells
+
+    def _objects(self, code):
+        """Returns new trees, mushrooms or food with the saved attributes."""
+        kind = _kindClass(code)
+        prefix = _KIND_NAMES[code] + "/"
+        columns = []
+        for name, dtype in OBJECT_FIELDS[kind]:
+            column = self.arrays[prefix + name]
+            columns.append(_strings(column) if dtype is np.bytes_ else column.tolist())
+        obs = []
+        for values in zip(*columns):
+            ob = kind.__new__(kind)
+            Object.__init__(ob)
+            for (name, dtype), value in zip(OBJECT_FIELDS[kind], values):
+                setattr(ob, name, value)
+            obs.append(ob)
+        return obs
+
+    def _population(self, prefix, state):
+        """Returns a new AgentPopulation holding copies of the saved arrays."""
+        population = AgentPopulation(state["capacity"])
+        arrays = {}
+        for name, dtype in AgentPopulation.FIELDS:
+            arrays[name] = self.arrays[prefix + name].copy()
+        arrays["inUse"] = self.arrays[prefix + "inUse"].copy()
+        population._setArrays(arrays)
+        population.freeSlots = self.arrays[prefix + "freeSlots"].tolist()
+        population.nextId = state["nextId"]
+        return population
+
+
+def _savePopulation(population, prefix, arrays):
+    """Adds the arrays of an AgentPopulation to the ones to save, and returns the rest of its state."""
+    for name, dtype in AgentPopulation.FIELDS:
+        arrays[prefix + name] = getattr(population, name)
+    arrays[prefix + "inUse"] = population.inUse
+    arrays[prefix + "freeSlots"] = np.array(population.freeSlots, dtype=np.int64)
+    return {"capacity": population.capacity, "nextId": population.nextId}
+
+
+def _kindClass(code):
+    """Returns the class of the objects of a kind code."""
+    return (Agent, Tree, Mushroom, Food)[code]
+
+
+def _strings(array):
+    """Returns the strings held in an array of bytes."""
+    return [value.decode("ascii") for value in array.tolist()]
@@ -0,0 +1,106 @@
+# The moves an agent chooses between, as the bits of a mask of the moves it may still make. DECIDED is set in a mask
+# that holds the one move the agent has settled on.
+LEFT = 1
+RIGHT = 2
+TURN_AROUND = 4
+FORWARD = 8
+ALL_MOVES = LEFT | RIGHT | TURN_AROUND | FORWARD
+DECIDED = 16
+
+MOVE_NAMES = {LEFT: 'left', RIGHT: 'right', TURN_AROUND: 'turnAround', FORWARD: 'forward'}
+
+# An agent with nothing to steer it picks a move from this list, so it goes forward half the time.
+MOVE_LIST = (LEFT, RIGHT, TURN_AROUND, FORWARD, FORWARD, FORWARD)
+
+# For every mask, the names of the moves to pick from: the entries of MOVE_LIST the mask allows, in order, or just the
+# decided move.
+CHOICES = tuple(tuple(MOVE_NAMES[move] for move in ((LEFT, RIGHT, TURN_AROUND, FORWARD) if mask & DECIDED else MOVE_LIST)
+                      if move & mask)
+                for mask in range(2 * DECIDED))
+
+# The moves that take an agent toward each cell of SensorMap.sensorOffsets(heading, 2), in the same order, best first.
+SMELL_MOVES = ((FORWARD,), (TURN_AROUND,), (RIGHT,), (LEFT,),
+               (FORWARD,), (TURN_AROUND,), (RIGHT,), (LEFT,),
+               (FORWARD, LEFT), (FORWARD, RIGHT), (TURN_AROUND, LEFT), (TURN_AROUND, RIGHT))
+
+# The kinds of thing an agent reacts to.
+STONE, WATER, FRIEND, ENEMY, FOOD = range(5)
+NUM_KINDS = 5
+
+# How an agent reacts to a kind of thing.
+IGNORE, AVOID, APPROACH = range(3)
+
+# The number of different mixes of kinds of thing a cell can hold, as bits (1 << kind).
+NUM_CELL_MASKS = 1 << NUM_KINDS
+
+# The parts of an agent's state its reactions depend on, as bits of a state number.
+BREEDING = 1
+HUNGRY = 2
+NUM_STATES = 4
+
+
+def stateKey(readyToBreed, energy):
+    """Returns the number that picks out the part of a DecisionTable's lists for an agent's current state. Added to a
+    kind of thing, it gives the index of the agent's reaction to that kind."""
+    state = 0
+    if readyToBreed == 0:
+        state |= BREEDING
+    if energy < 50:
+        state |= HUNGRY
+    return state * NUM_KINDS
+
+
+def cellKey(key):
+    """Returns the number that picks out the part of a DecisionTable's cell lists for the state with the given
+    stateKey. Added to the bits of what is in a cell, it gives the index of the agent's reaction to the cell."""
+    return key // NUM_KINDS * NUM_CELL_MASKS
+
+
+class DecisionTable(object):
+    """How an agent with a given set of traits reacts to each kind of thing it can sense, for each state it can be in,
+    worked out once so that deciding on a move is a list lookup per thing sensed. Agents with the same genetic string
+    share one table.
+
+    near holds the reactions to things smelled in the four cells next to the agent, far those to things smelled further
+    away, and sight those to the first thing the agent sees. Each is indexed by stateKey(...) plus a kind of thing.
+    nearCells and farCells hold the reactions to a whole cell, indexed by cellKey(...) plus the bits of what is in it,
+    for perception that only knows what kinds of thing a cell holds."""
+
+    def __init__(self, canJump, canSwim, canFly, aggression):
+        """Works out the reactions of an agent with the given traits."""
+        near = []
+        far = []
+        sight = []
+        for state in range(NUM_STATES):
+            breeding = state & BREEDING
+            hungry = state & HUNGRY
+            toFriend = APPROACH if breeding else IGNORE
+            toEnemy = AVOID if aggression == 0 else APPROACH
+            toFood = APPROACH if aggression == 0 and hungry else IGNORE
+
+            near.extend([AVOID if not canJump else IGNORE, AVOID if not canSwim and not canFly else IGNORE,
+                         toFriend, toEnemy, toFood])
+            far.extend([IGNORE, IGNORE, toFriend, toEnemy, toFood])
+            sight.extend([AVOID if not canJump else IGNORE, AVOID if not canSwim else IGNORE,
+                          APPROACH, toEnemy, toFood])
+        self.near = tuple(near)
+        self.far = tuple(far)
+        self.sight = tuple(sight)
+        self.nearCells = self._cellReactions(self.near)
+        self.farCells = self._cellReactions(self.far)
+
+    @staticmethod
+    def _cellReactions(reactions):
+        """Returns the reactions to cells holding each mix of kinds of thing, for each state: an agent heads for a
+        cell if anything in it draws the agent, and otherwise stays away if anything in it warns the agent off."""
+        cells = []
+        for state in range(NUM_STATES):
+            for bits in range(NUM_CELL_MASKS):
+                kinds = [reactions[state * NUM_KINDS + kind] for kind in range(NUM_KINDS) if bits & (1 << kind)]
+                if APPROACH in kinds:
+                    cells.append(APPROACH)
+                elif AVOID in kinds:
+                    cells.append(AVOID)
+                else:
+                    cells.append(IGNORE)
+        return tuple(cells)
@@ -0,0 +1,78 @@
+import collections
+
+# One thing that happened in the simulation. kind is one of EventLog.KINDS, ob is the object it happened to, stepNum
+# is the step it happened in, and agent is the agent that caused it, if any (the eater, for "ate" events).
+Event = collections.namedtuple("Event", ["kind", "ob", "stepNum", "agent"])
+
+
+class EventLog(object):
+    """Publishes what happens in the simulation each step, so that the GUI, statistics and loggers can keep up with
+    the world by handling only that step's changes instead of rescanning every object. Each consumer subscribes
+    and gets its own EventQueue, which collects events until it is drained. Events are only kept for subscribers,
+    so a simulation nobody is watching does not build up a history.
+
+    The kinds of event are:
+        spawned    - a new agent, food, tree or mushroom has appeared
+        moved      - an agent's position or heading has changed
+        ate        - a food or mushroom has been eaten by an agent
+        died       - an agent has died and been taken off the grid
+        bloomed    - a tree has changed between seeds, bare and bearing fruit
+        sporulated - a mushroom's spores have grown into a mushroom
+        changed    - an agent has fallen sick or got better, or come under or out of a mushroom's influence"""
+
+    KINDS = ("spawned", "moved", "ate", "died", "bloomed", "sporulated", "changed")
+
+    def __init__(self):
+        """Sets up a log with no subscribers."""
+        self.queues = []
+
+    def subscribe(self, kinds=None):
+        """Returns a new EventQueue that will collect every event published from now on, or only those of the
+        given kinds if a list of kinds is given."""
+        if kinds is not None:
+            for kind in kinds:
+                if kind not in self.KINDS:
+                    raise ValueError("Unknown event kind: " + str(kind))
+        queue = EventQueue(kinds)
+        self.queues.append(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        """Stops sending events to the queue."""
+        if queue in self.queues:
+            self.queues.remove(queue)
+
+    def wants(self, kind):
+        """Returns True if any subscriber collects events of the kind."""
+        for queue in self.queues:
+            if queue.kinds is None or kind in queue.kinds:
+                return True
+        return False
+
+    def publish(self, kind, ob, stepNum, agent=None):
+        """Sends an event to every subscriber that wants events of its kind."""
+        if len(self.queues) == 0:
+            return
+        event = Event(kind, ob, stepNum, agent)
+        for queue in self.queues:
+            if queue.kinds is None or kind in queue.kinds:
+                queue.events.append(event)
+
+
+class EventQueue(object):
+    """The events one subscriber has not handled yet, oldest first."""
+
+    def __init__(self, kinds=None):
+        """Sets up an empty queue, collecting only events of the given kinds if any are given."""
+        self.kinds = None if kinds is None else frozenset(kinds)
+        self.events = collections.deque()
+
+    def __len__(self):
+        """Returns the number of events waiting."""
+        return len(self.events)
+
+    def drain(self):
+        """Returns the list of waiting events and empties the queue."""
+        events = list(self.events)
+        self.events.clear()
+        return events
@@ -0,0 +1,85 @@
+import collections
+import sqlite3
+
+
+class FitnessCache(object):
+    """Remembers the values of rule strings that have already been evaluated, so that the local searchers do not
+    re-run a simulation for a rule string they have seen before. Values are keyed by the rule string and by the
+    evaluation function, since the same rule string scores differently under different simulation settings. An
+    evaluation function must give that key through a cacheKey() method naming its settings (as
+    ALifeBatch.SimEvaluator does); one without it cannot be cached, since its module and name alone would mix up
+    values from different settings.
+
+    The most recently used maxSize values are kept in memory. If a file path is given, every value is also saved
+    in an SQLite database there, so later search sessions can reuse earlier evaluations."""
+
+    def __init__(self, maxSize=10000, path=None):
+        """Sets up an empty cache holding up to maxSize values in memory, backed by the SQLite file at path if
+        one is given."""
+        self.maxSize = maxSize
+        self.values = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path)
+            with self.db:
+                self.db.execute("CREATE TABLE IF NOT EXISTS fitness (evaluator TEXT, ruleString TEXT, value REAL, "
+                                "PRIMARY KEY (evaluator, ruleString))")
+
+    def get(self, evalFunction, ruleString):
+        """Returns the saved value of the rule string under the evaluation function, or None if there is none."""
+        key = (evaluatorKey(evalFunction), ruleString)
+        value = self.values.get(key)
+        if value is not None:
+            self.values.move_to_end(key)
+        elif self.db is not None:
+            row = self.db.execute("SELECT value FROM fitness WHERE evaluator = ? AND ruleString = ?", key).fetchone()
+            if row is not None:
+                value = row[0]
+                self._remember(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, evalFunction, ruleString, value):
+        """Saves the value of the rule string under the evaluation function."""
+        key = (evaluatorKey(evalFunction), ruleString)
+        self._remember(key, value)
+        if self.db is not None:
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO fitness VALUES (?, ?, ?)", key + (value,))
+
+    def _remember(self, key, value):
+        """Puts a value in the in-memory part of the cache, dropping the least recently used one if it is full."""
+        self.values[key] = value
+        self.values.move_to_end(key)
+        if len(self.values) > self.maxSize:
+            self.values.popitem(last=False)
+
+    def getStats(self):
+        """Returns a dictionary with the number of hits and misses so far, the hit rate, and the number of values
+        held in memory."""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups > 0 else 0.0,
+                "size": len(self.values)}
+
+    def close(self):
+        """Closes the database file, if there is one."""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+def evaluatorKey(evalFunction):
+    """Returns the string that identifies an evaluation function in the cache, raising TypeError if it has no
+    cacheKey() method."""
+    cacheKey = getattr(evalFunction, "cacheKey", None)
+    if cacheKey is None:
+        raise TypeError("Evaluation function " + repr(evalFunction) + " has no cacheKey() method, so its values "
+                        "cannot be cached")
+    return cacheKey()
@@ -0,0 +1,87 @@
+import numpy as np
+
+
+class FreeCells(object):
+    """Keeps the set of free cells of the grid, meaning cells with no agents, food, mushrooms, trees, water,
+    stones or pits in them, so that a random free cell can be picked in constant time however full the grid is.
+    Cells are stored by flat id (row * gridSize + col). The first self.size entries of self.cells are the free
+    ones, and self.where gives the position of every cell in self.cells, so a cell can be taken out by swapping
+    it with the last free entry."""
+
+    def __init__(self, gridSize):
+        """Sets up a grid of the given side length with every cell free."""
+        self.gridSize = gridSize
+        self.cells = np.arange(gridSize * gridSize)
+        self.where = np.arange(gridSize * gridSize)
+        self.size = gridSize * gridSize
+
+    def __len__(self):
+        """Returns the number of free cells."""
+        return self.size
+
+    def copy(self):
+        """Returns a FreeCells with the same free cells, kept in the same order, so that it samples just as this
+        one would."""
+        freeCells = FreeCells.__new__(FreeCells)
+        freeCells.gridSize = self.gridSize
+        freeCells.cells = self.cells.copy()
+        freeCells.where = self.where.copy()
+        freeCells.size = self.size
+        return freeCells
+
+    def isFree(self, row, col):
+        """Returns True if the cell is in the free set."""
+        return self.where[row * self.gridSize + col] < self.size
+
+    def discard(self, row, col):
+        """Takes the cell out of the free set, if it is in it."""
+        cell = row * self.gridSize + col
+        pos = self.where[cell]
+        if pos >= self.size:
+            return
+        self.size -= 1
+        self._swap(pos, self.size)
+
+    def add(self, row, col):
+        """Puts the cell back in the free set, if it is not already in it."""
+        cell = row * self.gridSize + col
+        pos = self.where[cell]
+        if pos < self.size:
+            return
+        self._swap(pos, self.size)
+        self.size += 1
+
+    def discardMask(self, mask):
+        """Takes every cell where the boolean mask is True out of the free set."""
+        for cell in np.flatnonzero(mask).tolist():
+            self.discard(cell // self.gridSize, cell % self.gridSize)
+
+    def _swap(self, pos1, pos2):
+        """Swaps the entries at two positions of self.cells, keeping self.where up to date."""
+        cell1 = self.cells[pos1]
+        cell2 = self.cells[pos2]
+        self.cells[pos1] = cell2
+        self.cells[pos2] = cell1
+        self.where[cell1] = pos2
+        self.where[cell2] = pos1
+
+    def sample(self, rng):
+        """Returns a free (row, col) chosen uniformly at random with the given random.Random-like generator. The
+        cell stays in the free set until something is put in it."""
+        if self.size == 0:
+            raise ValueError("No free cells left on the grid")
+        return divmod(int(self.cells[rng.randrange(self.size)]), self.gridSize)
+
+    def sampleMany(self, count, rng):
+        """Returns a list of count different free (row, col) cells chosen uniformly at random. Raises a ValueError
+        if there are fewer than count free cells."""
+        if count > self.size:
+            raise ValueError("Cannot place " + str(count) + " objects, only " + str(self.size) + " free cells left")
+        # A partial shuffle: after step i the first i+1 entries are the chosen cells. Shuffling within the free
+        # part of self.cells leaves the free set unchanged.
+        picked = []
+        for i in range(count):
+            j = rng.randrange(i, self.size)
+            self._swap(i, j)
+            picked.append(divmod(int(self.cells[i]), self.gridSize))
+        return picked
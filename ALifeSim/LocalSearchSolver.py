@@ -8,6 +8,7 @@ solvers for a specific problem.
 
 import random
 import math
+import concurrent.futures
 
 
 # Change this to true to see information about the search as it goes.
@@ -23,13 +24,18 @@ class RulesetState(object):
 
     RULE_LEN = 27
 
-    def __init__(self, evalFunction, maxValue, ruleString=None):
-        """Initialize the two basic instance variables to some value"""
+    def __init__(self, evalFunction, maxValue, ruleString=None, cache=None, rng=random):
+        """Initialize the two basic instance variables to some value. If a FitnessCache is given, values are looked
+        up there before evaluating, and saved there afterwards. Random choices are drawn from rng, which can be
+        a seeded random.Random (such as the search stream of a RandomStreams) to make a search repeatable. States
+        made from this one, and searchers started from it, share its cache and rng."""
         self.evalFunction = evalFunction
         self.maxValue = maxValue
+        self.cache = cache
+        self.rng = rng
         self.stateValue = None
         #TODO: We don't know if this is right VVV
-        self.n = 27
+        self.n = self.RULE_LEN
 
         if ruleString is not None:
             self.ruleString = ruleString
@@ -38,10 +44,28 @@ class RulesetState(object):
 
     def getValue(self):
         """Access the value of the myCost instance variable"""
-        if self.stateValue is None:
-            self.stateValue = self.evalFunction(self.ruleString)
+        if self.stateValue is None and not self._valueFromCache():
+            self.setValue(self.evalFunction(self.ruleString))
         return self.stateValue
 
+    def setValue(self, value):
+        """Records the value of this state, saving it in the cache if there is one."""
+        self.stateValue = value
+        if self.cache is not None:
+            self.cache.put(self.evalFunction, self.ruleString, value)
+
+    def _valueFromCache(self):
+        """Fills in the value of this state from the cache, returning True if it was there."""
+        if self.cache is None:
+            return False
+        self.stateValue = self.cache.get(self.evalFunction, self.ruleString)
+        return self.stateValue is not None
+
+    def _makeState(self, ruleString):
+        """Builds a new state of the same kind for the rule string, with the same eval function, max value and cache
+        as this one."""
+        return type(self)(self.evalFunction, self.maxValue, ruleString, self.cache, self.rng)
+
     def getMaxValue(self):
         """Return the maximum value this state has been reported to have."""
         return self.maxValue
@@ -50,11 +74,10 @@ class RulesetState(object):
         """Generates all neighbors of this state. For the rules, that means all one-symbol changes."""
         neighbors = []
         for i in range(len(self.ruleString)):
-            currSym = self.ruleString[i]
-            otherSyms = self._otherSymbols(currSym)
+            otherSyms = self._otherSymbolsAt(i)
             for c in otherSyms:
                 newRule = self.ruleString[:i] + c + self.ruleString[i+1:]
-                newState = RulesetState(self.evalFunction, self.maxValue, newRule)
+                newState = self._makeState(newRule)
                 neighbors.append(newState)
         return neighbors
 
@@ -62,14 +85,17 @@ class RulesetState(object):
         """Generates 5 neighbors of this state. For the ruleset, that means all one-symbol changes."""
         neighbors = []
         for i in range(5):
-            currSym = self.ruleString[i]
-            otherSyms = self._otherSymbols(currSym)
+            otherSyms = self._otherSymbolsAt(i)
             for c in otherSyms:
                 newRule = self.ruleString[:i] + c + self.ruleString[i+1:]
-                newState = RulesetState(self.evalFunction, self.maxValue, newRule)
+                newState = self._makeState(newRule)
                 neighbors.append(newState)
         return neighbors
 
+    def _otherSymbolsAt(self, i):
+        """Returns a string of the symbols the rule string could have at position i besides the one it has."""
+        return self._otherSymbols(self.ruleString[i])
+
     def _otherSymbols(self, sym):
         """Given a symbol, return a string of the other symbols besides it."""
         if sym == 'a':
@@ -95,14 +121,16 @@ class RulesetState(object):
 
     def makeRandomMove(self):
         """Takes a ruleset and returns a new ruleset identical to the original, but with one random change."""
-        randElem = random.randrange(len(self.ruleString))
-        opts = self._otherSymbols(self.ruleString[randElem])
-        newElem = random.choice(opts)
+        # only positions that can take another symbol; for rule strings that is every one
+        positions = [i for i in range(len(self.ruleString)) if self._otherSymbolsAt(i)]
+        randElem = self.rng.choice(positions)
+        opts = self._otherSymbolsAt(randElem)
+        newElem = self.rng.choice(opts)
         print(self.ruleString[:randElem])
         print(newElem)
         print(self.ruleString[randElem+1:])
         newRules = self.ruleString[:randElem] + newElem + self.ruleString[randElem+1:]
-        return RulesetState(self.evalFunction, self.maxValue, newRules)
+        return self._makeState(newRules)
 
     def getRandomStates(self, n):
         """Builds n random states that use the same eval function and max value but are
@@ -110,7 +138,7 @@ class RulesetState(object):
         newStates = []
         for i in range(n):
             newRule = self._randomRuleset()
-            newState = RulesetState(self.evalFunction, self.maxValue, newRule)
+            newState = self._makeState(newRule)
             newStates.append(newState)
         return newStates
 
@@ -119,7 +147,7 @@ class RulesetState(object):
         options = "sflr"  # Leaving out the "arbitrary" random behavior
         rules = ""
         for i in range(self.RULE_LEN):
-            rules += random.choice(options)
+            rules += self.rng.choice(options)
         return rules
 
     def __str__(self):
@@ -129,7 +157,7 @@ class RulesetState(object):
     def crossover(self, otherState):
         """Given another NQueens state, this computes a crossover point and creates
         two new states that have been crossed over."""
-        crossPoint = random.randint(0, self.n)
+        crossPoint = self.rng.randint(0, self.n)
         if crossPoint == 0 or crossPoint == self.n:
             new1 = self.copyState()
             new2 = otherState.copyState()
@@ -137,13 +165,93 @@ class RulesetState(object):
         else:
             new1String = self.ruleString[:crossPoint]+otherState.ruleString[crossPoint:]
             new2String = otherState.ruleString[:crossPoint] + self.ruleString[crossPoint:]
-            new1 = RulesetState(self.evalFunction, self.maxValue, new1String)
-            new2 = RulesetState(self.evalFunction, self.maxValue, new2String)
+            new1 = self._makeState(new1String)
+            new2 = self._makeState(new2String)
             return new1, new2
 
     def copyState(self):
         """Builds and returns a new board identical to this one."""
-        return RulesetState(self.evalFunction, self.maxValue, self.ruleString)
+        return self._makeState(self.ruleString)
+
+
+
+class GeneticStringState(RulesetState):
+    """A state for searching over agents' genetic strings rather than rule strings, for evaluation functions such as
+    ALifeBatch.SimEvaluator that give the string to agents as their genetic string. Each position of the string
+    holds one digit of a trait, and only takes the values GENE_SYMBOLS allows there, which are the ones
+    ALifeSim.randomGeneticString draws from, except that starting energy can go up to 69 and smell radius up to 9,
+    so a search can try agents that follow scents (see SmellEngine)."""
+
+    # The digits allowed at each position: vision, smell, movement, aggression, sleep type, color, the two digits
+    # of starting energy, jump, swim, fly, scavenge, sickness and disease resistance.
+    GENE_SYMBOLS = ("12", "0123456789", "1", "01", "01", "123456789", "123456", "0123456789", "01", "01", "01", "01", "01",
+                    "0123456789")
+    RULE_LEN = len(GENE_SYMBOLS)
+
+    def _otherSymbolsAt(self, i):
+        """Returns a string of the digits allowed at position i besides the one the string has."""
+        return self.GENE_SYMBOLS[i].replace(self.ruleString[i], "")
+
+    def _randomRuleset(self):
+        """Generates a random genetic string."""
+        return "".join(self.rng.choice(symbols) for symbols in self.GENE_SYMBOLS)
+
+
+
+# ==================================================================
+# This section contains the machinery for computing the values of many
+# states at once, spread over several processes.
+
+class FitnessExecutor(object):
+    """A pool of worker processes that scores batches of rule strings at the same time. The evaluation function is
+    sent to the workers, so it must be picklable: a module-level function or an instance of a module-level class,
+    like ALifeBatch.SimEvaluator, but not a bound method of the GUI."""
+
+    def __init__(self, maxWorkers=None):
+        """Starts the worker processes; by default there is one per CPU."""
+        self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=maxWorkers, initializer=_seedWorker)
+
+    def evaluate(self, evalFunction, ruleStrings):
+        """Returns a list of the values of the rule strings, in the same order."""
+        return list(self.pool.map(evalFunction, ruleStrings))
+
+    def shutdown(self):
+        """Stops the worker processes."""
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.shutdown()
+
+
+def _seedWorker():
+    """Gives each worker process its own random state, instead of the copy of the parent's it starts out with."""
+    random.seed()
+
+
+def evaluateStates(states, executor=None):
+    """Makes sure every state in the list knows its value. States whose values are not already known or cached are
+    scored all at once with the executor if one is given, or one after another if not. A rule string that appears
+    more than once is only evaluated once."""
+    pending = {}
+    for state in states:
+        if state.stateValue is None and not state._valueFromCache():
+            pending.setdefault((state.evalFunction, state.ruleString), []).append(state)
+    byFunction = {}
+    for (evalFunction, ruleString) in pending:
+        byFunction.setdefault(evalFunction, []).append(ruleString)
+    for evalFunction, ruleStrings in byFunction.items():
+        if executor is None or len(ruleStrings) == 1:
+            values = [evalFunction(ruleString) for ruleString in ruleStrings]
+        else:
+            values = executor.evaluate(evalFunction, ruleStrings)
+        for ruleString, value in zip(ruleStrings, values):
+            sameStates = pending[evalFunction, ruleString]
+            sameStates[0].setValue(value)
+            for state in sameStates[1:]:
+                state.stateValue = value
 
 
 
@@ -156,10 +264,12 @@ class RulesetState(object):
 class HillClimber(object):
     """Contains the algorithm for hill-climbing and some helper methods."""
 
-    def __init__(self, startState, maxRounds=500):
-        """Sets up the starting state"""
+    def __init__(self, startState, maxRounds=500, executor=None):
+        """Sets up the starting state. If a FitnessExecutor is given, each step's neighbors are evaluated in parallel."""
         self.startState = startState
         self.maxRounds = maxRounds
+        self.executor = executor
+        self.rng = startState.rng
         self.maxValue = startState.getMaxValue()
         self.currState = startState
         # This next step is EXPENSIVE!
@@ -203,16 +313,14 @@ class HillClimber(object):
         """Runs one step of hill-climbing, generates children and picks the best one, returning it as its value. Also returns
         a second value that tells if the best child is optimal or not."""
         self.count += 1
-        if self.count >= self.stopLimit:
+        if self.count >= self.maxRounds:
             return "local maxima"
 
         if verbose:
             print("--------- Count =", self.count, "---------")
             print(self.currState)
         neighs = self.currState.allNeighbors()
-        print(neighs)
-        neighs2 = self.currState.someNeighbors()
-        print(neighs2)
+        evaluateStates(neighs, self.executor)
         bestNeigh = self.findBestNeighbor(neighs)
         nextValue = bestNeigh.getValue()
         self.currState = bestNeigh
@@ -243,7 +351,7 @@ class HillClimber(object):
                 bestValue = value
             elif value == bestValue:
                 bestNeighs.append(neigh)
-        bestNeigh = random.choice(bestNeighs)
+        bestNeigh = self.rng.choice(bestNeighs)
         return bestNeigh
 
 
@@ -257,17 +365,20 @@ class HillClimber(object):
 class BeamSearcher(object):
     """Contains the algorithm for beam search and some helper methods."""
 
-    def __init__(self, stateGen, numStates = 2, stopLimit = 5):
-        """Sets up the starting state"""
+    def __init__(self, stateGen, numStates = 2, stopLimit = 5, executor=None):
+        """Sets up the starting state. If a FitnessExecutor is given, each step's neighbors are evaluated in parallel."""
         self.stateGen = stateGen
         self.numStates = numStates
         self.stopLimit = stopLimit
+        self.executor = executor
+        self.rng = stateGen.rng
         self.currState = stateGen
-        self.currValue = self.currState.getValue()
         self.count = 0
         self.currStates = []
         self.foundOptimal = False
         self.currStates = stateGen.getRandomStates(numStates)
+        evaluateStates([stateGen] + self.currStates, self.executor)
+        self.currValue = self.currState.getValue()
 
         self.maxValue = self.currStates[0].getMaxValue()
         self.sortByValue(self.currStates)
@@ -322,8 +433,9 @@ class BeamSearcher(object):
 
         bestNNeighs = []
 
-        for nextState in self.currStates:
-            neighs = nextState.randomNeighbors(self.numStates)
+        allNeighs = [nextState.randomNeighbors(self.numStates) for nextState in self.currStates]
+        evaluateStates([neigh for neighs in allNeighs for neigh in neighs], self.executor)
+        for neighs in allNeighs:
             #print("currStates: (before inputting into keepBestNNeighbors) " + str(self.currStates))
             (bestNNeighs, foundOptimal) = self.keepBestNNeighbors(self.currStates, neighs, self.numStates, self.stopLimit)
             #print("BestNNeighs " + str(bestNNeighs))
@@ -351,7 +463,7 @@ class BeamSearcher(object):
                 bestValue = value
             elif value == bestValue:
                 bestNeighs.append(neigh)
-        bestNeigh = random.choice(bestNeighs)
+        bestNeigh = self.rng.choice(bestNeighs)
         return bestNeigh
 
     def keepBestNNeighbors(self, bestSoFar, neighs, n, maxVal):
@@ -403,22 +515,25 @@ class BeamSearcher(object):
 
 class GASearcher(object):
     """Contains the algorithm for GA and some helper methods."""
-    def __init__(self, stateGen, popSize=5, maxGenerations=2000, crossPerc=0.8, mutePerc=0.01):
-        """Sets up the starting state"""
+    def __init__(self, stateGen, popSize=5, maxGenerations=2000, crossPerc=0.8, mutePerc=0.01, executor=None):
+        """Sets up the starting state. If a FitnessExecutor is given, each generation is evaluated in parallel."""
         self.stateGen = stateGen
         self.popSize = popSize
         self.currState = stateGen
         self.maxGenerations = maxGenerations
         self.crossPerc = crossPerc
         self.mutePerc = mutePerc
+        self.executor = executor
+        self.rng = stateGen.rng
         self.parentPool = []
-        self.currValue = self.currState.getValue()
 
         if popSize % 2 == 1:
             print("Making population size even")
             popSize += 1
 
         self.currStates = stateGen.getRandomStates(popSize)
+        evaluateStates([stateGen] + self.currStates, self.executor)
+        self.currValue = self.currState.getValue()
 
 
         self.maxFit = self.currStates[0].getMaxValue()
@@ -472,6 +587,7 @@ class GASearcher(object):
         a second value maxFit that tells the optimal value and a third value that tells the number of steps taken so far."""
         self.count +=1
         print(self.count)
+        evaluateStates(self.currStates, self.executor)
         fits = [state.getValue() for state in self.currStates]
 
         if self.count >= self.maxGenerations:
@@ -509,7 +625,7 @@ class GASearcher(object):
                 bestValue = value
             elif value == bestValue:
                 bestNeighs.append(neigh)
-        bestNeigh = random.choice(bestNeighs)
+        bestNeigh = self.rng.choice(bestNeighs)
         return bestNeigh
 
     def keepBestNNeighbors(self, bestSoFar, neighs, n, maxVal):
@@ -554,7 +670,7 @@ class GASearcher(object):
         """Given a set of states, repeatedly select parents using roulette selection."""
         parents = []
         for i in range(len(states)):
-            nextParentPos = rouletteSelect(fitnesses)
+            nextParentPos = rouletteSelect(fitnesses, self.rng)
             parents.append(states[nextParentPos])
         return parents
 
@@ -565,7 +681,7 @@ class GASearcher(object):
         for i in range(0, len(parents), 2):
             p1 = parents[i]
             p2 = parents[i + 1]
-            doCross = random.random()
+            doCross = self.rng.random()
             if doCross < crossoverPerc:
                 n1, n2 = p1.crossover(p2)
                 newPop.append(n1)
@@ -575,7 +691,7 @@ class GASearcher(object):
                 newPop.append(p2.copyState())
         for i in range(len(newPop)):
             nextOne = newPop[i]
-            doMutate = random.random()
+            doMutate = self.rng.random()
             if doMutate <= mutationPerc:
                 newPop[i] = nextOne.makeRandomMove()
         return newPop
@@ -585,15 +701,15 @@ class GASearcher(object):
 # ========================================================================
 # This next section contains utility functions used by more than one of the algorithms
 
-def rouletteSelect(valueList):
+def rouletteSelect(valueList, rng=random):
     """takes in a list giving the values for a set of entities.  It randomly
 selects one of the positions in the list by treating the values as a kind of
 probability distribution and sampling from that distribution.  Each entity gets
 a piece of a roulette wheel whose size is based on comparative value: high-value
 entities have the highest probability of being selected, but low-value entities have
-*some* probability of being selected."""
+*some* probability of being selected. The pick is drawn from rng."""
     totalValues = sum(valueList)
-    pick = random.random() * totalValues
+    pick = rng.random() * totalValues
     s = 0
     for i in range(len(valueList)):
         s += valueList[i]
@@ -0,0 +1,165 @@
+import numpy as np
+
+from DecisionTable import STONE, WATER, FRIEND, ENEMY, FOOD
+from AgentPopulation import HEADINGS
+from SensorMap import sensorOffsets
+from Vision import HEADING_STEPS
+from Tree import Tree
+from Stone import Stone
+from Water import Water
+from Pit import Pit
+
+# The columns of a feature row.
+HERE = 0          # bits (1 << kind, and TREE_BIT) of what else is in the agent's own cell
+SIGHT = 1         # kind of the first thing the agent sees, or NOTHING
+TREE_AHEAD = 2    # NO_TREE, BARE_TREE or FRUIT_TREE: the first tree the agent sees
+SMELL = 3         # bits of what is in each cell the agent smells, in SensorMap.sensorOffsets order
+NUM_SMELL_CELLS = 12
+NUM_FEATURES = SMELL + NUM_SMELL_CELLS
+
+# The furthest, in rows or columns, that a smelled cell is from the agent.
+SMELL_REACH = 2
+
+NOTHING = -1
+NO_TREE, BARE_TREE, FRUIT_TREE = range(3)
+TREE_BIT = 1 << 5
+
+# What a cell looks like to an agent, most important first, as _assessObjectsHere ranks things (trees apart, which
+# block the view). Mushrooms are counted with food.
+_SEE_NOTHING, _SEE_STONE, _SEE_AGENT, _SEE_FOOD, _SEE_WATER, _SEE_PIT = range(6)
+
+# Row and column steps ahead, and the offsets of the smelled cells, for each heading code.
+_AHEAD = np.array([HEADING_STEPS[h] for h in HEADINGS])
+_SMELL_OFFSETS = np.array([sensorOffsets(h, SMELL_REACH) for h in HEADINGS])
+
+
+class WorldArrays(object):
+    """A snapshot, as NumPy grids, of everything agents perceive in the world at one moment: terrain, food, trees,
+    and how many agents of each color are in each cell. Perceiving only reads these grids, so every agent perceives
+    the same world however many have acted since, and a snapshot can be handed to other processes."""
+
+    # The names of the grids in a snapshot.
+    FIELDS = ("agents", "agentTotal", "tree", "fruit", "firstColor", "bits", "seen")
+
+    def __init__(self, sim):
+        """Takes a snapshot of the simulation as it is now."""
+        terrain = sim.terrain.layers
+        self.gridSize = sim.gridSize
+        self.agents = sim.smell.agents.copy()
+        self.agentTotal = sim.smell.agentTotal.copy()
+
+        size = self.gridSize
+        self.tree = np.zeros((size, size), dtype=bool)
+        self.fruit = np.zeros((size, size), dtype=bool)
+        for (r, c), trees in sim.index.layers.get(Tree, {}).items():
+            self.tree[r, c] = True
+            self.fruit[r, c] = trees[0].getHasFood() == "1"
+
+        # the color of the agent that counts in cells holding agents of more than one color is the first one there
+        self.firstColor = np.argmax(self.agents, axis=0)
+        for (r, c) in np.argwhere(self.agentTotal > self.agents.max(axis=0)):
+            self.firstColor[r, c] = sim.agentsAt(r, c)[0].getColor()
+
+        food = sim.smell.food > 0
+        self.bits = ((terrain[Stone] * (1 << STONE)) | (terrain[Water] * (1 << WATER)) |
+                     (food * (1 << FOOD))).astype(np.int64)
+        self.seen = np.select([terrain[Stone], self.agentTotal > 0, food, terrain[Water], terrain[Pit]],
+                              [_SEE_STONE, _SEE_AGENT, _SEE_FOOD, _SEE_WATER, _SEE_PIT], _SEE_NOTHING)
+
+    def arrays(self):
+        """Returns a dict of the snapshot's grids by name, as fromArrays takes."""
+        return dict((name, getattr(self, name)) for name in WorldArrays.FIELDS)
+
+    @classmethod
+    def fromArrays(cls, gridSize, arrays):
+        """Returns a snapshot made of the given grids, such as views of a copy kept in shared memory."""
+        world = cls.__new__(cls)
+        world.gridSize = gridSize
+        for name in WorldArrays.FIELDS:
+            setattr(world, name, arrays[name])
+        return world
+
+    def band(self, firstRow, numRows):
+        """Returns a WorldArrays holding only numRows rows of this one, starting at firstRow and wrapping around
+        the grid, for perceiving the agents in one band of the grid on their own."""
+        rows = np.arange(firstRow, firstRow + numRows) % self.gridSize
+        arrays = dict((name, getattr(self, name)[rows]) for name in WorldArrays.FIELDS[1:])
+        arrays["agents"] = self.agents[:, rows]
+        return WorldArrays.fromArrays(self.gridSize, arrays)
+
+
+def perceive(sim, agents, world=None):
+    """Returns a NumPy array with one feature row (see the column numbers above) for each of the given living agents,
+    worked out for all of them at once from a WorldArrays snapshot, which is taken now if none is given. Agents with a
+    smell radius over two follow scent fields instead, so their smell cells are left empty."""
+    if world is None:
+        world = WorldArrays(sim)
+    return perceiveArrays(world, *agentArrays(sim, agents))
+
+
+def agentArrays(sim, agents):
+    """Returns the arrays of the given living agents' rows, columns, heading codes, colors, vision ranges and smell
+    radii that perceiveArrays takes."""
+    population = sim.population
+    slots = np.array([agent.slot for agent in agents], dtype=np.int64)
+    return (population.row[slots], population.col[slots], population.heading[slots], population.color[slots],
+            population.visionRange[slots], population.smellRadius[slots])
+
+
+def perceiveArrays(world, rows, cols, headings, colors, visionRanges, smellRadii):
+    """Does the work of perceive for agents given as arrays of their positions, heading codes, colors, vision ranges
+    and smell radii. Uses nothing but the arrays, so any group of agents can be done on its own. world may be a
+    band of the grid, as long as it reaches far enough past the agents that nothing they perceive wraps around."""
+    numRows, numCols = world.agentTotal.shape
+    num = len(rows)
+    features = np.zeros((num, NUM_FEATURES), dtype=np.int64)
+    rows = rows.astype(np.int64)
+    cols = cols.astype(np.int64)
+    colors = colors.astype(np.int64)
+
+    # what else is in the agent's own cell
+    friends = world.agents[colors, rows, cols] - 1
+    enemies = world.agentTotal[rows, cols] - 1 - friends
+    features[:, HERE] = (world.bits[rows, cols] | ((friends > 0) * (1 << FRIEND)) | ((enemies > 0) * (1 << ENEMY)) |
+                         (world.tree[rows, cols] * TREE_BIT))
+
+    # looking ahead: the first thing seen before any tree, and the first tree, which blocks the rest
+    aheadRow = _AHEAD[headings, 0]
+    aheadCol = _AHEAD[headings, 1]
+    sight = np.full(num, NOTHING, dtype=np.int64)
+    treeAhead = np.zeros(num, dtype=np.int64)
+    found = np.zeros(num, dtype=bool)
+    blocked = np.zeros(num, dtype=bool)
+    for step in range(1, int(visionRanges.max(initial=0)) + 1):
+        looking = (visionRanges >= step) & ~blocked
+        if not looking.any():
+            break
+        r = (rows + step * aheadRow) % numRows
+        c = (cols + step * aheadCol) % numCols
+        isTree = looking & world.tree[r, c]
+        treeAhead[isTree] = np.where(world.fruit[r, c], FRUIT_TREE, BARE_TREE)[isTree]
+        blocked |= isTree
+
+        seen = world.seen[r, c]
+        first = looking & ~isTree & ~found & (seen != _SEE_NOTHING)
+        kinds = np.select([seen == _SEE_STONE, seen == _SEE_WATER, seen == _SEE_FOOD,
+                           (seen == _SEE_AGENT) & (world.firstColor[r, c] == colors), seen == _SEE_AGENT],
+                          [STONE, WATER, FOOD, FRIEND, ENEMY], NOTHING)
+        sight[first] = kinds[first]
+        found |= first
+    features[:, SIGHT] = sight
+    features[:, TREE_AHEAD] = treeAhead
+
+    # the cells smelled, nearest first
+    numCells = np.where(smellRadii == 1, 4, np.where(smellRadii == 2, NUM_SMELL_CELLS, 0))
+    for i in range(NUM_SMELL_CELLS):
+        smelling = numCells > i
+        if not smelling.any():
+            break
+        r = (rows + _SMELL_OFFSETS[headings, i, 0]) % numRows
+        c = (cols + _SMELL_OFFSETS[headings, i, 1]) % numCols
+        friends = world.agents[colors, r, c]
+        enemies = world.agentTotal[r, c] - friends
+        bits = world.bits[r, c] | ((friends > 0) * (1 << FRIEND)) | ((enemies > 0) * (1 << ENEMY))
+        features[:, SMELL + i] = np.where(smelling, bits, 0)
+    return features
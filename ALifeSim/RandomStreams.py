@@ -0,0 +1,33 @@
+import random
+
+import numpy as np
+
+
+class RandomStreams(object):
+    """The random number generators for one simulation run, all made from a single seed. Each part of the run draws
+    from its own stream, so that changing how much randomness one part uses does not shift the numbers another
+    part sees: two runs with the same seed build the same world even if the agents behave differently, which lets
+    rule strings be compared on common random numbers.
+
+    The streams are random.Random objects (world, behavior and search) plus a numpy Generator for the array-based
+    world generation (worldArrays). If no seed is given, one is drawn from the random module, so random.seed()
+    still makes the whole run repeatable."""
+
+    def __init__(self, seed=None):
+        """Makes the streams from the seed."""
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        worldSeq, behaviorSeq, searchSeq, worldArraysSeq = np.random.SeedSequence(seed).spawn(4)
+        # Placing objects when the world is built
+        self.world = random.Random(_seedFrom(worldSeq))
+        # Everything agents, trees and mushrooms do while the simulation runs
+        self.behavior = random.Random(_seedFrom(behaviorSeq))
+        # Local search over rule strings
+        self.search = random.Random(_seedFrom(searchSeq))
+        self.worldArrays = np.random.default_rng(worldArraysSeq)
+
+
+def _seedFrom(seedSeq):
+    """Turns a numpy SeedSequence into an integer seed for a random.Random."""
+    return int.from_bytes(seedSeq.generate_state(4, np.uint64).tobytes(), "little")
@@ -0,0 +1,82 @@
+from Vision import HEADING_STEPS
+
+# The names of the directions relative to an agent's heading, in the order the smell lists use.
+RELATIVE_NAMES = ("above", "below", "right", "left")
+
+_offsets = {}
+_permutations = {}
+_sensorOffsets = {}
+_directions = {}
+
+
+def neighbourhood(radius):
+    """Returns the (row, col) offsets of the cells within radius steps (not counting diagonal steps) of an agent, in
+    the order the smell lists use: the cells straight above, below, right and left at distance 1, then at distance 2,
+    and so on, and then the cells off those lines, nearest first and top to bottom, left to right. For radius 2
+    that is above, below, right, left, two above, two below, two right, two left, above left, above right, below
+    left, below right."""
+    offsets = _offsets.get(radius)
+    if offsets is None:
+        straight = []
+        for d in range(1, radius + 1):
+            straight.extend([(-d, 0), (d, 0), (0, d), (0, -d)])
+        other = [(r, c) for r in range(-radius, radius + 1) for c in range(-radius, radius + 1)
+                 if r != 0 and c != 0 and abs(r) + abs(c) <= radius]
+        other.sort(key=lambda offset: (abs(offset[0]) + abs(offset[1]), offset[0], offset[1]))
+        offsets = _offsets[radius] = tuple(straight + other)
+    return offsets
+
+
+def relativeOffset(heading, dRow, dCol):
+    """Returns how far ahead and how far to the right of an agent facing the given heading a (row, col) offset is."""
+    fRow, fCol = HEADING_STEPS[heading]
+    return dRow * fRow + dCol * fCol, dRow * fCol - dCol * fRow
+
+
+def headingPermutation(heading, radius):
+    """Returns the order that turns a list of what is in each cell of neighbourhood(radius) into the same list as
+    seen by an agent facing the given heading: entry i of the result is the index of the cell that is where cell i
+    would be if the agent faced north."""
+    key = (heading, radius)
+    order = _permutations.get(key)
+    if order is None:
+        offsets = neighbourhood(radius)
+        where = dict((offset, i) for (i, offset) in enumerate(offsets))
+        fRow, fCol = HEADING_STEPS[heading]
+        order = []
+        for (dRow, dCol) in offsets:
+            ahead, right = -dRow, dCol
+            order.append(where[(ahead * fRow + right * fCol, ahead * fCol - right * fRow)])
+        order = _permutations[key] = tuple(order)
+    return order
+
+
+def sensorOffsets(heading, radius):
+    """Returns the (row, col) offsets of the cells of neighbourhood(radius) for an agent facing the given heading, in
+    the agent's own order: above (ahead), below (behind), right and left first."""
+    key = (heading, radius)
+    offsets = _sensorOffsets.get(key)
+    if offsets is None:
+        cells = neighbourhood(radius)
+        offsets = _sensorOffsets[key] = tuple(cells[i] for i in headingPermutation(heading, radius))
+    return offsets
+
+
+def relativeDirections(heading, radius):
+    """Returns, for each cell of neighbourhood(radius), the directions an agent facing the given heading would go
+    to get to it: one of RELATIVE_NAMES for a cell straight ahead, behind or to one side, or two ("above" or
+    "below" first) for a cell off those lines."""
+    key = (heading, radius)
+    directions = _directions.get(key)
+    if directions is None:
+        directions = []
+        for (dRow, dCol) in neighbourhood(radius):
+            ahead, right = relativeOffset(heading, dRow, dCol)
+            names = []
+            if ahead != 0:
+                names.append("above" if ahead > 0 else "below")
+            if right != 0:
+                names.append("right" if right > 0 else "left")
+            directions.append(tuple(names))
+        directions = _directions[key] = tuple(directions)
+    return directions
@@ -0,0 +1,72 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Each array starts on a multiple of this many bytes within the block.
+ALIGNMENT = 16
+
+
+class SharedArrays(object):
+    """A set of named NumPy arrays kept together in one block of shared memory, so that other processes can use them
+    without a copy. Pickling a SharedArrays, as sending it to a worker process does, sends only the name of the block
+    and where each array is in it, and unpickling attaches to the same memory. The process that made the block owns
+    it and must call unlink once every process is done with it; other processes just let go of it, or call close."""
+
+    def __init__(self, arrays, readOnly=False):
+        """Makes a new block holding copies of the arrays in the dict, and gives views of them in self.arrays. If
+        readOnly is True, neither this process nor any that attaches can change them."""
+        layout = []
+        size = 0
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            layout.append((name, array.dtype.str, array.shape, size))
+            size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        self.block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.spec = (self.block.name, tuple(layout))
+        self.readOnly = readOnly
+        self.isOwner = True
+        self.arrays = self._views()
+        for name, array in arrays.items():
+            view = self.arrays[name]
+            view.flags.writeable = True
+            view[...] = array
+            view.flags.writeable = not readOnly
+
+    @classmethod
+    def attach(cls, spec, readOnly=False):
+        """Returns a SharedArrays for a block another process made, given its spec."""
+        shared = cls.__new__(cls)
+        shared.block = shared_memory.SharedMemory(name=spec[0])
+        shared.spec = spec
+        shared.readOnly = readOnly
+        shared.isOwner = False
+        shared.arrays = shared._views()
+        return shared
+
+    def _views(self):
+        """Returns a dict of NumPy arrays looking into the block, as the spec lays them out."""
+        views = {}
+        for (name, dtype, shape, offset) in self.spec[1]:
+            view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.block.buf, offset=offset)
+            view.flags.writeable = not self.readOnly
+            views[name] = view
+        return views
+
+    def __reduce__(self):
+        """Pickles as the spec, so that unpickling attaches to the block instead of copying it."""
+        return (SharedArrays.attach, (self.spec, self.readOnly))
+
+    def close(self):
+        """Lets go of the block in this process. Views of it that are still in use keep it mapped until they go."""
+        self.arrays = {}
+        try:
+            self.block.close()
+        except BufferError:
+            pass
+
+    def unlink(self):
+        """Frees the block once every process has let go of it. Only the process that made it may do this."""
+        if not self.isOwner:
+            raise ValueError("Only the process that made a shared block can unlink it")
+        self.close()
+        self.block.unlink()
@@ -0,0 +1,141 @@
+import numpy as np
+
+# Agent colors run from 0 to 9.
+NUM_COLORS = 10
+
+
+class SmellEngine(object):
+    """Keeps grids of how many things with a smell are in each cell: food and mushrooms in one, and agents in one
+    per color. The simulation updates the counts whenever it adds, moves or removes an object, so they always
+    match the grid, and an agent can tell whether a cell has anything to smell with one array read.
+
+    For agents that smell further than the two cells checkSmell looks at, the engine gives scents: the number of
+    things of one kind within a square of the given radius around a cell, wrapping around the edges of the grid
+    like everything else. Scents are read from scent fields, one grid per kind and radius in use, so an agent's
+    smell is a few array reads whatever its radius. A field is summed from the counts once, when it is first
+    needed, and from then on kept up to date as the counts change: a thing coming into or leaving a cell changes
+    the field over the square of that radius around the cell. In a step where every agent perceives the world as
+    it was at the start (batch perception or a synchronous step), scents are read from copies of the fields made
+    at the start of the step instead."""
+
+    def __init__(self, gridSize, solid):
+        """Sets up empty counts for a grid of the given side length. solid is the terrain's grid of water, stones
+        and pits, which is shared rather than copied."""
+        self.gridSize = gridSize
+        self.solid = solid
+        self.food = np.zeros((gridSize, gridSize), dtype=np.int32)
+        self.agents = np.zeros((NUM_COLORS, gridSize, gridSize), dtype=np.int32)
+        self.agentTotal = np.zeros((gridSize, gridSize), dtype=np.int32)
+        # the scent fields kept up to date, by kind and then radius, and the copies of them made for this step
+        self.fields = {}
+        self.stepFields = {}
+        self.snapshot = False
+
+    def addFood(self, row, col, change=1):
+        """Counts a food or mushroom coming into (change 1) or leaving (change -1) a cell."""
+        self.food[row, col] += change
+        if self.fields:
+            self._updateFields("food", row, col, change)
+
+    def addAgent(self, color, row, col, change=1):
+        """Counts an agent of the given color coming into (change 1) or leaving (change -1) a cell."""
+        self.agents[color, row, col] += change
+        self.agentTotal[row, col] += change
+        if self.fields:
+            self._updateFields("agents", row, col, change)
+            self._updateFields(color, row, col, change)
+
+    def hasScent(self, row, col):
+        """Returns True if the cell holds anything checkSmell reacts to: food, a mushroom, an agent, or water or
+        a stone to stay clear of."""
+        return self.food[row, col] > 0 or self.agentTotal[row, col] > 0 or self.solid[row, col]
+
+    def newStep(self, population, snapshot=False):
+        """Makes sure there are scent fields for every kind and radius the AgentPopulation's agents that smell
+        further than two cells will ask for, and drops the ones nobody needs any more. If snapshot is True, the step
+        perceives the world as it is at its start, so the fields are copied for it before anyone moves."""
+        far = population.inUse & (population.smellRadius > 2)
+        needed = set()
+        for radius in np.unique(population.smellRadius[far]).tolist():
+            needed.add(("food", radius))
+            needed.add(("agents", radius))
+            for color in np.unique(population.color[far & (population.smellRadius == radius)]).tolist():
+                needed.add((color, radius))
+        for kind in list(self.fields):
+            byRadius = self.fields[kind]
+            for radius in list(byRadius):
+                if (kind, radius) not in needed:
+                    del byRadius[radius]
+            if not byRadius:
+                del self.fields[kind]
+        for (kind, radius) in needed:
+            self._liveField(kind, radius)
+        self.snapshot = snapshot
+        self.stepFields = {}
+        if snapshot:
+            for (kind, radius) in needed:
+                self.stepFields[kind, radius] = self.fields[kind][radius].copy()
+
+    def scent(self, kind, radius, row, col):
+        """Returns the number of things of a kind (see field) within radius of the cell: as at the start of the
+        step if the step perceives the world as it was then, and as it is now otherwise."""
+        return int(self.field(kind, radius)[row, col])
+
+    def field(self, kind, radius):
+        """Returns the scent field for a kind of thing: "food" (food and mushrooms), "agents" (all agents), or an
+        agent color number. In a step that perceives the world as it was at its start, this is the field as it was
+        then, if newStep made a copy of it; otherwise it is the field as it is now, which must not be changed."""
+        if self.snapshot:
+            scent = self.stepFields.get((kind, radius))
+            if scent is not None:
+                return scent
+        return self._liveField(kind, radius)
+
+    def _liveField(self, kind, radius):
+        """Returns the scent field kept up to date for a kind and radius, summing it from the counts if there is
+        none yet."""
+        byRadius = self.fields.setdefault(kind, {})
+        scent = byRadius.get(radius)
+        if scent is None:
+            layer = self._layer(kind)
+            scent = byRadius[radius] = windowSum(windowSum(layer, radius, 0), radius, 1)
+        return scent
+
+    def _updateFields(self, kind, row, col, change):
+        """Adds change to the scent fields of a kind over the square around the cell, for something of that kind
+        coming into or leaving it."""
+        byRadius = self.fields.get(kind)
+        if byRadius is None:
+            return
+        size = self.gridSize
+        for radius, scent in byRadius.items():
+            if 2 * radius + 1 >= size:
+                scent += change
+            else:
+                rows = np.arange(row - radius, row + radius + 1) % size
+                cols = np.arange(col - radius, col + radius + 1) % size
+                scent[np.ix_(rows, cols)] += change
+
+    def _layer(self, kind):
+        """Returns the grid of counts for a kind of thing."""
+        if kind == "food":
+            return self.food
+        elif kind == "agents":
+            return self.agentTotal
+        return self.agents[kind]
+
+
+def windowSum(counts, radius, axis):
+    """Returns, for each cell, the sum of counts over the cells within radius of it along one axis, wrapping around
+    the edges. Uses a running sum, so it costs the same for any radius."""
+    size = counts.shape[axis]
+    width = 2 * radius + 1
+    if width >= size:
+        total = counts.sum(axis=axis, keepdims=True)
+        return np.repeat(total, size, axis=axis)
+    padded = np.take(counts, np.arange(-radius, size + radius) % size, axis=axis)
+    running = np.cumsum(padded, axis=axis)
+    zeroShape = list(running.shape)
+    zeroShape[axis] = 1
+    running = np.concatenate([np.zeros(zeroShape, dtype=running.dtype), running], axis=axis)
+    return np.take(running, np.arange(width, size + width), axis=axis) - np.take(running, np.arange(size), axis=axis)
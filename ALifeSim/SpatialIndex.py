@@ -0,0 +1,54 @@
+# Returned for cells that hold nothing of the requested type, so that empty lookups allocate nothing.
+NO_OBJECTS = ()
+
+
+class SpatialIndex(object):
+    """Keeps a separate occupancy map for every type of object in the simulation, so that asking which objects
+    of one type are in a cell is a single dictionary lookup instead of a scan over everything in that cell."""
+
+    def __init__(self):
+        """Sets up an empty index. Each object type gets its own dictionary mapping (row, col) to the list of
+        objects of that type in the cell; cells that hold none of that type are left out."""
+        self.layers = {}
+
+    def add(self, ob, row, col):
+        """Records that the object is now in the given cell."""
+        layer = self.layers.get(type(ob))
+        if layer is None:
+            layer = self.layers[type(ob)] = {}
+        cell = layer.get((row, col))
+        if cell is None:
+            layer[row, col] = [ob]
+        else:
+            cell.append(ob)
+
+    def remove(self, ob, row, col):
+        """Removes the object from the given cell. Returns True if it was there, False otherwise."""
+        layer = self.layers.get(type(ob))
+        if layer is None:
+            return False
+        cell = layer.get((row, col))
+        if cell is None or ob not in cell:
+            return False
+        cell.remove(ob)
+        if len(cell) == 0:
+            del layer[row, col]
+        return True
+
+    def move(self, ob, oldRow, oldCol, newRow, newCol):
+        """Moves the object from one cell to another."""
+        self.remove(ob, oldRow, oldCol)
+        self.add(ob, newRow, newCol)
+
+    def objectsAt(self, obType, row, col):
+        """Returns the objects of the given type in the cell. The list is owned by the index and must not be
+        changed by the caller; a cell with nothing of that type gives back an empty tuple."""
+        layer = self.layers.get(obType)
+        if layer is None:
+            return NO_OBJECTS
+        return layer.get((row, col), NO_OBJECTS)
+
+    def has(self, obType, row, col):
+        """Returns True if there is at least one object of the given type in the cell."""
+        layer = self.layers.get(obType)
+        return layer is not None and (row, col) in layer
@@ -0,0 +1,140 @@
+import numpy as np
+
+from SpatialIndex import NO_OBJECTS
+from SharedArrays import SharedArrays
+from Water import Water
+from Stone import Stone
+from Pit import Pit
+from Grass import Grass
+from Sand import Sand
+from Snow import Snow
+
+
+class TerrainLayers(object):
+    """Holds the static terrain of the world as one boolean NumPy grid per kind of terrain. Terrain never moves
+    or changes once the world is built, so nothing but a flag per cell is stored; the Python object for a
+    terrain cell is only made the first time the GUI or another caller asks for it, and is then kept so that
+    things like the GUI's canvas id stay attached to it."""
+
+    KINDS = (Water, Stone, Pit, Grass, Sand, Snow)
+    # Terrain that fills its cell, so that nothing else is placed on top of it. Grass, sand and snow are only
+    # ground cover and other objects can sit on them.
+    SOLID_KINDS = (Water, Stone, Pit)
+
+    def __init__(self, gridSize):
+        """Sets up empty layers for a grid with the given side length."""
+        self.gridSize = gridSize
+        self.layers = {}
+        for kind in self.KINDS:
+            self.layers[kind] = np.zeros((gridSize, gridSize), dtype=bool)
+        # True wherever any solid terrain is, so placement only has to check one grid.
+        self.solid = np.zeros((gridSize, gridSize), dtype=bool)
+        self.instances = {}
+        self.shared = None
+
+    def share(self):
+        """Moves the layers into shared memory, where nothing can change them any more, and returns the SharedArrays
+        that holds them. From then on, pickling the terrain (as sending it to a worker process does) sends only the
+        name of the shared block, and the worker's copy of the terrain uses the same memory. The caller owns the
+        block and must unlink it when every simulation on this terrain is done."""
+        if self.shared is None:
+            arrays = dict((kind.__name__, self.layers[kind]) for kind in self.KINDS)
+            arrays["solid"] = self.solid
+            self.shared = SharedArrays(arrays, readOnly=True)
+            self._useShared()
+        return self.shared
+
+    def freeze(self):
+        """Makes the layers read-only, so that any number of simulations can stand on this terrain at once. A
+        simulation that needs to change frozen terrain changes a copy of it instead (see copy)."""
+        for layer in self.layers.values():
+            layer.flags.writeable = False
+        self.solid.flags.writeable = False
+
+    def isFrozen(self):
+        """Returns True if the layers can no longer be changed, because they were frozen or shared."""
+        return not self.solid.flags.writeable
+
+    def copy(self):
+        """Returns terrain with the same layers, in arrays of its own that can be changed. The terrain objects made
+        so far are kept, so their canvas ids stay with them."""
+        terrain = TerrainLayers.__new__(TerrainLayers)
+        terrain.gridSize = self.gridSize
+        terrain.layers = dict((kind, layer.copy()) for (kind, layer) in self.layers.items())
+        terrain.solid = self.solid.copy()
+        terrain.instances = dict(self.instances)
+        terrain.shared = None
+        return terrain
+
+    def _useShared(self):
+        """Points the layers at the arrays in the shared block."""
+        arrays = self.shared.arrays
+        self.layers = dict((kind, arrays[kind.__name__]) for kind in self.KINDS)
+        self.solid = arrays["solid"]
+
+    def __getstate__(self):
+        """Leaves the layers out of the pickle if they are shared, since unpickling attaches to them."""
+        state = self.__dict__.copy()
+        if self.shared is not None:
+            del state["layers"]
+            del state["solid"]
+            state["instances"] = {}
+        return state
+
+    def __setstate__(self, state):
+        """Rebuilds the terrain from a pickle, attaching to the shared layers if it has any."""
+        self.__dict__.update(state)
+        if self.shared is not None:
+            self._useShared()
+
+    def place(self, kind, row, col):
+        """Puts terrain of the given kind in the cell."""
+        self.layers[kind][row, col] = True
+        if kind in self.SOLID_KINDS:
+            self.solid[row, col] = True
+
+    def placeMask(self, kind, mask):
+        """Puts terrain of the given kind in every cell where the boolean mask is True."""
+        self.layers[kind] |= mask
+        if kind in self.SOLID_KINDS:
+            self.solid |= mask
+
+    def has(self, kind, row, col):
+        """Returns True if the cell has terrain of the given kind."""
+        return bool(self.layers[kind][row, col])
+
+    def isSolid(self, row, col):
+        """Returns True if the cell holds water, a stone or a pit."""
+        return bool(self.solid[row, col])
+
+    def objectsAt(self, kind, row, col):
+        """Returns a one-element list holding the terrain object of the given kind in the cell, making the object
+        the first time it is asked for, or an empty tuple if the cell has none of that kind."""
+        if not self.layers[kind][row, col]:
+            return NO_OBJECTS
+        key = (kind, row, col)
+        obs = self.instances.get(key)
+        if obs is None:
+            obs = self.instances[key] = [kind(initPose=(row, col), geneticString="0", stepSpawned=0)]
+        return obs
+
+    def solidObjectsAt(self, row, col):
+        """Returns a list of the solid terrain objects in the cell."""
+        if not self.solid[row, col]:
+            return []
+        obs = []
+        for kind in self.SOLID_KINDS:
+            obs.extend(self.objectsAt(kind, row, col))
+        return obs
+
+    def count(self, kind):
+        """Returns the number of cells that have terrain of the given kind."""
+        return int(np.count_nonzero(self.layers[kind]))
+
+    def positions(self, kind):
+        """Returns a list of the (row, col) cells that have terrain of the given kind, in row order."""
+        return [(int(r), int(c)) for (r, c) in np.argwhere(self.layers[kind])]
+
+    def objects(self, kind):
+        """Returns a list of the terrain objects of the given kind, making any that do not exist yet."""
+        return [self.objectsAt(kind, r, c)[0] for (r, c) in self.positions(kind)]
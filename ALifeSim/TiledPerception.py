@@ -0,0 +1,120 @@
+import multiprocessing
+
+import numpy as np
+
+from Perception import WorldArrays, agentArrays, perceiveArrays, NUM_FEATURES, SMELL_REACH
+from SharedArrays import SharedArrays
+
+# The shared snapshot each worker process has attached to, by block name, and the WorldArrays looking into it.
+_attached = {}
+
+
+class TiledPerception(object):
+    """Splits the start-of-step perception of a big world into tiles: bands of whole rows of the grid, each perceived
+    on its own, by a pool of worker processes if processes is more than 0. A tile gets its own rows of the world
+    snapshot plus halo rows above and below, as many as the furthest any agent can see or smell, wrapping around the
+    top and bottom of the grid, so its agents perceive exactly what they would from the whole grid. Agents are put in
+    the tile their row is in afresh every step, so an agent that has crossed into another tile is simply perceived
+    there next step.
+
+    With worker processes, the snapshot is copied each step into one block of shared memory that lasts as long as
+    the TiledPerception, and a worker is sent only its band's bounds and its agents' arrays.
+
+    Only perceiving is split. Agents decide and act in the main process, drawing from the simulation's random
+    streams, so a run gives the same results however many tiles and processes it uses."""
+
+    def __init__(self, numTiles, processes=0):
+        """Sets up perception split into numTiles bands, done by a pool of the given number of worker processes, or
+        in this process if processes is 0."""
+        if numTiles < 1:
+            raise ValueError("numTiles must be at least 1, not " + str(numTiles))
+        if processes < 0:
+            raise ValueError("processes must not be negative, not " + str(processes))
+        self.numTiles = numTiles
+        self.processes = processes
+        self.pool = None
+        self.shared = None
+
+    def perceive(self, sim, agents):
+        """Returns the same feature array as Perception.perceive(sim, agents), worked out tile by tile."""
+        world = WorldArrays(sim)
+        rows, cols, headings, colors, visionRanges, smellRadii = agentArrays(sim, agents)
+        size = sim.gridSize
+        numTiles = min(self.numTiles, size)
+        halo = max(SMELL_REACH, int(visionRanges.max(initial=0)))
+        bounds = [size * t // numTiles for t in range(numTiles + 1)]
+        tileOf = np.searchsorted(bounds, rows, side='right') - 1
+
+        jobs = []
+        members = []
+        for t in range(numTiles):
+            mine = np.flatnonzero(tileOf == t)
+            if len(mine) == 0:
+                continue
+            firstRow = bounds[t] - halo
+            jobs.append((firstRow, bounds[t + 1] - bounds[t] + 2 * halo, rows[mine].astype(np.int64) - firstRow,
+                         cols[mine], headings[mine], colors[mine], visionRanges[mine], smellRadii[mine]))
+            members.append(mine)
+
+        if self.processes > 0 and len(jobs) > 1:
+            spec = self._share(world)
+            results = self._getPool().map(_perceiveSharedTile, [(spec, size) + job for job in jobs])
+        else:
+            results = [_perceiveTile(world, job) for job in jobs]
+
+        features = np.zeros((len(agents), NUM_FEATURES), dtype=np.int64)
+        for mine, tileFeatures in zip(members, results):
+            features[mine] = tileFeatures
+        return features
+
+    def _share(self, world):
+        """Copies the snapshot into the shared block, making the block first if there is none yet or the grid has
+        changed size, and returns the block's spec."""
+        arrays = world.arrays()
+        layout = tuple((name, array.dtype.str, array.shape) for (name, array) in arrays.items())
+        if self.shared is not None and layout != tuple(entry[:3] for entry in self.shared.spec[1]):
+            self.shared.unlink()
+            self.shared = None
+        if self.shared is None:
+            self.shared = SharedArrays(arrays)
+        else:
+            for name, array in arrays.items():
+                self.shared.arrays[name][...] = array
+        return self.shared.spec
+
+    def _getPool(self):
+        """Returns the pool of worker processes, starting it the first time it is needed."""
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.processes)
+        return self.pool
+
+    def close(self):
+        """Shuts down the worker processes, if any were started, and frees the shared snapshot."""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.shared is not None:
+            self.shared.unlink()
+            self.shared = None
+
+
+def _perceiveTile(world, job):
+    """Perceives the agents of one tile of the snapshot; job is the band's first row and number of rows, and the
+    rest of the arguments to perceiveArrays."""
+    firstRow, numRows = job[:2]
+    return perceiveArrays(world.band(firstRow, numRows), *job[2:])
+
+
+def _perceiveSharedTile(job):
+    """Perceives the agents of one tile in a worker process, from the shared snapshot named by the spec at the front
+    of the job, attaching to it the first time it is seen."""
+    spec, gridSize = job[:2]
+    if spec[0] not in _attached:
+        for shared, world in _attached.values():
+            shared.close()
+        _attached.clear()
+        shared = SharedArrays.attach(spec, readOnly=True)
+        _attached[spec[0]] = (shared, WorldArrays.fromArrays(gridSize, shared.arrays))
+    shared, world = _attached[spec[0]]
+    return _perceiveTile(world, job[2:])
@@ -0,0 +1,209 @@
+import glob
+import os
+import queue
+import threading
+
+import numpy as np
+
+from Agent import Agent
+from AgentPopulation import AgentPopulation
+from EventLog import EventLog
+from Food import Food
+from Mushroom import Mushroom
+from Tree import Tree
+
+# The columns that can be recorded for each agent: any of the population's arrays, plus genomeId, a number standing
+# for the agent's genetic string (the strings themselves are recorded once each, under genomes/).
+AGENT_FIELDS = tuple(name for (name, dtype) in AgentPopulation.FIELDS) + ("genomeId",)
+DEFAULT_FIELDS = ("agentId", "row", "col", "heading", "energy", "isSick", "mushroomInfluence", "readyToBreed",
+                  "genomeId")
+
+# Events recorded by default. Moves are left out, since the agents' poses are recorded anyway.
+DEFAULT_EVENTS = ("spawned", "ate", "died", "bloomed", "sporulated")
+
+# The codes recorded for the kind of each event and the type of object it happened to.
+EVENT_CODES = dict((kind, code) for (code, kind) in enumerate(EventLog.KINDS))
+OBJECT_TYPES = (Agent, Food, Tree, Mushroom)
+_TYPE_CODES = dict((obType, code) for (code, obType) in enumerate(OBJECT_TYPES))
+
+
+class TrajectoryRecorder(object):
+    """Records what happens in a simulation, step by step, to a directory of .npz files, one per chunk of steps,
+    column by column: the state of every living agent every few steps (the fields and how often are up to the
+    caller) under agents/, and the simulation's events under events/. A chunk is handed to a background thread to
+    be written once it holds chunkSteps recorded steps, so the step loop only waits on the disk if the writer falls
+    more than two chunks behind, and nothing is kept once it is written. A chunk file only appears once it is
+    complete. loadTrajectory reads a directory back.
+
+    Call record after every step, and close at the end. For very long runs, set the simulation's keepDeadAgents to
+    False as well, so that it does not keep every agent that has died; the recorded died events hold what is
+    needed to tell how long each one lived."""
+
+    def __init__(self, sim, directory, every=1, fields=DEFAULT_FIELDS, events=DEFAULT_EVENTS, chunkSteps=1000,
+                 compress=False):
+        """Starts recording the simulation to the directory, which is made if it does not exist. Agents' state is
+        recorded every `every` steps, starting now if the step number is a multiple of it, with the given fields
+        (see AGENT_FIELDS); events of the given kinds are recorded whenever they happen, or none if events is
+        None."""
+        if every < 1:
+            raise ValueError("every must be at least 1, not " + str(every))
+        if chunkSteps < 1:
+            raise ValueError("chunkSteps must be at least 1, not " + str(chunkSteps))
+        for field in fields:
+            if field not in AGENT_FIELDS:
+                raise ValueError("Unknown agent field: " + str(field))
+        self.sim = sim
+        self.directory = directory
+        self.every = every
+        self.fields = tuple(fields)
+        self.chunkSteps = chunkSteps
+        self.compress = compress
+        self.eventKinds = frozenset(events or ())
+        # births are always followed, to keep track of genomes
+        self.queue = sim.subscribe(self.eventKinds | {"spawned"})
+        os.makedirs(directory, exist_ok=True)
+
+        # the genome of the agent in each slot of the population, and the number given to each genetic string
+        self.genomes = {}
+        self.newGenomes = []
+        self.genomeOfSlot = np.zeros(sim.population.capacity, dtype=np.int32)
+        for agent in sim.agentList:
+            self._noteGenome(agent)
+
+        self.numChunks = 0
+        self._startChunk()
+        self.pending = queue.Queue(maxsize=2)
+        self.error = None
+        self.writer = threading.Thread(target=self._write, daemon=True)
+        self.writer.start()
+        if sim.stepNum % every == 0:
+            self._recordAgents()
+
+    def record(self):
+        """Records the step just taken: its events, and the agents' state if this is a step to sample."""
+        if self.error is not None:
+            raise self.error
+        self._recordEvents(self.queue.drain())
+        if self.sim.stepNum % self.every == 0:
+            self._recordAgents()
+            if self.numSteps >= self.chunkSteps:
+                self._flush()
+
+    def close(self):
+        """Writes out what is left, waits for every chunk to be written, and stops recording."""
+        self._recordEvents(self.queue.drain())
+        self.sim.events.unsubscribe(self.queue)
+        if self.numSteps > 0 or len(self.columns["events/step"]) > 0:
+            self._flush()
+        self.pending.put(None)
+        self.writer.join()
+        if self.error is not None:
+            raise self.error
+
+    def _startChunk(self):
+        """Starts collecting a new chunk."""
+        self.columns = dict(("agents/" + field, []) for field in ("step",) + self.fields)
+        for name in ("step", "kind", "type", "row", "col", "id", "actorId"):
+            self.columns["events/" + name] = []
+        self.numSteps = 0
+
+    def _noteGenome(self, agent):
+        """Records the genome of an agent that has just been placed or born."""
+        genomeId = self.genomes.get(agent.geneticString)
+        if genomeId is None:
+            genomeId = self.genomes[agent.geneticString] = len(self.genomes)
+            self.newGenomes.append((genomeId, agent.geneticString))
+        if agent.slot >= len(self.genomeOfSlot):
+            grown = np.zeros(self.sim.population.capacity, dtype=np.int32)
+            grown[:len(self.genomeOfSlot)] = self.genomeOfSlot
+            self.genomeOfSlot = grown
+        self.genomeOfSlot[agent.slot] = genomeId
+
+    def _recordAgents(self):
+        """Adds the state of every living agent to the chunk. Between steps, the slots in use in the population are
+        exactly the living agents'."""
+        population = self.sim.population
+        slots = np.flatnonzero(population.inUse)
+        self.columns["agents/step"].append(np.full(len(slots), self.sim.stepNum, dtype=np.int64))
+        for field in self.fields:
+            if field == "genomeId":
+                self.columns["agents/genomeId"].append(self.genomeOfSlot[slots])
+            else:
+                self.columns["agents/" + field].append(getattr(population, field)[slots])
+        self.numSteps += 1
+
+    def _recordEvents(self, events):
+        """Adds the events of the kinds being recorded to the chunk, and notes the genomes of agents that have been
+        born."""
+        population = self.sim.population
+        rows = []
+        for event in events:
+            ob = event.ob
+            obType = type(ob)
+            # an agent that was born and died since the last record has left the population, and its slot may have
+            # gone to another agent
+            if event.kind == "spawned" and obType is Agent and ob.population is population:
+                self._noteGenome(ob)
+            if event.kind not in self.eventKinds:
+                continue
+            rows.append((event.stepNum, EVENT_CODES[event.kind], _TYPE_CODES.get(obType, -1), ob.row, ob.col,
+                         ob.agentId if obType is Agent else -1,
+                         event.agent.agentId if event.agent is not None else -1))
+        if len(rows) == 0:
+            return
+        table = np.array(rows, dtype=np.int64)
+        for i, name in enumerate(("step", "kind", "type", "row", "col", "id", "actorId")):
+            self.columns["events/" + name].append(table[:, i])
+
+    def _flush(self):
+        """Hands the chunk to the writer thread and starts a new one."""
+        columns = self.columns
+        genomes = self.newGenomes
+        self.newGenomes = []
+        path = os.path.join(self.directory, "chunk-%06d.npz" % self.numChunks)
+        self.numChunks += 1
+        self._startChunk()
+        self.pending.put((path, columns, genomes))
+
+    def _write(self):
+        """Writes chunks as they come, until told to stop. Runs in the writer thread."""
+        while True:
+            job = self.pending.get()
+            if job is None:
+                return
+            if self.error is not None:
+                continue
+            path, columns, genomes = job
+            try:
+                arrays = {}
+                for name, parts in columns.items():
+                    arrays[name] = np.concatenate(parts) if len(parts) > 0 else np.zeros(0, dtype=np.int64)
+                arrays["genomes/id"] = np.array([genomeId for (genomeId, geneticString) in genomes], dtype=np.int32)
+                arrays["genomes/geneticString"] = np.array([geneticString for (genomeId, geneticString) in genomes],
+                                                           dtype=np.bytes_)
+                tempPath = path + ".tmp"
+                with open(tempPath, "wb") as outFile:
+                    if self.compress:
+                        np.savez_compressed(outFile, **arrays)
+                    else:
+                        np.savez(outFile, **arrays)
+                os.replace(tempPath, path)
+            except Exception as e:
+                self.error = e
+
+
+def loadTrajectory(directory):
+    """Returns a dict of the columns recorded in a directory by a TrajectoryRecorder, each joined up across every
+    chunk, and a genomes dict from genomeId to genetic string."""
+    parts = {}
+    genomes = {}
+    for path in sorted(glob.glob(os.path.join(directory, "chunk-*.npz"))):
+        with np.load(path) as chunk:
+            for name in chunk.files:
+                if name.startswith("genomes/"):
+                    continue
+                parts.setdefault(name, []).append(chunk[name])
+            for genomeId, geneticString in zip(chunk["genomes/id"].tolist(), chunk["genomes/geneticString"].tolist()):
+                genomes[genomeId] = geneticString.decode("ascii")
+    columns = dict((name, np.concatenate(arrays)) for (name, arrays) in parts.items())
+    return columns, genomes
@@ -4,12 +4,13 @@ import random
 class Tree(Object):
     """A tree object in the ALife simulation."""
 
-    def __init__(self, initPose = (0, 0), geneticString = "0", stepSpawned=0):
+    def __init__(self, initPose = (0, 0), geneticString = "0", stepSpawned=0, rng=random):
         """
         Sets up tree with a location, geneticString, and step created
         :param initPose: tuple giving tree's initial location
         :param geneticString: string giving information about the tree
         :param stepSpawned: integer giving the simulation step the tree was created in
+        :param rng: random.Random-like generator used to pick when the tree first blooms
         """
         super().__init__()
         self.geneticString = geneticString
@@ -19,7 +20,7 @@ class Tree(Object):
         self.hasFood = geneticString[0]
         self.justChanged = False
         if self.hasFood == "0":
-            self.stepsUntilBloom = random.randint(5,40)
+            self.stepsUntilBloom = rng.randint(5,40)
         else:
             self.stepsUntilBloom = 0
         # self.stepsUntilBloom = 500
@@ -0,0 +1,40 @@
+from Tree import Tree
+
+# The row and column step from one cell to the next along an agent's line of sight, for each heading.
+HEADING_STEPS = {'n': (-1, 0), 's': (1, 0), 'e': (0, 1), 'w': (0, -1)}
+
+_rays = {}
+
+
+def rayOffsets(heading, visionRange):
+    """Returns the (row, col) offsets from an agent of the cells it can see when facing the given heading,
+    nearest first. Each table is built the first time it is asked for and reused after that."""
+    key = (heading, visionRange)
+    offsets = _rays.get(key)
+    if offsets is None:
+        dRow, dCol = HEADING_STEPS[heading]
+        offsets = _rays[key] = tuple((dRow * i, dCol * i) for i in range(1, visionRange + 1))
+    return offsets
+
+
+def lookAlongRay(sim, row, col, heading, visionRange, agent):
+    """Walks an agent's line of sight once and returns (firstThing, tree). firstThing is the most important object
+    (as _assessObjectsHere ranks them) in the nearest cell before any tree that has something in it, or None.
+    tree is the first tree on the line of sight, which blocks everything behind it, or None. Cells that hold
+    nothing but grass, sand or snow are passed over without asking the spatial index about them."""
+    gridSize = sim.gridSize
+    globalMap = sim.globalMap
+    solid = sim.terrain.solid
+    firstThing = None
+    for (dRow, dCol) in rayOffsets(heading, visionRange):
+        r = (row + dRow) % gridSize
+        c = (col + dCol) % gridSize
+        if (r, c) in globalMap:
+            trees = sim.index.objectsAt(Tree, r, c)
+            if len(trees) > 0:
+                return firstThing, trees[0]
+            if firstThing is None:
+                firstThing = sim._assessObjectsHere(r, c, agent)
+        elif firstThing is None and solid[r, c]:
+            firstThing = sim._assessObjectsHere(r, c, agent)
+    return firstThing, None
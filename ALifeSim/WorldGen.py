@@ -0,0 +1,77 @@
+import math
+
+import numpy as np
+
+
+class WorldGen(object):
+    """Builds the patchy parts of a new world (grass, sand, snow and forests) with array operations. A patch is a
+    disc of cells, and every cell inside the disc gets the object with probability 2/3. Instead of visiting every
+    patch tile by tile, the generator counts how many patches cover each cell and then decides every cell with one
+    batched draw: a cell covered by k patches ends up filled with probability 1 - (1/3)**k, which is the same as
+    trying each covering patch in turn."""
+
+    # The chance that one patch puts its object on a cell it covers.
+    FILL_CHANCE = 2.0 / 3.0
+
+    def __init__(self, gridSize, rng):
+        """Takes in the side length of the grid and a numpy Generator that all randomness is drawn from."""
+        self.gridSize = gridSize
+        self.rng = rng
+        self.spans = {}
+
+    def _discSpans(self, r):
+        """Returns the row offsets of a disc of radius r and the first and last column offset covered on each of
+        those rows, as three arrays. The disc is cut from a 2r x 2r square of tiles running from -r to r-1 on each
+        axis, keeping the tiles within distance r of the center."""
+        spans = self.spans.get(r)
+        if spans is None:
+            rowOffsets = np.arange(-r, r)
+            halfWidths = np.array([math.isqrt(r * r - dx * dx) for dx in rowOffsets])
+            spans = self.spans[r] = (rowOffsets, -halfWidths, np.minimum(halfWidths, r - 1))
+        return spans
+
+    def coverage(self, centerRows, centerCols, radii):
+        """Given arrays of disc centers and radii, returns a gridSize x gridSize array counting how many discs
+        cover each cell. Parts of discs that hang off the edge of the grid are dropped."""
+        size = self.gridSize
+        # Each covered run of a row adds 1 at its first column and takes 1 away just after its last column, so a
+        # running sum along each row gives the count.
+        starts = [np.zeros(0, dtype=np.int64)]
+        ends = [np.zeros(0, dtype=np.int64)]
+        for r in np.unique(radii):
+            which = radii == r
+            rowOffsets, loOffsets, hiOffsets = self._discSpans(int(r))
+            rows = centerRows[which][:, None] + rowOffsets[None, :]
+            lo = np.maximum(centerCols[which][:, None] + loOffsets[None, :], 0)
+            hi = np.minimum(centerCols[which][:, None] + hiOffsets[None, :] + 1, size)
+            keep = (rows >= 0) & (rows < size) & (lo < hi)
+            rowStarts = rows[keep] * (size + 1)
+            starts.append(rowStarts + lo[keep])
+            ends.append(rowStarts + hi[keep])
+        cells = size * (size + 1)
+        diff = np.bincount(np.concatenate(starts), minlength=cells) - np.bincount(np.concatenate(ends), minlength=cells)
+        return np.cumsum(diff.reshape(size, size + 1), axis=1)[:, :size]
+
+    def fillMask(self, counts, occupied):
+        """Given patch coverage counts, decides which cells get filled, leaving out the occupied ones."""
+        chance = 1.0 - (1.0 - self.FILL_CHANCE) ** counts
+        return (self.rng.random(counts.shape) < chance) & ~occupied
+
+    def patchMask(self, numPatches, occupied):
+        """Returns a boolean mask of the cells filled by numPatches patches of random size and place. Each patch
+        has a radius between 1 and a fifth of the grid size."""
+        size = self.gridSize
+        radii = self.rng.integers(1, max(1, size // 5) + 1, size=numPatches)
+        # The corner of a patch's tile square is between -r+1 and size-r+1, and its center is r further on.
+        centerRows = self.rng.integers(-radii + 1, size - radii + 2) + radii
+        centerCols = self.rng.integers(-radii + 1, size - radii + 2) + radii
+        return self.fillMask(self.coverage(centerRows, centerCols, radii), occupied)
+
+    def forestMask(self, numForests, forestSize, occupied):
+        """Returns a boolean mask of the cells filled by numForests forests, all with diameter forestSize."""
+        size = self.gridSize
+        r = forestSize // 2
+        radii = np.full(numForests, r)
+        centerRows = self.rng.integers(-r + 1, size - r + 2, size=numForests) + r
+        centerCols = self.rng.integers(-r + 1, size - r + 2, size=numForests) + r
+        return self.fillMask(self.coverage(centerRows, centerCols, radii), occupied)
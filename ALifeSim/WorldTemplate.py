@@ -0,0 +1,52 @@
+import copy
+
+import ALifeSim
+
+
+class WorldTemplate(object):
+    """A world built once, without agents, for starting many simulations from. Building a world means making the
+    terrain, forests, mushrooms and food, which can take longer than a short run itself; a template does that
+    once, and each simulation made from it (see clone) gets its own copies of the trees, mushrooms and food, which
+    change as it runs, while all of them stand on the template's terrain, which is frozen rather than copied. A
+    simulation that changes its terrain copies it first, so the others never see the change.
+
+    With the same seed, a clone runs exactly as a new ALifeSimTest with that seed would, so a search comparing
+    rule strings on one template still compares them on common random numbers."""
+
+    def __init__(self, gridSize, numStones, numForests, numRivers, numPonds, seed=None):
+        """Builds the world from the given settings, as ALifeSimTest would."""
+        self.gridSize = gridSize
+        self.numStones = numStones
+        self.numForests = numForests
+        self.numRivers = numRivers
+        self.numPonds = numPonds
+        # Never stepped: its objects are only copied.
+        self.world = ALifeSim.ALifeSimTest(gridSize, 0, numStones, numForests, numRivers, numPonds, [], seed)
+        self.terrain = self.world.terrain
+        self.terrain.freeze()
+        self.seed = self.world.rng.seed
+
+    def clone(self, numAgents, geneticStrings, seed=None):
+        """Returns a new simulation in this world, with numAgents agents given the genetic strings (and random ones
+        for any left over). With no seed, it runs as a new simulation with the template's seed would; with a seed,
+        the agents are placed, and everything after, with random numbers from that seed instead."""
+        return ALifeSim.ALifeSimTest(self.gridSize, numAgents, self.numStones, self.numForests, self.numRivers,
+                                     self.numPonds, geneticStrings, seed, template=self)
+
+    def randomStreams(self):
+        """Returns a copy of the world's random number streams as they were when it was done being built."""
+        return copy.deepcopy(self.world.rng)
+
+    def copyWorldInto(self, sim):
+        """Gives a new simulation standing on the template's terrain copies of the world's trees, mushrooms and
+        food, added in the order they were first placed, and the world's free cells."""
+        world = self.world
+        copies = {}
+        for (row, col), objectsHere in world.globalMap.items():
+            for ob in objectsHere:
+                obCopy = copies[ob] = copy.copy(ob)
+                sim.addObject(obCopy, row, col)
+        sim.treeList = [copies[tree] for tree in world.treeList]
+        sim.mushrooms = dict((copies[mushroom], None) for mushroom in world.mushrooms)
+        sim.food = dict((copies[food], None) for food in world.food)
+        sim.freeCells = world.freeCells.copy()
@@ -0,0 +1,85 @@
+"""Checks that agents smelling with radius 1 and 2 find what is next to them, in the right direction relative to
+their heading, and that agents smelling further follow scents. Runs under pytest, or on its own as a script."""
+
+import random
+
+import ALifeSim
+from Agent import Agent, ALL_MOVES, DECIDED, FORWARD, RIGHT
+from Food import Food
+
+
+def _emptyWorld(size=10):
+    """Returns a simulation with no agents, and with its food and mushrooms taken away."""
+    sim = ALifeSim.ALifeSimTest(size, 0, 0, 0, 0, 0, [], seed=1)
+    for ob in list(sim.food) + list(sim.mushrooms):
+        sim.removeObject(ob, ob.row, ob.col)
+    sim.food = {}
+    sim.mushrooms = {}
+    return sim
+
+
+def _smeller(sim, smellDigit, heading, color="3", col=None):
+    """Puts a peaceful, hungry agent with the given smell radius in the middle row of the grid, in the middle
+    column unless another is given, facing the given heading."""
+    row = sim.gridSize // 2
+    if col is None:
+        col = row
+    agent = Agent(initPose=(row, col, heading), geneticString="1" + smellDigit + "100" + color + "330000000",
+                  rng=random.Random(0), population=sim.population)
+    sim.agentList.append(agent)
+    sim.addObject(agent, row, col)
+    return agent
+
+
+def testRadius1():
+    """Food to the east of an agent facing north is to its right."""
+    sim = _emptyWorld()
+    agent = _smeller(sim, "1", 'n')
+    assert agent.detectSmellRadius(sim) == "none"
+    food = Food()
+    sim.addObject(food, 5, 6)
+    assert agent.detectSmellRadius(sim) == ("right", food)
+
+
+def testRadius2():
+    """Food two cells north of an agent facing east is to its left, and one diagonally ahead and to the left is
+    above and left of it."""
+    sim = _emptyWorld()
+    agent = _smeller(sim, "2", 'e')
+    assert agent.detectSmellRadius(sim) == "none"
+    food = Food()
+    sim.addObject(food, 3, 5)
+    assert agent.detectSmellRadius(sim) == ("left", food)
+    sim.removeObject(food, 3, 5)
+    sim.addObject(food, 4, 6)
+    direction, found = agent.detectSmellRadius(sim)
+    assert found is food and direction in ("above", "left")
+
+
+def testScentFood():
+    """An agent smelling four cells away heads for food five cells ahead of it, which only the cell in front of it
+    is within four cells of."""
+    sim = _emptyWorld(20)
+    agent = _smeller(sim, "4", 'n')
+    sim.smell.newStep(sim.population)
+    assert agent.checkScent(sim, ALL_MOVES) == ALL_MOVES
+    sim.addObject(Food(), 5, 10)
+    assert agent.checkScent(sim, ALL_MOVES) == DECIDED | FORWARD
+
+
+def testScentEnemy():
+    """A peaceful agent smelling four cells away will not move towards an agent of another color five cells to its
+    right."""
+    sim = _emptyWorld(20)
+    agent = _smeller(sim, "4", 'n')
+    _smeller(sim, "1", 'n', color="7", col=15)
+    sim.smell.newStep(sim.population)
+    assert agent.checkScent(sim, ALL_MOVES) == ALL_MOVES & ~RIGHT
+
+
+if __name__ == "__main__":
+    testRadius1()
+    testRadius2()
+    testScentFood()
+    testScentEnemy()
+    print("smell checks passed")